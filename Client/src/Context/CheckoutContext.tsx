@@ -1,4 +1,4 @@
-import React, { createContext, useState, useContext, useCallback } from "react";
+import React, { createContext, useState, useContext, useCallback, useRef } from "react";
 import { getApiBaseUrl } from "../utils/api";
 
 // ---- Types ----
@@ -60,6 +60,10 @@ export const CheckoutProvider = ({
 
   const [items, setItemsState] = useState<OrderItem[]>([]);
 
+  // Resubmitting the same order after a failure reuses its Idempotency-Key,
+  // so a request that did reach the server is not placed twice
+  const pendingOrder = useRef<{ body: string; key: string } | null>(null);
+
   const setFormData = useCallback( (data: Partial<CheckoutFormData>) => {
      setFormDataState((prev) => ({ ...prev, ...data }));
   }, []);
@@ -111,10 +115,20 @@ export const CheckoutProvider = ({
       localStorage.setItem("guest_email", data.user_email);
 
       try {
-        const res = await fetch(`${API_BASE}/order/create`, {
+        // Identify the cart so the ordered items leave it without returning their stock
+        const sessionId = localStorage.getItem("session_id") || "";
+        const body = JSON.stringify({ ...data, items });
+        if (pendingOrder.current?.body !== body) {
+          pendingOrder.current = { body, key: crypto.randomUUID() };
+        }
+        const res = await fetch(`${API_BASE}/order/create?session_id=${sessionId}`, {
           method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ ...data, items }),
+          headers: {
+            "Content-Type": "application/json",
+            Authorization: `Bearer ${localStorage.getItem("token")}`,
+            "Idempotency-Key": pendingOrder.current.key,
+          },
+          body,
         });
 
         if (!res.ok) {
@@ -122,6 +136,7 @@ export const CheckoutProvider = ({
           console.error("Backend response:", res.status, errorText);
           throw new Error("Order submission failed");
         }
+        pendingOrder.current = null;
 
         // ✅ Reset state with order_date included
         setFormDataState({
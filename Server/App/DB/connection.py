@@ -1,19 +1,200 @@
 import mysql.connector
+from mysql.connector import pooling
 from dotenv import load_dotenv
+import itertools
+import logging
 import os
+import threading
+import time
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Connections per host per worker; 0 disables pooling (one connection per call)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+
+# Read replicas: "host[:port],host[:port]" - empty means everything uses the primary
+REPLICA_HOSTS = [h.strip() for h in os.getenv("DB_REPLICA_HOSTS", "").split(",") if h.strip()]
+REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))  # seconds
+REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "10"))  # seconds
+REPLICA_CONNECT_TIMEOUT = int(os.getenv("DB_REPLICA_CONNECT_TIMEOUT", "2"))  # seconds, for the health check
+# After a catalog write in this worker, reads stay on the primary this long
+READ_AFTER_WRITE_WINDOW = float(os.getenv("DB_READ_AFTER_WRITE_WINDOW", str(REPLICA_MAX_LAG)))
+
+
+# ------------------ Pools ------------------
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _config(host, port):
+    return {
+        "host": host,
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "database": os.getenv("DB_NAME"),
+        "port": port,
+    }
+
+
+def _connect(host, port):
+    """Pooled connection to host:port, or a one-off connection when pooling is off or exhausted."""
+    config = _config(host, port)
+    if POOL_SIZE <= 0:
+        return mysql.connector.connect(**config)
+
+    key = (host, str(port))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                # No session reset on checkin: it would deallocate the
+                # prepared statements cached on the connection (App/DB/statements.py)
+                pool = pooling.MySQLConnectionPool(
+                    pool_name=f"{host}:{port}"[:64], pool_size=POOL_SIZE, pool_reset_session=False, **config
+                )
+                _pools[key] = pool
+    try:
+        conn = pool.get_connection()
+        # ...so end whatever transaction / read view the previous user left open
+        conn.rollback()
+        return conn
+    except pooling.PoolError:
+        # Every pooled connection is busy; don't fail the request over it
+        return mysql.connector.connect(**config)
+
+
 def get_connection():
+    """Connection to the primary. Use for writes and anything that must read its own writes."""
     try:
-        connection = mysql.connector.connect(
-            host=os.getenv("DB_HOST"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            database=os.getenv("DB_NAME"),
-            port=os.getenv("DB_PORT"),
-        )
-        return connection
+        return _connect(os.getenv("DB_HOST"), os.getenv("DB_PORT"))
     except mysql.connector.Error as err:
-        print(f"Error: {err}")
+        logger.error("Database connection failed: %s", err)
         return None
+
+
+def discard(conn):
+    """Close a connection that must not be reused as is (e.g. a result set left half read).
+
+    The socket is dropped; a pooled connection goes back to its pool and is
+    reconnected on its next checkout.
+    """
+    raw = getattr(conn, "_cnx", None) or conn
+    try:
+        raw.disconnect()
+    finally:
+        conn.close()
+
+
+# ------------------ Read Replicas ------------------
+class Replica:
+    def __init__(self, address):
+        host, _, port = address.partition(":")
+        self.host = host
+        self.port = port or os.getenv("DB_PORT") or "3306"
+        self.healthy = True
+        self.lag = 0.0
+        self.checked_at = 0.0
+        self._check_lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{self.host}:{self.port}"
+
+    def usable(self):
+        if time.monotonic() - self.checked_at > REPLICA_CHECK_INTERVAL:
+            # Only one thread refreshes; the others go with the last known state
+            if self._check_lock.acquire(blocking=False):
+                try:
+                    self.check()
+                finally:
+                    self._check_lock.release()
+        return self.healthy and self.lag <= REPLICA_MAX_LAG
+
+    def connect(self):
+        """Pooled connection to this replica; marks it down (and re-raises) if that fails."""
+        try:
+            return _connect(self.host, self.port)
+        except mysql.connector.Error as err:
+            self.mark_down(err)
+            raise
+
+    def check(self):
+        conn = None
+        try:
+            # Own connection with a short timeout: an unreachable replica must not
+            # hold up the request that happened to trigger the check
+            conn = mysql.connector.connect(
+                **_config(self.host, self.port), connection_timeout=REPLICA_CONNECT_TIMEOUT
+            )
+            cursor = conn.cursor(dictionary=True)
+            self.lag = self._replication_lag(cursor)
+            self.healthy = self.lag is not None
+            if self.lag is None:
+                self.lag = float("inf")
+                logger.warning("Replica %s is not replicating", self)
+            elif self.lag > REPLICA_MAX_LAG:
+                logger.warning("Replica %s is %ss behind, routing reads to primary", self, self.lag)
+        except mysql.connector.Error as err:
+            self.mark_down(err)
+        finally:
+            self.checked_at = time.monotonic()
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def _replication_lag(cursor):
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+        except mysql.connector.Error:
+            # MySQL < 8.0.22
+            cursor.execute("SHOW SLAVE STATUS")
+        status = cursor.fetchone()
+        cursor.fetchall()
+        if not status:
+            # Not a classic replica (e.g. a managed read endpoint); nothing to measure
+            return 0.0
+        lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+        return None if lag is None else float(lag)
+
+    def mark_down(self, err=None):
+        if self.healthy:
+            logger.warning("Replica %s marked down: %s", self, err)
+        self.healthy = False
+        self.checked_at = time.monotonic()
+
+
+_replicas = [Replica(address) for address in REPLICA_HOSTS]
+_replica_cycle = itertools.cycle(_replicas) if _replicas else None
+_cycle_lock = threading.Lock()
+_last_write_at = 0.0
+
+
+def replicas():
+    """The configured read replicas, healthy or not."""
+    return list(_replicas)
+
+
+def mark_primary_write():
+    """Record a catalog write so the following reads in this worker see it."""
+    global _last_write_at
+    _last_write_at = time.monotonic()
+
+
+def get_read_connection():
+    """Connection for read-only handlers: round-robin over healthy replicas, else the primary."""
+    if not _replicas or time.monotonic() - _last_write_at < READ_AFTER_WRITE_WINDOW:
+        return get_connection()
+
+    for _ in range(len(_replicas)):
+        with _cycle_lock:
+            replica = next(_replica_cycle)
+        if not replica.usable():
+            continue
+        try:
+            return replica.connect()
+        except mysql.connector.Error:
+            pass
+
+    return get_connection()
@@ -0,0 +1,374 @@
+"""
+Versioned schema migrations.
+
+Each migration is a version number, a description and a list of steps: SQL
+strings, ``Index`` / ``Column`` definitions or callables taking a cursor.
+Steps are idempotent (indexes and columns are only added when missing,
+callables rebuild whatever they fill), so a migration can be re-run safely
+against a database that was partly migrated by hand. Applied versions are recorded in ``schema_migrations``.
+
+    python -m App.DB.migrations status    # pending versions / missing indexes
+    python -m App.DB.migrations upgrade   # apply pending migrations
+    python -m App.DB.migrations explain   # EXPLAIN the hot queries, exit 1 on a full scan
+    python -m App.DB.migrations rebuild-rollups   # recompute the sales rollups from the orders
+
+Run ``explain`` against a realistically sized dataset (see benchmarks/datagen.py):
+on near-empty tables MySQL happily picks a full scan even when an index exists.
+"""
+import logging
+import os
+import sys
+from collections import namedtuple
+
+from App.DB import rollups, seller_stats, statements
+from App.DB.connection import get_connection
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_LOCK = "schema_migrations"  # GET_LOCK name serializing upgrade() across processes
+MIGRATION_LOCK_TIMEOUT = int(os.getenv("DB_MIGRATION_LOCK_TIMEOUT", "300"))  # seconds
+
+# =====================
+# Migration Steps
+# =====================
+Index = namedtuple("Index", ["table", "name", "columns"])
+Column = namedtuple("Column", ["table", "name", "definition"])
+Migration = namedtuple("Migration", ["version", "description", "steps"])
+
+
+# Recomputes products.popularity (units sold) from scratch
+POPULARITY_BACKFILL = """
+    UPDATE products p
+    JOIN (SELECT product_id, SUM(quantity) AS sold FROM order_items GROUP BY product_id) o
+        ON o.product_id = p.id
+    SET p.popularity = o.sold
+"""
+
+
+MIGRATIONS = [
+    Migration(1, "Indexes for the hot cart, catalog and order-history queries", [
+        # cart lookups are always (owner, product_id) or owner alone
+        Index("cart", "idx_cart_user_product", ["user_email", "product_id"]),
+        Index("cart", "idx_cart_session_product", ["session_id", "product_id"]),
+        Index("products", "idx_products_sub_category", ["sub_category_id"]),
+        Index("products", "idx_products_user", ["user_id"]),
+        Index("order_items", "idx_order_items_order", ["order_id"]),
+        Index("order_items", "idx_order_items_product", ["product_id"]),
+        # order history: WHERE user_email = ? ORDER BY order_date DESC
+        Index("orders", "idx_orders_user_date", ["user_email", "order_date"]),
+    ]),
+    Migration(2, "Background job queue (outbox)", [
+        """
+        CREATE TABLE IF NOT EXISTS job_queue (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            kind VARCHAR(100) NOT NULL,
+            payload JSON NOT NULL,
+            status ENUM('pending', 'done', 'failed') NOT NULL DEFAULT 'pending',
+            attempts INT NOT NULL DEFAULT 0,
+            run_after DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            last_error TEXT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            finished_at DATETIME NULL
+        )
+        """,
+        Index("job_queue", "idx_job_queue_due", ["status", "run_after"]),
+    ]),
+    Migration(3, "Expiring cart reservations", [
+        # NULL = the reservation never expires (logged-in carts by default)
+        Column("cart", "expires_at", "DATETIME NULL"),
+        Index("cart", "idx_cart_expires", ["expires_at"]),
+    ]),
+    Migration(4, "Product listing: popularity column and sort indexes", [
+        # units sold, kept current by the order.created job
+        Column("products", "popularity", "INT NOT NULL DEFAULT 0"),
+        POPULARITY_BACKFILL,
+        # every listing sort, alone and within a subcategory (id breaks ties for the keyset cursor)
+        Index("products", "idx_products_price", ["price", "id"]),
+        Index("products", "idx_products_popularity", ["popularity", "id"]),
+        Index("products", "idx_products_sub_price", ["sub_category_id", "price", "id"]),
+        Index("products", "idx_products_sub_popularity", ["sub_category_id", "popularity", "id"]),
+    ]),
+    Migration(5, "Order export by date range", [
+        Index("orders", "idx_orders_date", ["order_date"]),
+    ]),
+    Migration(6, "Daily sales rollups", rollups.CREATE_TABLES + [
+        # range scans per category / subcategory over a date range
+        Index("sales_daily_subcategory", "idx_sales_sub_category_day", ["category_id", "day"]),
+        Index("sales_daily_product", "idx_sales_product_category_day", ["category_id", "day"]),
+        rollups.rebuild,
+    ]),
+    Migration(7, "Seller dashboard stats", [
+        seller_stats.CREATE_TABLE,
+        Index("seller_product_stats", "idx_seller_stats_seller", ["seller_id", "revenue"]),
+        seller_stats.rebuild,
+    ]),
+    Migration(8, "Idempotency keys for order creation", [
+        """
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            id BINARY(32) PRIMARY KEY,
+            request_hash BINARY(32) NOT NULL,
+            response JSON NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            expires_at DATETIME NOT NULL
+        )
+        """,
+        Index("idempotency_keys", "idx_idempotency_keys_expires", ["expires_at"]),
+    ]),
+]
+
+
+def _index_columns(cursor, table):
+    """Map index name -> ordered column list for ``table``."""
+    cursor.execute(
+        """
+        SELECT INDEX_NAME AS index_name, COLUMN_NAME AS column_name
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+        """,
+        (table,),
+    )
+    indexes = {}
+    for row in cursor.fetchall():
+        indexes.setdefault(row["index_name"], []).append(row["column_name"])
+    return indexes
+
+
+def has_index(cursor, table, columns):
+    """True if some index on ``table`` starts with ``columns`` (a wider index covers a narrower one)."""
+    for index_columns in _index_columns(cursor, table).values():
+        if index_columns[: len(columns)] == list(columns):
+            return True
+    return False
+
+
+def _has_column(cursor, table, column):
+    cursor.execute(
+        """
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """,
+        (table, column),
+    )
+    return cursor.fetchone() is not None
+
+
+def _apply_step(cursor, step):
+    if isinstance(step, Index):
+        if has_index(cursor, step.table, step.columns):
+            return
+        cursor.execute(f"CREATE INDEX {step.name} ON {step.table} ({', '.join(step.columns)})")
+    elif isinstance(step, Column):
+        if _has_column(cursor, step.table, step.name):
+            return
+        cursor.execute(f"ALTER TABLE {step.table} ADD COLUMN {step.name} {step.definition}")
+    elif callable(step):
+        step(cursor)
+    else:
+        cursor.execute(step)
+
+
+# =====================
+# Applying
+# =====================
+def _ensure_migrations_table(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+
+def applied_versions(cursor):
+    _ensure_migrations_table(cursor)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row["version"] for row in cursor.fetchall()}
+
+
+def upgrade(conn):
+    """Apply every pending migration in order. Returns the versions applied.
+
+    Holds a named lock while it runs: with DB_AUTO_MIGRATE every worker calls
+    this at startup, and only one of them should be running the DDL.
+    """
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT GET_LOCK(%s, %s) AS locked", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+    if not cursor.fetchone()["locked"]:
+        cursor.close()
+        raise RuntimeError(f"another process held the migration lock for {MIGRATION_LOCK_TIMEOUT}s")
+    try:
+        # Read after locking: whoever held the lock may just have applied them
+        done = applied_versions(cursor)
+        applied = []
+        for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+            if migration.version in done:
+                continue
+            logger.info("Applying migration %s: %s", migration.version, migration.description)
+            # DDL commits implicitly in MySQL; idempotent steps make a retry after a failure safe
+            for step in migration.steps:
+                _apply_step(cursor, step)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                (migration.version, migration.description),
+            )
+            conn.commit()
+            applied.append(migration.version)
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+        cursor.fetchall()
+        cursor.close()
+    return applied
+
+
+def check(conn):
+    """Return a list of human readable problems: pending migrations and missing indexes."""
+    cursor = conn.cursor(dictionary=True)
+    problems = []
+    done = applied_versions(cursor)
+    for migration in MIGRATIONS:
+        if migration.version not in done:
+            problems.append(f"migration {migration.version} not applied ({migration.description})")
+        for step in migration.steps:
+            if isinstance(step, Index) and not has_index(cursor, step.table, step.columns):
+                problems.append(f"missing index {step.name} on {step.table}({', '.join(step.columns)})")
+    cursor.close()
+    return problems
+
+
+def verify_schema():
+    """Startup check: optionally auto-migrate, then log anything still missing. Never raises."""
+    conn = get_connection()
+    if conn is None:
+        logger.warning("Schema check skipped: database unavailable")
+        return
+    try:
+        if os.getenv("DB_AUTO_MIGRATE", "").lower() in ("1", "true", "yes"):
+            upgrade(conn)
+        for problem in check(conn):
+            logger.warning("Schema check: %s", problem)
+    except Exception as e:
+        logger.warning("Schema check failed: %s", e)
+    finally:
+        conn.close()
+
+
+# =====================
+# EXPLAIN Check
+# =====================
+# Representative parameters for every prepared statement in App/DB/statements.py;
+# those statements are checked as they are registered, not from a copy.
+STATEMENT_PARAMS = {
+    "product_detail": (1,),
+    "related_products": (1, 1, 4),
+    "products_by_subcategory": (1,),
+    "product_row": (1,),
+    "product_stock": (1,),
+    "user_by_email": ("bench1@example.com",),
+    "frequently_bought_with": (1, 1, 1, 1),
+    "cart_item:user_email": ("bench1@example.com", 1),
+    "cart_item:session_id": ("bench-session-1", 1),
+    "cart_quantity:user_email": ("bench1@example.com", 1),
+    "cart_quantity:session_id": ("bench-session-1", 1),
+    "cart_items:user_email": ("bench1@example.com",),
+    "cart_items:session_id": ("bench-session-1",),
+}
+
+# The other query shapes the routers run on every request.
+HOT_QUERIES = [
+    ("expired reservations", "SELECT id FROM cart WHERE expires_at <= NOW() ORDER BY expires_at LIMIT %s", (500,)),
+    ("carts holding product", "SELECT user_email, session_id, quantity FROM cart WHERE product_id=%s", (1,)),
+    ("listing by subcategory, price",
+     "SELECT p.id FROM products p WHERE p.sub_category_id = %s ORDER BY p.price, p.id LIMIT %s", (1, 24)),
+    ("listing by popularity",
+     "SELECT p.id FROM products p ORDER BY p.popularity DESC, p.id DESC LIMIT %s", (24,)),
+    ("products by seller", "SELECT p.id, p.name FROM products p WHERE p.user_id = %s", (1,)),
+    ("order items by order",
+     """
+     SELECT oi.id, oi.quantity, p.name AS product_name
+     FROM order_items oi JOIN products p ON oi.product_id = p.id
+     WHERE oi.order_id = %s
+     """,
+     (1,)),
+    ("order items by product", "SELECT COUNT(*) AS count FROM order_items WHERE product_id=%s", (1,)),
+    ("order history", "SELECT * FROM orders WHERE user_email = %s ORDER BY order_date DESC", ("bench1@example.com",)),
+    ("order export",
+     """
+     SELECT o.id, oi.product_id, oi.quantity
+     FROM orders o JOIN order_items oi ON oi.order_id = o.id
+     WHERE o.order_date >= %s AND o.order_date < %s
+     ORDER BY o.order_date, o.id
+     """,
+     ("2024-01-01", "2024-01-08")),
+]
+
+
+def hot_queries():
+    """(name, sql, params) for the registered statements, then the other hot queries."""
+    for name, sql in statements.STATEMENTS.items():
+        yield name, sql, STATEMENT_PARAMS[name]
+    yield from HOT_QUERIES
+
+
+def full_scans(rows):
+    """Tables an EXPLAIN result reads in full; derived tables (``<derived2>``, ``<union2,3>``) don't count."""
+    return [
+        row.get("table") for row in rows
+        if row.get("type") == "ALL" and not str(row.get("table")).startswith("<")
+    ]
+
+
+def explain_hot_queries(conn):
+    """EXPLAIN every hot query; returns (query name, table) pairs that use a full table scan."""
+    cursor = conn.cursor(dictionary=True)
+    found = []
+    for name, sql, params in hot_queries():
+        cursor.execute("EXPLAIN " + sql, params)
+        found.extend((name, table) for table in full_scans(cursor.fetchall()))
+    cursor.close()
+    return found
+
+
+# =====================
+# Entry Point
+# =====================
+def main(argv=None):
+    command = (argv or sys.argv[1:] or ["status"])[0]
+    conn = get_connection()
+    if conn is None:
+        print("Could not connect to the database")
+        return 2
+    try:
+        if command == "upgrade":
+            applied = upgrade(conn)
+            print(f"Applied: {applied}" if applied else "Already up to date")
+        elif command == "status":
+            problems = check(conn)
+            for problem in problems:
+                print(problem)
+            print("Schema OK" if not problems else f"{len(problems)} problem(s)")
+            return 1 if problems else 0
+        elif command == "explain":
+            found = explain_hot_queries(conn)
+            for name, table in found:
+                print(f"FULL SCAN: {name} (table {table})")
+            print("No full table scans" if not found else f"{len(found)} full scan(s)")
+            return 1 if found else 0
+        elif command == "rebuild-rollups":
+            cursor = conn.cursor()
+            rollups.rebuild(cursor)
+            conn.commit()
+            print("Sales rollups rebuilt")
+        else:
+            print("Usage: python -m App.DB.migrations [status|upgrade|explain|rebuild-rollups]")
+            return 2
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Daily sales rollups for the analytics endpoints.
+
+Three tables, all keyed by day, are kept in step with ``orders`` /
+``order_items`` so reports never aggregate the raw order tables:
+
+    sales_daily              day                  -> revenue, units, orders
+    sales_daily_subcategory  day x sub_category   -> revenue, units, orders (+ category_id)
+    sales_daily_product      day x product        -> revenue, units, orders (+ sub_category_id, category_id)
+
+``orders`` counts the distinct orders that contributed to a row. New orders
+are added by ``apply_order`` from the order.created job, which commits with
+the job's done mark, so each order is counted exactly once; ``rebuild``
+recomputes everything from scratch.
+"""
+
+# (table, key columns, dimension columns resolved from the product)
+_LEVELS = [
+    ("sales_daily", [], []),
+    ("sales_daily_subcategory", ["sub_category_id"], ["category_id"]),
+    ("sales_daily_product", ["product_id"], ["sub_category_id", "category_id"]),
+]
+
+_SOURCES = {
+    "product_id": "oi.product_id",
+    "sub_category_id": "COALESCE(p.sub_category_id, 0)",
+    "category_id": "COALESCE(sc.category_id, 0)",
+}
+
+
+def _aggregate_sql(table, keys, dimensions, where):
+    columns = keys + dimensions
+    group_by = "".join(f", {_SOURCES[c]}" for c in keys)
+    # dimensions follow from the key, MAX() just satisfies ONLY_FULL_GROUP_BY
+    select = "".join(f"{_SOURCES[c]} AS {c}, " for c in keys) + "".join(
+        f"MAX({_SOURCES[c]}) AS {c}, " for c in dimensions
+    )
+    column_list = "".join(f"{c}, " for c in columns)
+    return f"""
+        INSERT INTO {table} (day, {column_list}revenue, units, orders)
+        SELECT * FROM (
+            SELECT DATE(o.order_date) AS day, {select}
+                SUM(oi.price * oi.quantity) AS revenue,
+                SUM(oi.quantity) AS units,
+                COUNT(DISTINCT o.id) AS orders
+            FROM orders o
+            JOIN order_items oi ON oi.order_id = o.id
+            LEFT JOIN products p ON p.id = oi.product_id
+            LEFT JOIN sub_categories sc ON sc.id = p.sub_category_id
+            WHERE {where}
+            GROUP BY DATE(o.order_date){group_by}
+        ) AS s
+        ON DUPLICATE KEY UPDATE
+            revenue = {table}.revenue + s.revenue,
+            units = {table}.units + s.units,
+            orders = {table}.orders + s.orders
+    """
+
+
+CREATE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS sales_daily (
+        day DATE PRIMARY KEY,
+        revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+        units INT NOT NULL DEFAULT 0,
+        orders INT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sales_daily_subcategory (
+        day DATE NOT NULL,
+        sub_category_id INT NOT NULL,
+        category_id INT NOT NULL,
+        revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+        units INT NOT NULL DEFAULT 0,
+        orders INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, sub_category_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sales_daily_product (
+        day DATE NOT NULL,
+        product_id INT NOT NULL,
+        sub_category_id INT NOT NULL,
+        category_id INT NOT NULL,
+        revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+        units INT NOT NULL DEFAULT 0,
+        orders INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, product_id)
+    )
+    """,
+]
+
+
+def apply_order(cursor, order_id):
+    """Add one order to every rollup. Run it exactly once per order."""
+    for table, keys, dimensions in _LEVELS:
+        cursor.execute(_aggregate_sql(table, keys, dimensions, "o.id = %s"), (order_id,))
+
+
+def rebuild(cursor):
+    """Recompute every rollup from the order tables."""
+    for table, keys, dimensions in _LEVELS:
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(_aggregate_sql(table, keys, dimensions, "1 = 1"))
@@ -0,0 +1,83 @@
+-- Base schema for the e-commerce API.
+-- Mirrors the (commented) table definitions in models.sql, with the orders
+-- payment columns folded in. Safe to run repeatedly.
+
+CREATE TABLE IF NOT EXISTS users (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(600),
+    email VARCHAR(600) UNIQUE,
+    password VARCHAR(600),
+    role ENUM('admin','user') DEFAULT 'user',
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS categories (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(600) NOT NULL,
+    description TEXT,
+    banner_url VARCHAR(600)  -- banner image for top section
+);
+
+CREATE TABLE IF NOT EXISTS sub_categories (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    category_id INT NOT NULL,
+    name VARCHAR(600) NOT NULL,
+    description TEXT,
+    image_url VARCHAR(600),  -- image shown on category page
+    FOREIGN KEY (category_id) REFERENCES categories(id)
+        ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS products (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(600),
+    description TEXT,
+    price DECIMAL(10,2),
+    stock INT,
+    image_url VARCHAR(600),
+    user_id INT,             -- seller or admin
+    sub_category_id INT,     -- product belongs to subcategory
+    popularity INT NOT NULL DEFAULT 0,  -- units sold, maintained by the order.created job
+    FOREIGN KEY (sub_category_id) REFERENCES sub_categories(id)
+        ON DELETE CASCADE ON UPDATE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+        ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS cart (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_email VARCHAR(255),          -- NULL for guests
+    session_id VARCHAR(600),          -- Used for guest carts
+    product_id INT NOT NULL,
+    quantity INT NOT NULL,
+    added_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    expires_at DATETIME NULL,         -- stock reservation released after this (NULL = never)
+    FOREIGN KEY (product_id) REFERENCES products(id)
+        ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_email VARCHAR(255) NOT NULL,
+    state VARCHAR(100) NOT NULL,
+    city VARCHAR(100) NOT NULL,
+    address TEXT NOT NULL,
+    phone_number VARCHAR(20) NOT NULL,
+    order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    status ENUM('Pending', 'Processing', 'Shipped', 'Delivered', 'Cancelled') DEFAULT 'Pending',
+    payment_method ENUM('card', 'paypal') NOT NULL,
+    payment_status ENUM('Pending', 'Paid', 'Failed') DEFAULT 'Pending',
+    transaction_id VARCHAR(255) NULL,
+    card_last4 CHAR(4) NULL
+);
+
+CREATE TABLE IF NOT EXISTS order_items (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    order_id INT NOT NULL,
+    product_id INT NOT NULL,
+    product_name VARCHAR(255) NOT NULL,
+    quantity INT NOT NULL,
+    price DECIMAL(10,2) NOT NULL,
+    FOREIGN KEY (order_id) REFERENCES orders(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE ON UPDATE CASCADE
+);
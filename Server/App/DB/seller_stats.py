@@ -0,0 +1,87 @@
+"""
+Per-product sales stats for the seller dashboard (a read model).
+
+``seller_product_stats`` holds one row per product that has sold or run out
+of stock, with the seller (``products.user_id``) denormalized for per-seller
+totals. It is updated incrementally:
+
+- ``apply_order``: from the order.created job, once per order
+- ``record_stockout``: in the same transaction as any write that lowers a
+  product's stock, counting the times it hit zero
+
+Current stock and price are read from ``products`` itself (a primary key
+join), so they never go stale here. ``rebuild`` recomputes sales from the
+order tables; stock-out history cannot be reconstructed and is kept.
+"""
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS seller_product_stats (
+        product_id INT PRIMARY KEY,
+        seller_id INT NULL,
+        units_sold INT NOT NULL DEFAULT 0,
+        revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+        orders INT NOT NULL DEFAULT 0,
+        stockouts INT NOT NULL DEFAULT 0,
+        last_sold_at DATETIME NULL,
+        last_stockout_at DATETIME NULL
+    )
+"""
+
+
+def _sales_sql(where):
+    return f"""
+        INSERT INTO seller_product_stats (product_id, seller_id, units_sold, revenue, orders, last_sold_at)
+        SELECT * FROM (
+            SELECT oi.product_id, MAX(p.user_id) AS seller_id,
+                SUM(oi.quantity) AS units_sold,
+                SUM(oi.price * oi.quantity) AS revenue,
+                COUNT(DISTINCT oi.order_id) AS orders,
+                MAX(o.order_date) AS last_sold_at
+            FROM order_items oi
+            JOIN orders o ON o.id = oi.order_id
+            JOIN products p ON p.id = oi.product_id
+            WHERE {where}
+            GROUP BY oi.product_id
+        ) AS s
+        ON DUPLICATE KEY UPDATE
+            seller_id = s.seller_id,
+            units_sold = seller_product_stats.units_sold + s.units_sold,
+            revenue = seller_product_stats.revenue + s.revenue,
+            orders = seller_product_stats.orders + s.orders,
+            last_sold_at = GREATEST(COALESCE(seller_product_stats.last_sold_at, s.last_sold_at), s.last_sold_at)
+    """
+
+
+def apply_order(cursor, order_id):
+    """Add one order's items. Run it exactly once per order."""
+    cursor.execute(_sales_sql("oi.order_id = %s"), (order_id,))
+
+
+def record_stockout(cursor, product_ids):
+    """After lowering stock: count a stock-out for every product now at zero."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    placeholders = ", ".join(["%s"] * len(product_ids))
+    cursor.execute(
+        f"""
+        INSERT INTO seller_product_stats (product_id, seller_id, stockouts, last_stockout_at)
+        SELECT id, user_id, 1, NOW() FROM products
+        WHERE id IN ({placeholders}) AND stock <= 0
+        ON DUPLICATE KEY UPDATE
+            stockouts = seller_product_stats.stockouts + 1,
+            last_stockout_at = NOW()
+        """,
+        product_ids,
+    )
+
+
+def rebuild(cursor):
+    """Recompute the sales columns from the order tables."""
+    cursor.execute(
+        """
+        UPDATE seller_product_stats
+        SET units_sold = 0, revenue = 0, orders = 0, last_sold_at = NULL
+        """
+    )
+    cursor.execute(_sales_sql("1 = 1"))
@@ -0,0 +1,154 @@
+"""
+Registry of hot statements executed as server-side prepared statements.
+
+Each statement is prepared once per pooled connection (binary protocol) and
+its prepared cursor kept on the connection, so later checkouts only send the
+statement id and parameters instead of re-sending and re-parsing the SQL.
+
+    from App.DB import statements
+    product = statements.fetch_one(conn, "product_detail", (product_id,))
+
+Cart statements come in one variant per owner column, picked with
+``cart_statement("cart_item", identifier_col)`` instead of formatting the
+column name into the SQL.
+"""
+import threading
+
+import mysql.connector
+
+_PRODUCT_COLUMNS = """
+    p.id AS product_id,
+    p.name AS product_name,
+    p.description AS product_description,
+    p.price,
+    p.stock,
+    p.image_url
+"""
+
+STATEMENTS = {
+    "product_detail": f"""
+        SELECT {_PRODUCT_COLUMNS},
+            sc.id AS sub_category_id,
+            sc.name AS sub_category_name,
+            c.id AS category_id,
+            c.name AS category_name
+        FROM products p
+        INNER JOIN sub_categories sc ON p.sub_category_id = sc.id
+        INNER JOIN categories c ON sc.category_id = c.id
+        WHERE p.id = %s
+    """,
+    "related_products": f"""
+        SELECT {_PRODUCT_COLUMNS}
+        FROM products p
+        WHERE p.sub_category_id = %s AND p.id != %s
+        LIMIT %s
+    """,
+    "products_by_subcategory": f"""
+        SELECT {_PRODUCT_COLUMNS},
+            p.sub_category_id
+        FROM products p
+        WHERE p.sub_category_id = %s
+    """,
+    "product_row": "SELECT * FROM products WHERE id = %s",
+    "product_stock": "SELECT stock FROM products WHERE id = %s",
+    "user_by_email": "SELECT * FROM users WHERE email = %s",
+    # One branch per owner column: an OR across both columns can't use either index
+    "frequently_bought_with": """
+        SELECT p.id, p.name, p.price, p.image_url
+        FROM (
+            SELECT c2.product_id
+            FROM cart c1 JOIN cart c2 ON c2.session_id = c1.session_id
+            WHERE c1.product_id = %s AND c2.product_id != %s
+            UNION
+            SELECT c2.product_id
+            FROM cart c1 JOIN cart c2 ON c2.user_email = c1.user_email
+            WHERE c1.product_id = %s AND c2.product_id != %s
+        ) together
+        JOIN products p ON p.id = together.product_id
+        LIMIT 3
+    """,
+}
+
+# Owner-scoped cart statements, one per identifier column
+for _col in ("user_email", "session_id"):
+    STATEMENTS[f"cart_item:{_col}"] = f"SELECT * FROM cart WHERE {_col} = %s AND product_id = %s"
+    # Locks the row: the quantity read is the one the caller's stock change is based on
+    STATEMENTS[f"cart_quantity:{_col}"] = (
+        f"SELECT quantity FROM cart WHERE {_col} = %s AND product_id = %s FOR UPDATE"
+    )
+    STATEMENTS[f"cart_items:{_col}"] = f"""
+        SELECT c.product_id as cart_product_id, c.id, c.user_email, c.session_id,
+               p.id AS product_id, p.name, p.price, p.image_url, p.stock, c.quantity
+        FROM cart c
+        JOIN products p ON c.product_id = p.id
+        WHERE c.{_col} = %s
+    """
+
+
+def cart_statement(kind, identifier_col):
+    """Name of the ``kind`` cart statement for owner column ``identifier_col``."""
+    name = f"{kind}:{identifier_col}"
+    if name not in STATEMENTS:
+        raise ValueError(f"Unknown cart owner column: {identifier_col}")
+    return name
+
+
+# ------------------ Stats ------------------
+_stats_lock = threading.Lock()
+_stats = {"prepares": 0, "executions": 0}
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+# ------------------ Execution ------------------
+def _prepared_cursor(conn, name):
+    """Prepared cursor for ``name`` cached on the underlying (pooled) connection."""
+    raw = getattr(conn, "_cnx", None) or conn
+    session = raw.connection_id
+    cache = getattr(raw, "_prepared_cursors", None)
+    if cache is None or cache.get("__session__") != session:
+        # New or reconnected session: statement ids from the old one are gone
+        cache = {"__session__": session}
+        raw._prepared_cursors = cache
+
+    cursor = cache.get(name)
+    if cursor is None:
+        cursor = raw.cursor(prepared=True, dictionary=True)
+        cache[name] = cursor
+        _count("prepares")
+    return cursor
+
+
+def _discard(conn, name):
+    raw = getattr(conn, "_cnx", None) or conn
+    cache = getattr(raw, "_prepared_cursors", None) or {}
+    cache.pop(name, None)
+
+
+def fetch_all(conn, name, params=()):
+    """Execute registered statement ``name`` and return every row as a dict."""
+    sql = STATEMENTS[name]
+    cursor = _prepared_cursor(conn, name)
+    try:
+        cursor.execute(sql, params)
+    except mysql.connector.ProgrammingError:
+        # e.g. the server dropped the statement handle; prepare again once
+        _discard(conn, name)
+        cursor = _prepared_cursor(conn, name)
+        cursor.execute(sql, params)
+    _count("executions")
+    return cursor.fetchall()
+
+
+def fetch_one(conn, name, params=()):
+    """Execute registered statement ``name`` and return the first row, or None."""
+    rows = fetch_all(conn, name, params)
+    return rows[0] if rows else None
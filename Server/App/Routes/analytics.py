@@ -0,0 +1,141 @@
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from App.DB.connection import get_read_connection
+from App.DB import rollups
+from App.Utils import jobs
+from App.Utils.dependencies import get_current_user
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+# Every report reads the daily rollup tables (App/DB/rollups.py), never order_items
+
+
+def _require_admin(user):
+    if not user or user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+
+def _date_range(start, end):
+    """Inclusive dates, defaulting to the last 30 days."""
+    end = end or date.today()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return start, end
+
+
+# =====================
+# Rollup Maintenance
+# =====================
+@jobs.handler("order.created")
+def update_sales_rollups(cursor, payload):
+    rollups.apply_order(cursor, payload["order_id"])
+
+
+# =====================
+# Sales Over Time
+# =====================
+@router.get("/sales")
+def get_sales(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    category_id: Optional[int] = None,
+    sub_category_id: Optional[int] = None,
+    user=Depends(get_current_user),
+):
+    _require_admin(user)
+    start, end = _date_range(start, end)
+
+    if sub_category_id is not None:
+        table, where, params = "sales_daily_subcategory", "AND sub_category_id = %s", [sub_category_id]
+    elif category_id is not None:
+        table, where, params = "sales_daily_subcategory", "AND category_id = %s", [category_id]
+    else:
+        table, where, params = "sales_daily", "", []
+
+    conn = get_read_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            f"""
+            SELECT day, SUM(revenue) AS revenue, SUM(units) AS units, SUM(orders) AS orders
+            FROM {table}
+            WHERE day BETWEEN %s AND %s {where}
+            GROUP BY day
+            ORDER BY day
+            """,
+            [start, end] + params,
+        )
+        days = cursor.fetchall()
+        totals = {
+            "revenue": sum(d["revenue"] for d in days),
+            "units": sum(d["units"] for d in days),
+            # with a category filter, an order spanning several subcategories counts once per subcategory
+            "orders": sum(d["orders"] for d in days),
+        }
+        return {"start": start, "end": end, "totals": totals, "days": days}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching sales: {str(e)}")
+    finally:
+        conn.close()
+
+
+# =====================
+# Top-N Reports
+# =====================
+TOP_DIMENSIONS = {
+    # dimension -> (rollup table, key column, name lookup)
+    "product": ("sales_daily_product", "product_id", "SELECT id, name FROM products WHERE id IN ({ids})"),
+    "sub_category": ("sales_daily_subcategory", "sub_category_id", "SELECT id, name FROM sub_categories WHERE id IN ({ids})"),
+    "category": ("sales_daily_subcategory", "category_id", "SELECT id, name FROM categories WHERE id IN ({ids})"),
+}
+
+
+@router.get("/top")
+def get_top(
+    by: str = Query("product", pattern="^(product|sub_category|category)$"),
+    metric: str = Query("revenue", pattern="^(revenue|units|orders)$"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    category_id: Optional[int] = None,
+    limit: int = Query(10, ge=1, le=100),
+    user=Depends(get_current_user),
+):
+    _require_admin(user)
+    start, end = _date_range(start, end)
+    table, key, names_sql = TOP_DIMENSIONS[by]
+
+    where, params = "", []
+    if category_id is not None:
+        where, params = "AND category_id = %s", [category_id]
+
+    conn = get_read_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            f"""
+            SELECT {key} AS id, SUM(revenue) AS revenue, SUM(units) AS units, SUM(orders) AS orders
+            FROM {table}
+            WHERE day BETWEEN %s AND %s {where}
+            GROUP BY {key}
+            ORDER BY {metric} DESC
+            LIMIT %s
+            """,
+            [start, end] + params + [limit],
+        )
+        rows = cursor.fetchall()
+
+        if rows:
+            ids = [row["id"] for row in rows]
+            cursor.execute(names_sql.format(ids=", ".join(["%s"] * len(ids))), ids)
+            names = {row["id"]: row["name"] for row in cursor.fetchall()}
+            for row in rows:
+                row["name"] = names.get(row["id"])
+
+        return {"start": start, "end": end, "by": by, "metric": metric, "results": rows}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching top {by}: {str(e)}")
+    finally:
+        conn.close()
@@ -1,10 +1,40 @@
+import logging
+import os
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from App.DB.connection import get_connection
+from App.DB import statements
+from App.Utils import jobs
+from App.Utils.cart_store import store
 from App.Utils.dependencies import get_current_user
 from typing import Optional
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
+logger = logging.getLogger(__name__)
+
+# Cart items hold stock from add time; reservations not touched for this long are
+# released by the sweeper below. 0 = never expire.
+GUEST_RESERVATION_MINUTES = int(os.getenv("CART_RESERVATION_MINUTES", "60"))
+USER_RESERVATION_MINUTES = int(os.getenv("CART_USER_RESERVATION_MINUTES", "0"))
+SWEEP_INTERVAL = float(os.getenv("CART_SWEEP_INTERVAL", "60"))
+SWEEP_BATCH = int(os.getenv("CART_SWEEP_BATCH", "500"))
+
+
+def _owner(user, session_id):
+    """The cart's owner: (identifier column, value)."""
+    if user:
+        return "user_email", user["email"]
+    if session_id:
+        return "session_id", session_id
+    raise HTTPException(
+        status_code=400, detail="Login or session_id required for cart"
+    )
+
+
+def _reservation_minutes(identifier_col):
+    """Minutes until the reservation expires, or None (SQL NULL) for no expiry."""
+    minutes = GUEST_RESERVATION_MINUTES if identifier_col == "session_id" else USER_RESERVATION_MINUTES
+    return minutes if minutes > 0 else None
 
 
 class AddToCart(BaseModel):
@@ -20,53 +50,9 @@ def add_to_cart(
     user: Optional[dict] = Depends(get_current_user),
 ):
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
     try:
-
-        # Determine identifier
-        if user:
-            identifier_col = "user_email"
-            identifier_value = user["email"]
-        elif session_id:
-            identifier_col = "session_id"
-            identifier_value = session_id
-        else:
-            raise HTTPException(
-                status_code=400, detail="Login or session_id required for cart"
-            )
-
-        # Validate product & stock
-        cursor.execute("SELECT stock FROM products WHERE id = %s", (item.product_id,))
-        product = cursor.fetchone()
-        if not product:
-            raise HTTPException(status_code=404, detail="Product not found")
-        if product["stock"] < item.quantity:
-            raise HTTPException(status_code=400, detail="Not enough stock available")
-
-        # Update existing or insert new cart item
-        cursor.execute(
-            f"SELECT * FROM cart WHERE {identifier_col}=%s AND product_id=%s",
-            (identifier_value, item.product_id),
-        )
-        existing_item = cursor.fetchone()
-
-        if existing_item:
-            cursor.execute(
-                "UPDATE cart SET quantity = quantity + %s WHERE id = %s",
-                (item.quantity, existing_item["id"]),
-            )
-        else:
-            cursor.execute(
-                f"INSERT INTO cart ({identifier_col}, product_id, quantity) VALUES (%s,%s,%s)",
-                (identifier_value, item.product_id, item.quantity),
-            )
-
-        # Deduct stock
-        cursor.execute(
-            "UPDATE products SET stock = stock - %s WHERE id=%s",
-            (item.quantity, item.product_id),
-        )
-        conn.commit()
+        owner = _owner(user, session_id)
+        store().add(conn, owner, item.product_id, item.quantity, _reservation_minutes(owner[0]))
         return {"message": "Product added to cart"}
 
     except Exception as e:
@@ -82,48 +68,14 @@ def view_cart(
     session_id: Optional[str] = None, user: Optional[dict] = Depends(get_current_user)
 ):
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)  # Debugging line to check request state
     try:
-        # user = getattr(request.state, "user", None)
-
-        if user:
-            identifier_col = "user_email"
-            identifier_value = user["email"]
-        elif session_id:
-            identifier_col = "session_id"
-            identifier_value = session_id
-        else:
-            raise HTTPException(
-                status_code=400, detail="Login or session_id required for cart"
-            )
-
-        cursor.execute(
-            f"""
-            SELECT c.product_id as cart_product_id,c.id,c.user_email,c.session_id,p.id AS product_id, p.name, p.price, p.image_url,p.stock, c.quantity
-            FROM cart c
-            JOIN products p ON c.product_id = p.id
-            WHERE c.{identifier_col} = %s
-        """,
-            (identifier_value,),
-        )
-        cart_items = cursor.fetchall()
+        cart_items = store().items(conn, _owner(user, session_id))
 
         # Add frequently bought with for each cart item
         for item in cart_items:
-            cursor.execute(
-                f"""
-                SELECT DISTINCT p.id, p.name, p.price, p.image_url
-                FROM cart c1
-                JOIN cart c2 
-                  ON (c1.session_id IS NOT NULL AND c1.session_id = c2.session_id)
-                  OR (c1.user_email IS NOT NULL AND c1.user_email = c2.user_email)
-                JOIN products p ON p.id = c2.product_id
-                WHERE c1.product_id=%s AND c2.product_id!=%s
-                LIMIT 3
-            """,
-                (item["product_id"], item["product_id"]),
+            item["frequently_bought_with"] = statements.fetch_all(
+                conn, "frequently_bought_with", (item["product_id"],) * 4
             )
-            item["frequently_bought_with"] = cursor.fetchall()
 
         return {"cart_items": cart_items, "count": len(cart_items)}
 
@@ -141,39 +93,8 @@ def remove_from_cart(
     session_id: Optional[str] = None,
 ):
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
     try:
-
-        if user:
-            identifier_col = "user_email"
-            identifier_value = user["email"]
-        elif session_id:
-            identifier_col = "session_id"
-            identifier_value = session_id
-        else:
-            raise HTTPException(
-                status_code=400, detail="Login or session_id required for cart"
-            )
-
-        # Get item quantity for stock restore
-        cursor.execute(
-            f"SELECT quantity FROM cart WHERE {identifier_col}=%s AND product_id=%s",
-            (identifier_value, product_id),
-        )
-        item = cursor.fetchone()
-        if not item:
-            raise HTTPException(status_code=404, detail="Item not found in cart")
-
-        cursor.execute(
-            f"DELETE FROM cart WHERE {identifier_col}=%s AND product_id=%s",
-            (identifier_value, product_id),
-        )
-        cursor.execute(
-            "UPDATE products SET stock = stock + %s WHERE id = %s",
-            (item["quantity"], product_id),
-        )
-
-        conn.commit()
+        store().remove(conn, _owner(user, session_id), product_id)
         return {"message": "Item removed from cart"}
 
     except Exception as e:
@@ -189,53 +110,9 @@ def update_cart(
     product_id: int, quantity: int, user: Optional[dict] = Depends(get_current_user), session_id: Optional[str] = None
 ):
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
     try:
-
-        if user:
-            identifier_col = "user_email"
-            identifier_value = user["email"]
-        elif session_id:
-            identifier_col = "session_id"
-            identifier_value = session_id
-        else:
-            raise HTTPException(
-                status_code=400, detail="Login or session_id required for cart"
-            )
-
-        # Check current quantity
-        cursor.execute(
-            f"SELECT quantity FROM cart WHERE {identifier_col}=%s AND product_id=%s",
-            (identifier_value, product_id),
-        )
-        existing_item = cursor.fetchone()
-        if not existing_item:
-            raise HTTPException(status_code=404, detail="Item not found in cart")
-
-        old_qty = existing_item["quantity"]
-        diff = quantity - old_qty
-
-        # Adjust stock based on difference
-        if diff > 0:
-            cursor.execute("SELECT stock FROM products WHERE id=%s", (product_id,))
-            stock = cursor.fetchone()["stock"]
-            if stock < diff:
-                raise HTTPException(status_code=400, detail="Not enough stock")
-            cursor.execute(
-                "UPDATE products SET stock = stock - %s WHERE id=%s", (diff, product_id)
-            )
-        elif diff < 0:
-            cursor.execute(
-                "UPDATE products SET stock = stock + %s WHERE id=%s",
-                (-diff, product_id),
-            )
-
-        cursor.execute(
-            f"UPDATE cart SET quantity=%s WHERE {identifier_col}=%s AND product_id=%s",
-            (quantity, identifier_value, product_id),
-        )
-
-        conn.commit()
+        owner = _owner(user, session_id)
+        store().update(conn, owner, product_id, quantity, _reservation_minutes(owner[0]))
         return {"message": "Cart updated"}
 
     except Exception as e:
@@ -251,32 +128,8 @@ def clear_cart(
     user: Optional[dict] = Depends(get_current_user), session_id: Optional[str] = None
 ):
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
     try:
-      
-
-        if user:
-            identifier_col = "user_email"
-            identifier_value = user["email"]
-        elif session_id:
-            identifier_col = "session_id"
-            identifier_value = session_id
-        else:
-            raise HTTPException(
-                status_code=400, detail="Login or session_id required for cart"
-            )
-
-        # Restore stock for all items
-        cursor.execute(
-            f"SELECT product_id, quantity FROM cart WHERE {identifier_col}=%s",
-            (identifier_value,),
-        )
-        items = cursor.fetchall()
-
-        cursor.execute(
-            f"DELETE FROM cart WHERE {identifier_col}=%s", (identifier_value,)
-        )
-        conn.commit()
+        store().clear(conn, _owner(user, session_id))
         return {"message": "Cart cleared"}
 
     except Exception as e:
@@ -284,3 +137,12 @@ def clear_cart(
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         conn.close()
+
+
+# ------------------ Expired Reservations ------------------
+@jobs.periodic(SWEEP_INTERVAL)
+def release_expired_reservations(conn):
+    """Return stock held by expired cart reservations (see the store's release_expired)."""
+    released = store().release_expired(conn, SWEEP_BATCH)
+    if released:
+        logger.info("Released %s expired cart reservation(s)", released)
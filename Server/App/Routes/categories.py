@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
-from App.DB.connection import get_connection
+from typing import Optional
+from App.DB.connection import get_connection, get_read_connection, mark_primary_write
 from App.Utils.dependencies import get_current_user
+from App.Utils.singleflight import coalesce
+from App.Utils import fields as fieldsets, product_cache, suggest, warmup
 
 
 router = APIRouter(prefix="/categories", tags=["Categories & Subcategories"])
@@ -44,6 +47,9 @@ def create_category(data: CategoryCreate, user=Depends(get_current_user)):
             VALUES (%s, %s, %s)
         """, (data.name, data.description, data.banner_url))
         conn.commit()
+        mark_primary_write()
+        suggest.mark_dirty()
+        product_cache.bump_catalog_version()
         return {"message": "Category created successfully", "category_id": cursor.lastrowid}
 
     except Exception as e:
@@ -79,6 +85,9 @@ def create_subcategory(data: SubCategoryCreate, user=Depends(get_current_user)):
             VALUES (%s, %s, %s, %s)
         """, (data.name, data.category_id, data.description, data.image_url))
         conn.commit()
+        mark_primary_write()
+        suggest.mark_dirty()
+        product_cache.bump_catalog_version()
         return {"message": "Subcategory created successfully", "sub_category_id": cursor.lastrowid}
 
     except Exception as e:
@@ -117,6 +126,9 @@ def delete_category(category_id: int, user=Depends(get_current_user)):
         # Delete the category
         cursor.execute("DELETE FROM categories WHERE id=%s", (category_id,))
         conn.commit()
+        mark_primary_write()
+        suggest.mark_dirty()
+        product_cache.bump_catalog_version()
         return {"message": f"Category id {category_id} deleted successfully"}
 
     except Exception as e:
@@ -150,6 +162,9 @@ def delete_subcategory(sub_category_id: int, user=Depends(get_current_user)):
         # Delete the subcategory
         cursor.execute("DELETE FROM sub_categories WHERE id=%s", (sub_category_id,))
         conn.commit()
+        mark_primary_write()
+        suggest.mark_dirty()
+        product_cache.bump_catalog_version()
         return {"message": f"Subcategory id {sub_category_id} deleted successfully"}
 
     except Exception as e:
@@ -162,9 +177,8 @@ def delete_subcategory(sub_category_id: int, user=Depends(get_current_user)):
 # =====================
 # Fetch All Categories with Nested Subcategories
 # =====================
-@router.get("/all")
-def get_all_categories():
-    conn = get_connection()
+def _fetch_all_categories():
+    conn = get_read_connection()
     cursor = conn.cursor(dictionary=True)
     try:
         # Fetch categories
@@ -179,11 +193,23 @@ def get_all_categories():
             category["subcategories"] = cursor.fetchall()
             
         return {"categories": categories, "count": len(categories)}
+    finally:
+        conn.close()
+
+
+@warmup.step("categories")
+def _warm_categories():
+    get_all_categories()
 
+
+@router.get("/all")
+def get_all_categories():
+    try:
+        return product_cache.get_catalog(
+            "categories_all", lambda: coalesce("categories_all", {}, _fetch_all_categories)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching categories: {str(e)}")
-    finally:
-        conn.close()
 
 
 
@@ -193,7 +219,7 @@ def get_all_categories():
 # ====================
 @router.get("/carousel")
 def get_carousel_slides():
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor(dictionary=True)
     try:
         # Fetch subcategories with their parent category name
@@ -214,9 +240,17 @@ def get_carousel_slides():
 
 
 # random categories
-@router.get("/home-sections")
-def get_home_sections(limit_subcats: int = 15, products_per_subcat: int = 10):
-    conn = get_connection()
+HOME_PRODUCT_FIELDS = {
+    "product_id": "id",
+    "product_name": "name",
+    "price": "price",
+    "stock": "stock",
+    "image_url": "image_url",
+}
+
+
+def _fetch_home_sections(limit_subcats, products_per_subcat, product_columns):
+    conn = get_read_connection()
     cursor = conn.cursor(dictionary=True)
     try:
         # 1️⃣ Pick random subcategories
@@ -231,8 +265,8 @@ def get_home_sections(limit_subcats: int = 15, products_per_subcat: int = 10):
 
         # 2️⃣ Attach limited products to each subcategory
         for sub in subcats:
-            cursor.execute("""
-                SELECT id as product_id, name as product_name, price, stock, image_url
+            cursor.execute(f"""
+                SELECT {product_columns}
                 FROM products
                 WHERE sub_category_id = %s
                 ORDER BY RAND() 
@@ -241,18 +275,39 @@ def get_home_sections(limit_subcats: int = 15, products_per_subcat: int = 10):
             sub["products"] = cursor.fetchall()
 
         return {"sections": subcats}
+    finally:
+        conn.close()
 
+
+@router.get("/home-sections")
+def get_home_sections(
+    limit_subcats: int = 15,
+    products_per_subcat: int = 10,
+    fields: Optional[str] = Query(None, description="Comma-separated product fields to return (default: all)"),
+):
+    names = fieldsets.parse(fields, HOME_PRODUCT_FIELDS)
+    try:
+        # Homepage bursts share one random pick instead of 1 + limit_subcats queries each
+        return coalesce(
+            "home_sections",
+            {
+                "limit_subcats": limit_subcats,
+                "products_per_subcat": products_per_subcat,
+                "fields": fieldsets.cache_key(names),
+            },
+            lambda: _fetch_home_sections(
+                limit_subcats, products_per_subcat, fieldsets.select_list(HOME_PRODUCT_FIELDS, names)
+            ),
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating home sections: {str(e)}")
-    finally:
-        conn.close()
 
 
 
 # 
 @router.get("/subcategories/{category_id}")
 def get_subcategories_by_category(category_id: int):
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor(dictionary=True)
     try:
         # Ensure category exists
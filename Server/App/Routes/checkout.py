@@ -1,12 +1,24 @@
 # backend/routes/orders.py
-from fastapi import APIRouter, HTTPException,Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, EmailStr, constr
 from typing import List, Optional
+from datetime import date, timedelta
+import csv
+import io
+import json
+import logging
+import os
+import threading
 from App.Utils.dependencies import get_current_user
 from mysql.connector import Error
-from App.DB.connection import get_connection  # your existing DB connection function
+from App.DB.connection import get_connection, get_read_connection, discard  # your existing DB connection function
+from App.Utils import cart_store, idempotency, jobs
+from App.Utils.notifications import send_email
 
 router = APIRouter(prefix="/order", tags=["Orders"])
+logger = logging.getLogger(__name__)
 
 
 # ---------- MODELS ----------
@@ -30,13 +42,37 @@ class CreateOrder(BaseModel):
 
 
 # ---------- CREATE ORDER ----------
+def _replayed(response):
+    return JSONResponse(content=response, headers={"Idempotent-Replayed": "true"})
+
+
 @router.post("/create")
-def create_order(order: CreateOrder):
+def create_order(
+    order: CreateOrder,
+    session_id: Optional[str] = None,
+    user: Optional[dict] = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, max_length=idempotency.KEY_MAX_LENGTH),
+):
+    # A retried request with the same Idempotency-Key gets the original response back
+    key = fingerprint = None
+    if idempotency_key:
+        key = idempotency.scoped_key(idempotency_key, user["email"] if user else order.user_email)
+        fingerprint = idempotency.fingerprint(order)
+        response = idempotency.cached(key, fingerprint)
+        if response is not None:
+            return _replayed(response)
+
     conn = get_connection()
     cursor = conn.cursor()
-    print(order)
 
     try:
+        if key:
+            # Waits for a concurrent duplicate to finish, then replays it
+            response = idempotency.claim(conn, key, fingerprint)
+            if response is not None:
+                conn.rollback()
+                return _replayed(response)
+
         # 1. Insert into orders table with payment info
         cursor.execute(
             """
@@ -54,30 +90,60 @@ def create_order(order: CreateOrder):
                 order.card_last4,
             ),
         )
-        conn.commit()
-
         order_id = cursor.lastrowid
 
-        # 2. Insert items into order_items table
-        for item in order.items:
-            cursor.execute(
-                """
-                INSERT INTO order_items (order_id, product_id, product_name, quantity, price)
-                VALUES (%s, %s, %s, %s, %s)
-            """,
-                (
-                    order_id,
-                    item.product_id,
-                    item.product_name,
-                    item.quantity,
-                    item.price,
-                ),
-            )
+        # 2. Insert items into order_items table (one multi-row insert)
+        cursor.executemany(
+            """
+            INSERT INTO order_items (order_id, product_id, product_name, quantity, price)
+            VALUES (%s, %s, %s, %s, %s)
+        """,
+            [
+                (order_id, item.product_id, item.product_name, item.quantity, item.price)
+                for item in order.items
+            ],
+        )
+
+        # 3. The ordered cart rows are sold, not abandoned: drop them without
+        #    restoring stock (it was deducted when they were added to the cart)
+        #    Only a cart the caller proves is theirs: the body's user_email is unverified
+        cart_owner = None
+        if user:
+            cart_owner = "user_email", user["email"]
+        elif session_id:
+            cart_owner = "session_id", session_id
+        product_ids = [item.product_id for item in order.items]
+        remove_sold = None
+        if cart_owner and product_ids:
+            remove_sold = cart_store.store().remove_sold(cursor, cart_owner, product_ids)
+
+        # 4. Follow-up work runs in the background, committed atomically with the order.
+        #    The e-mail is its own job: an SMTP outage must not hold back (or repeat) the rest
+        payload = {"order_id": order_id, "user_email": order.user_email}
+        jobs.enqueue(cursor, "order.created", payload)
+        jobs.enqueue(cursor, "order.confirmation_email", payload)
+
+        response = {"message": "Order created successfully", "order_id": order_id}
+        if key:
+            idempotency.complete(cursor, key, response)
 
         conn.commit()
+        jobs.notify()
+        if remove_sold:
+            # Outside the transaction (key-value cart stores): only once the order is in
+            try:
+                remove_sold()
+            except Exception as e:
+                logger.warning("Order %s: removing sold items from the cart failed: %s", order_id, e)
+        if key:
+            idempotency.remember(key, fingerprint, response)
+        logger.info("Order %s created (%s items)", order_id, len(order.items))
 
-        return {"message": "Order created successfully", "order_id": order_id}
+        return response
 
+    except HTTPException:
+        conn.rollback()
+        raise
     except Error as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -86,6 +152,42 @@ def create_order(order: CreateOrder):
         conn.close()
 
 
+# ---------- ORDER FOLLOW-UPS (background jobs) ----------
+@jobs.handler("order.confirmation_email")
+def send_order_confirmation(cursor, payload):
+    cursor.execute(
+        """
+        SELECT COUNT(*) AS items, COALESCE(SUM(price * quantity), 0) AS total
+        FROM order_items WHERE order_id = %s
+        """,
+        (payload["order_id"],),
+    )
+    summary = cursor.fetchone()
+    send_email(
+        payload["user_email"],
+        f"Your order #{payload['order_id']} has been placed",
+        f"Thanks for shopping with us! Your order #{payload['order_id']} "
+        f"({summary['items']} item(s), total {summary['total']}) is being processed.",
+    )
+
+
+@jobs.handler("order.created")
+def update_popularity(cursor, payload):
+    # Commits together with the job's done mark, so each order is counted once
+    cursor.execute(
+        """
+        UPDATE products p
+        JOIN (
+            SELECT product_id, SUM(quantity) AS sold
+            FROM order_items WHERE order_id = %s
+            GROUP BY product_id
+        ) oi ON oi.product_id = p.id
+        SET p.popularity = p.popularity + oi.sold
+        """,
+        (payload["order_id"],),
+    )
+
+
 # ---------- GET ALL ORDERS FOR A USER ----------
 @router.get("/orders/{user_email}")
 def get_orders(user_email: str):
@@ -161,3 +263,142 @@ def get_all_orders(user=Depends(get_current_user)):
     finally:
         cursor.close()
         conn.close()
+
+
+# ---------- EXPORT ORDERS (ADMIN, STREAMING) ----------
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "2"))
+EXPORT_CHUNK_ROWS = 1000  # rows rendered per chunk sent to the client
+_export_slots = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+
+_EXPORT_ORDER_COLUMNS = [
+    "order_id", "order_date", "user_email", "status", "payment_method", "payment_status",
+    "transaction_id", "card_last4", "state", "city", "address", "phone_number",
+]
+_EXPORT_ITEM_COLUMNS = ["product_id", "product_name", "quantity", "price"]
+
+
+def _export_rows(start, end):
+    """Yield (order id, row dict) from one ordered join, read incrementally from the server."""
+    conn = get_read_connection()
+    cursor = conn.cursor(dictionary=True)  # unbuffered: rows stay on the server until fetched
+    finished = False
+    try:
+        # A slow client can pause reads for a while; don't let the server give up on us
+        cursor.execute("SET SESSION net_write_timeout = 600")
+        cursor.execute(
+            """
+            SELECT o.id AS order_id, o.order_date, o.user_email, o.status, o.payment_method,
+                   o.payment_status, o.transaction_id, o.card_last4, o.state, o.city,
+                   o.address, o.phone_number,
+                   oi.product_id, oi.product_name, oi.quantity, oi.price
+            FROM orders o
+            JOIN order_items oi ON oi.order_id = o.id
+            WHERE o.order_date >= %s AND o.order_date < %s
+            ORDER BY o.order_date, o.id
+            """,
+            (start, end),
+        )
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+            if not rows:
+                break
+            yield rows
+        finished = True
+        cursor.execute("SET SESSION net_write_timeout = DEFAULT")
+    finally:
+        if finished:
+            conn.close()
+        else:
+            # Client went away mid-export: the rest of the result is still on the wire
+            discard(conn)
+
+
+def _export_csv(start, end):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=_EXPORT_ORDER_COLUMNS + _EXPORT_ITEM_COLUMNS)
+    writer.writeheader()
+    for rows in _export_rows(start, end):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _export_ndjson(start, end):
+    # One object per order; rows arrive grouped by order, so only one order is held at a time
+    order = None
+    for rows in _export_rows(start, end):
+        lines = []
+        for row in rows:
+            if order is None or order["order_id"] != row["order_id"]:
+                if order is not None:
+                    lines.append(json.dumps(order, default=str))
+                order = {column: row[column] for column in _EXPORT_ORDER_COLUMNS}
+                order["items"] = []
+            order["items"].append({column: row[column] for column in _EXPORT_ITEM_COLUMNS})
+        if lines:
+            yield "\n".join(lines) + "\n"
+    if order is not None:
+        yield json.dumps(order, default=str) + "\n"
+
+
+def _slot_releaser():
+    """Release the slot the caller acquired, however many times this is called."""
+    lock = threading.Lock()
+    released = False
+
+    def release():
+        nonlocal released
+        with lock:
+            if released:
+                return
+            released = True
+        _export_slots.release()
+
+    return release
+
+
+def _release_after(chunks, release):
+    try:
+        yield from chunks
+    finally:
+        release()
+
+
+@router.get("/export")
+def export_orders(
+    start: Optional[date] = Query(None, description="First order date to include"),
+    end: Optional[date] = Query(None, description="Last order date to include"),
+    file_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    user=Depends(get_current_user),
+):
+    if not user or user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    start_at = start or date(1970, 1, 1)
+    end_before = (end or date.today()) + timedelta(days=1)
+
+    # Each export holds a database connection for its whole duration
+    if not _export_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=429,
+            detail="Too many exports running. Please try again later.",
+            headers={"Retry-After": "30"},
+        )
+
+    if file_format == "csv":
+        chunks, media_type = _export_csv(start_at, end_before), "text/csv"
+    else:
+        chunks, media_type = _export_ndjson(start_at, end_before), "application/x-ndjson"
+    filename = f"orders-{start_at}-{end_before - timedelta(days=1)}.{file_format}"
+    # The stream releases the slot when it ends; the background task covers a
+    # client that disconnects before the body is ever iterated
+    release = _slot_releaser()
+    # A sync generator: Starlette iterates it in the thread pool, off the event loop
+    return StreamingResponse(
+        _release_after(chunks, release),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        background=BackgroundTask(release),
+    )
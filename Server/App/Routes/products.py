@@ -1,15 +1,23 @@
 from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File
-from pydantic import BaseModel
-from App.DB.connection import get_connection
+from pydantic import BaseModel, ValidationError
+from mysql.connector import Error
+from App.DB.connection import get_connection, get_read_connection, mark_primary_write
+from App.DB import seller_stats, statements
 from App.Utils.dependencies import get_current_user
+from App.Utils.rate_limit import rate_limit
+from App.Utils.singleflight import coalesce
+from App.Utils import fields as fieldsets, jobs, product_cache, shared_cache, suggest, trigram, warmup
 from typing import Optional, List, Tuple
+from decimal import Decimal
+import base64
+import csv
+import io
+import json
 import os
 import logging
 from uuid import uuid4
 from fastapi.responses import JSONResponse
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/products", tags=["Products"])
@@ -42,7 +50,6 @@ class ProductUpdate(BaseModel):
 def create_product(product: Product, user=Depends(get_current_user)):
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
-    print(product)
     try:
         if user["role"] not in ["admin", "user"]:
             raise HTTPException(status_code=403, detail="Permission denied")
@@ -74,6 +81,11 @@ def create_product(product: Product, user=Depends(get_current_user)):
             ),
         )
         conn.commit()
+        mark_primary_write()
+        suggest.mark_dirty()
+        product_cache.bump_catalog_version()
+        trigram.add_product(cursor.lastrowid, product.name)
+        logger.info("Product %s created by user %s", cursor.lastrowid, user["id"])
 
         return {
             "message": "Product created successfully",
@@ -87,26 +99,229 @@ def create_product(product: Product, user=Depends(get_current_user)):
         conn.close()
 
 
+# =====================
+# Bulk Import (CSV / NDJSON)
+# =====================
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))  # rows per multi-row INSERT
+IMPORT_TRANSACTION_ROWS = int(os.getenv("IMPORT_TRANSACTION_ROWS", "5000"))  # rows per commit
+IMPORT_MAX_REPORTED_ERRORS = 1000
+IMPORT_DEADLOCK_RETRIES = 3
+
+_DEADLOCK = 1213  # InnoDB rolls back the whole transaction, not just the statement
+
+_IMPORT_INSERT = "INSERT INTO products (name, description, price, stock, image_url, sub_category_id, user_id) VALUES "
+
+
+def _import_records(file, fmt):
+    """Yield (row number, dict or None, parse error or None) without reading the whole upload."""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        for number, record in enumerate(csv.DictReader(text), start=1):
+            yield number, record, None
+        return
+    number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield number, None, "Expected a JSON object"
+            continue
+        yield number, record, None
+
+
+def _insert_import_batch(cursor, batch, user_id, errors):
+    """Insert ``batch`` as one statement; if the database rejects it, retry row by row.
+
+    Deadlocks are raised: the transaction is gone and the caller must replay it.
+    """
+    values = [
+        (p.name, p.description, p.price, p.stock, p.image_url, p.sub_category_id, user_id)
+        for _, p in batch
+    ]
+    try:
+        cursor.execute(
+            _IMPORT_INSERT + ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(values)),
+            [v for row in values for v in row],
+        )
+        return len(values)
+    except Error as e:
+        if e.errno == _DEADLOCK:
+            raise
+        # Other errors roll back only the failed statement; the transaction is still usable
+        inserted = 0
+        for (number, _), row in zip(batch, values):
+            try:
+                cursor.execute(_IMPORT_INSERT + "(%s, %s, %s, %s, %s, %s, %s)", row)
+                inserted += 1
+            except Error as e:
+                if e.errno == _DEADLOCK:
+                    raise
+                errors.append({"row": number, "error": str(e)})
+        return inserted
+
+
+@router.post("/import")
+def import_products(
+    file: UploadFile = File(...),
+    file_format: Optional[str] = Query(None, alias="format", description="csv or ndjson; defaults to the file extension"),
+    user=Depends(get_current_user),
+):
+    if not user or user["role"] not in ["admin", "user"]:
+        raise HTTPException(status_code=403, detail="Permission denied")
+
+    fmt = (file_format or os.path.splitext(file.filename or "")[1].lstrip(".")).lower()
+    fmt = {"jsonl": "ndjson", "json": "ndjson"}.get(fmt, fmt)
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Upload a .csv or .ndjson file, or pass format=csv|ndjson")
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    imported, failed, pending = 0, 0, 0
+    errors = []
+    try:
+        # Validate subcategories from one lookup instead of a query per row
+        cursor.execute("SELECT id FROM sub_categories")
+        sub_category_ids = {row[0] for row in cursor.fetchall()}
+
+        def record_error(number, message):
+            nonlocal failed
+            failed += 1
+            if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+                errors.append({"row": number, "error": message})
+
+        # Batches of the open transaction, their row errors: reported once committed
+        chunk, chunk_errors = [], []
+
+        def commit():
+            nonlocal imported, pending
+            conn.commit()
+            imported += pending
+            pending = 0
+            for error in chunk_errors:
+                record_error(error["row"], error["error"])
+            chunk.clear()
+            chunk_errors.clear()
+
+        def replay():
+            """After a deadlock rolled the transaction back: insert its batches again."""
+            nonlocal pending
+            for _ in range(IMPORT_DEADLOCK_RETRIES):
+                conn.rollback()
+                pending = 0
+                chunk_errors.clear()
+                try:
+                    for batch in chunk:
+                        pending += _insert_import_batch(cursor, batch, user["id"], chunk_errors)
+                    return
+                except Error as e:
+                    if e.errno != _DEADLOCK:
+                        raise
+            conn.rollback()
+            pending = 0
+            chunk_errors.clear()
+            for batch in chunk:
+                for number, _ in batch:
+                    record_error(number, "Not imported: the transaction kept deadlocking")
+            chunk.clear()
+
+        def flush(batch):
+            nonlocal pending
+            chunk.append(batch)
+            try:
+                pending += _insert_import_batch(cursor, batch, user["id"], chunk_errors)
+            except Error as e:
+                if e.errno != _DEADLOCK:
+                    raise
+                replay()
+            # Bounded transactions: locks and undo stay small, progress survives a failure later on
+            if pending >= IMPORT_TRANSACTION_ROWS:
+                commit()
+
+        batch = []
+        for number, record, parse_error in _import_records(file.file, fmt):
+            if parse_error:
+                record_error(number, parse_error)
+                continue
+            try:
+                product = Product.model_validate(record)
+            except ValidationError as e:
+                record_error(number, "; ".join(
+                    f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+                ))
+                continue
+            if product.sub_category_id not in sub_category_ids:
+                record_error(number, f"Subcategory {product.sub_category_id} not found")
+                continue
+            batch.append((number, product))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+        commit()
+
+    except (csv.Error, UnicodeDecodeError) as e:
+        # Keep the rows read before the file became unreadable, the unflushed batch too
+        if batch:
+            flush(batch)
+        commit()
+        raise HTTPException(
+            status_code=400, detail=f"Unreadable upload after {imported} imported row(s): {str(e)}"
+        )
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Error importing products: {str(e)}")
+    finally:
+        if imported:
+            mark_primary_write()
+            product_cache.bump_catalog_version()
+            suggest.mark_dirty()
+        conn.close()
+
+    return {
+        "message": "Import finished",
+        "imported": imported,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": failed > len(errors),
+    }
+
+
 # =====================
 # Fetch All Products (Paginated)
 # =====================
+ALL_PRODUCT_FIELDS = {
+    "product_id": "p.id",
+    "product_name": "p.name",
+    "product_description": "p.description",
+    "price": "p.price",
+    "stock": "p.stock",
+    "image_url": "p.image_url",
+    "user_id": "p.user_id",
+    "user_role": "u.role",
+}
+FIELDS_DESCRIPTION = "Comma-separated fields to return (default: all), e.g. product_id,product_name,price,image_url"
+
+
 @router.get("/allproducts")
-def get_all_products():
-    conn = get_connection()
+def get_all_products(fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)):
+    names = fieldsets.parse(fields, ALL_PRODUCT_FIELDS)
+    # The users join is only needed for user_role
+    join = "LEFT JOIN users u ON p.user_id = u.id" if names is None or "user_role" in names else ""
+    conn = get_read_connection()
     cursor = conn.cursor(dictionary=True)
     try:
         cursor.execute(
-            """
-            SELECT p.id as product_id,
-            p.name AS product_name,
-            p.description AS product_description,
-            p.price,
-            p.stock,
-            p.image_url,
-            p.user_id,
-            u.role AS user_role
+            f"""
+            SELECT {fieldsets.select_list(ALL_PRODUCT_FIELDS, names)}
             FROM products p
-            LEFT JOIN users u ON p.user_id = u.id
+            {join}
             """
         )
         results = cursor.fetchall()
@@ -122,26 +337,35 @@ def get_all_products():
 # =====================
 # Product Details
 # =====================
+SUBCATEGORY_PRODUCT_FIELDS = {
+    "product_id": "p.id",
+    "product_name": "p.name",
+    "product_description": "p.description",
+    "price": "p.price",
+    "stock": "p.stock",
+    "image_url": "p.image_url",
+    "sub_category_id": "p.sub_category_id",
+}
+
+
 @router.get("/getproductsbyid/{sub_category_id}")
-def get_product_details(sub_category_id: int):
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+def get_product_details(sub_category_id: int, fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)):
+    names = fieldsets.parse(fields, SUBCATEGORY_PRODUCT_FIELDS)
+    conn = get_read_connection()
     try:
-        cursor.execute(
-            """
-            SELECT p.id as product_id,
-            p.name AS product_name,
-            p.description AS product_description,
-            p.price,
-            p.stock,
-            p.image_url,
-            p.sub_category_id
-            FROM products p
-            WHERE p.sub_category_id = %s
-        """,
-            (sub_category_id,),
-        )
-        product = cursor.fetchall()
+        if names is None:
+            product = statements.fetch_all(conn, "products_by_subcategory", (sub_category_id,))
+        else:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                f"""
+                SELECT {fieldsets.select_list(SUBCATEGORY_PRODUCT_FIELDS, names)}
+                FROM products p
+                WHERE p.sub_category_id = %s
+                """,
+                (sub_category_id,),
+            )
+            product = cursor.fetchall()
         if not product:
             raise HTTPException(status_code=404, detail="Products not found")
         return {"products": product}
@@ -151,6 +375,202 @@ def get_product_details(sub_category_id: int):
         conn.close()
 
 
+# =====================
+# Product Listing (filters, sorting, facets)
+# =====================
+# sort name -> (column, descending); ties are broken by id in the same direction
+LISTING_SORTS = {
+    "newest": ("p.id", True),
+    "price_asc": ("p.price", False),
+    "price_desc": ("p.price", True),
+    "popularity": ("p.popularity", True),
+}
+PRICE_BUCKETS = [25, 50, 100, 250, 500, 1000]  # bucket upper bounds, last bucket is open-ended
+
+
+def _encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def _decode_cursor(cursor_value, column):
+    try:
+        last_value, last_id = json.loads(base64.urlsafe_b64decode(cursor_value.encode()))
+        if last_value is None and column == "p.price":
+            return None, int(last_id)  # products.price is nullable
+        # prices travel as strings; compare them as DECIMAL so the index range stays exact
+        return (Decimal(last_value) if column == "p.price" else int(last_value)), int(last_id)
+    except (ValueError, TypeError, ArithmeticError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after_cursor(column, descending, last_value, last_id):
+    """Keyset predicate (and params) for rows strictly after (``last_value``, ``last_id``).
+
+    MySQL sorts NULLs first ascending and last descending; the NULL branches
+    keep those rows reachable without wrapping the indexed column in COALESCE.
+    """
+    op = "<" if descending else ">"
+    if column == "p.id":
+        return f"p.id {op} %s", [last_id]
+    if last_value is None:
+        tie = f"({column} IS NULL AND p.id {op} %s)"
+        return (tie, [last_id]) if descending else (f"({tie} OR {column} IS NOT NULL)", [last_id])
+    after = f"{column} {op} %s OR ({column} = %s AND p.id {op} %s)"
+    if descending:
+        after += f" OR {column} IS NULL"
+    return f"({after})", [last_value, last_value, last_id]
+
+
+def _listing_filters(filters, skip=None):
+    """WHERE clause and params for the listing filters, leaving out the ``skip`` facet."""
+    clauses, params = [], []
+    if filters["sub_category_id"] is not None and skip != "sub_category":
+        clauses.append("p.sub_category_id = %s")
+        params.append(filters["sub_category_id"])
+    if filters["category_id"] is not None:
+        clauses.append("p.sub_category_id IN (SELECT id FROM sub_categories WHERE category_id = %s)")
+        params.append(filters["category_id"])
+    if filters["seller_id"] is not None:
+        clauses.append("p.user_id = %s")
+        params.append(filters["seller_id"])
+    if filters["min_price"] is not None and skip != "price":
+        clauses.append("p.price >= %s")
+        params.append(filters["min_price"])
+    if filters["max_price"] is not None and skip != "price":
+        clauses.append("p.price <= %s")
+        params.append(filters["max_price"])
+    if filters["in_stock"]:
+        clauses.append("p.stock > 0")
+    return " AND ".join(clauses) or "1 = 1", params
+
+
+def _fetch_listing_facets(filters):
+    """Counts per subcategory and price bucket. Each facet ignores its own filter."""
+    conn = get_read_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        where, params = _listing_filters(filters, skip="sub_category")
+        cursor.execute(
+            f"""
+            SELECT p.sub_category_id, sc.name AS sub_category_name, COUNT(*) AS count
+            FROM products p
+            JOIN sub_categories sc ON sc.id = p.sub_category_id
+            WHERE {where}
+            GROUP BY p.sub_category_id, sc.name
+            ORDER BY count DESC
+            """,
+            params,
+        )
+        sub_categories = cursor.fetchall()
+
+        where, params = _listing_filters(filters, skip="price")
+        bounds = ", ".join(str(b) for b in PRICE_BUCKETS)
+        cursor.execute(
+            f"""
+            SELECT INTERVAL(p.price, {bounds}) AS bucket, COUNT(*) AS count
+            FROM products p
+            WHERE {where}
+            GROUP BY bucket
+            """,
+            params,
+        )
+        counts = {row["bucket"]: row["count"] for row in cursor.fetchall()}
+        edges = [0] + PRICE_BUCKETS + [None]
+        price_buckets = [
+            {"min": edges[i], "max": edges[i + 1], "count": counts.get(i, 0)}
+            for i in range(len(PRICE_BUCKETS) + 1)
+        ]
+        return {"sub_categories": sub_categories, "price_buckets": price_buckets}
+    finally:
+        conn.close()
+
+
+def _listing_facets(filters):
+    key = tuple(sorted(filters.items()))
+    cached = product_cache.facets.get(key, None)
+    if cached is None:
+        cached = coalesce("listing_facets", filters, lambda: _fetch_listing_facets(filters))
+        product_cache.facets.set(key, cached)
+    return cached
+
+
+@router.get("/listing")
+def list_products(
+    category_id: Optional[int] = None,
+    sub_category_id: Optional[int] = None,
+    seller_id: Optional[int] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: bool = False,
+    sort: str = "newest",
+    limit: int = Query(24, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    facets: bool = Query(True, description="Include facet counts"),
+):
+    if sort not in LISTING_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(LISTING_SORTS)}")
+    filters = {
+        "category_id": category_id,
+        "sub_category_id": sub_category_id,
+        "seller_id": seller_id,
+        "min_price": min_price,
+        "max_price": max_price,
+        "in_stock": in_stock,
+    }
+    column, descending = LISTING_SORTS[sort]
+    where, params = _listing_filters(filters)
+
+    # Keyset pagination: continue strictly after the last (sort value, id) seen
+    if cursor:
+        predicate, cursor_params = _after_cursor(column, descending, *_decode_cursor(cursor, column))
+        where += f" AND {predicate}"
+        params.extend(cursor_params)
+
+    direction = "DESC" if descending else "ASC"
+    order_by = f"{column} {direction}" if column == "p.id" else f"{column} {direction}, p.id {direction}"
+
+    conn = get_read_connection()
+    db_cursor = conn.cursor(dictionary=True)
+    try:
+        db_cursor.execute(
+            f"""
+            SELECT p.id AS product_id,
+                p.name AS product_name,
+                p.description AS product_description,
+                p.price,
+                p.stock,
+                p.image_url,
+                p.sub_category_id,
+                p.popularity
+            FROM products p
+            WHERE {where}
+            ORDER BY {order_by}
+            LIMIT %s
+            """,
+            params + [limit + 1],
+        )
+        rows = db_cursor.fetchall()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching products: {str(e)}")
+    finally:
+        conn.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        sort_key = {"p.id": "product_id", "p.price": "price", "p.popularity": "popularity"}[column]
+        next_cursor = _encode_cursor([last[sort_key], last["product_id"]])
+
+    response = {"products": rows, "next_cursor": next_cursor}
+    if facets:
+        try:
+            response["facets"] = _listing_facets(filters)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error fetching facets: {str(e)}")
+    return response
+
+
 # =====================
 # Update Product
 # =====================
@@ -159,8 +579,7 @@ def update_product(data: ProductUpdate, user=Depends(get_current_user)):
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM products WHERE id=%s", (data.product_id,))
-        product = cursor.fetchone()
+        product = statements.fetch_one(conn, "product_row", (data.product_id,))
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
 
@@ -183,7 +602,12 @@ def update_product(data: ProductUpdate, user=Depends(get_current_user)):
                 data.product_id,
             ),
         )
+        if product["stock"] > 0 and data.stock <= 0:
+            seller_stats.record_stockout(cursor, [data.product_id])
         conn.commit()
+        mark_primary_write()
+        product_cache.invalidate_product(data.product_id)
+        product_cache.bump_catalog_version()
 
         return {"message": "Product updated successfully"}
 
@@ -203,8 +627,7 @@ def delete_product(product_id: int, user=Depends(get_current_user)):
     cursor = conn.cursor(dictionary=True)
     try:
         # Check if product exists
-        cursor.execute("SELECT * FROM products WHERE id=%s", (product_id,))
-        product = cursor.fetchone()
+        product = statements.fetch_one(conn, "product_row", (product_id,))
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
 
@@ -247,11 +670,15 @@ def delete_product(product_id: int, user=Depends(get_current_user)):
         # Delete the product
         cursor.execute("DELETE FROM products WHERE id=%s", (product_id,))
         conn.commit()
+        mark_primary_write()
+        product_cache.invalidate_product(product_id)
+        product_cache.bump_catalog_version()
+        suggest.remove_product(product_id)
+        trigram.remove_product(product_id)
+        shared_cache.publish("product.deleted", product_id=product_id)
 
         # Log the deletion
-        logger.info(
-            f"Product {product_id} deleted by user {user['email'] if user else 'Unknown'}"
-        )
+        logger.info("Product %s deleted by user %s", product_id, user["id"] if user else "unknown")
 
         return {"message": "Product deleted successfully"}
 
@@ -260,7 +687,7 @@ def delete_product(product_id: int, user=Depends(get_current_user)):
         raise he
     except Exception as e:
         conn.rollback()
-        logger.error(f"Error deleting product {product_id}: {str(e)}")
+        logger.error("Error deleting product %s: %s", product_id, e)
         raise HTTPException(status_code=500, detail=f"Error deleting product: {str(e)}")
     finally:
         conn.close()
@@ -330,12 +757,51 @@ def is_category_search(keyword, categories, subcategories, threshold=0.6):
     return False
 
 
-@router.get("/search")
-def search_products(keyword: str = Query(..., min_length=1)):
+SEARCH_FIELDS = {
+    "product_id": "p.id",
+    "product_name": "p.name",
+    "product_description": "p.description",
+    "price": "p.price",
+    "stock": "p.stock",
+    "image_url": "p.image_url",
+    "sub_category_id": "sc.id",
+    "sub_category_name": "sc.name",
+    "category_id": "c.id",
+    "category_name": "c.name",
+}
+
+
+@router.get("/search", dependencies=[Depends(rate_limit("search"))])
+def search_products(
+    keyword: str = Query(..., min_length=1),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+):
+    # product_id is always returned: fuzzy matching and the stock overlay key on it
+    names = fieldsets.parse(fields, SEARCH_FIELDS, required=("product_id",))
+    fields_key = fieldsets.cache_key(names)
+    # Case and spacing don't change the results, so they share one cache entry
+    keyword = product_cache.normalize_keyword(keyword) or keyword
+    cached = product_cache.get_search(keyword, fields_key)
+    if cached is not None:
+        return cached
+
+    version = product_cache.catalog_version
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        response = coalesce(
+            "search",
+            {"keyword": keyword, "fields": fields_key},
+            lambda: _search_products(keyword, fieldsets.select_list(SEARCH_FIELDS, names)),
+        )
+    except Exception as e:
+        return {"error": str(e)}
+    product_cache.put_search(keyword, version, response, fields_key)
+    return response
 
+
+def _search_products(keyword, columns):
+    conn = get_read_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
         # Get all categories and subcategories for analysis
         cursor.execute("SELECT id, name, description FROM categories")
         categories = cursor.fetchall()
@@ -352,18 +818,9 @@ def search_products(keyword: str = Query(..., min_length=1)):
 
         if search_type == "category":
             # Category search - search in categories and subcategories
-            query = """
+            query = f"""
             SELECT
-                p.id as product_id,
-                p.name AS product_name,
-                p.description AS product_description,
-                p.price,
-                p.stock,
-                p.image_url,
-                sc.id as sub_category_id,
-                sc.name AS sub_category_name,
-                c.id as category_id,
-                c.name AS category_name
+                {columns}
             FROM categories c
             INNER JOIN sub_categories sc
                 ON c.id = sc.category_id
@@ -383,18 +840,9 @@ def search_products(keyword: str = Query(..., min_length=1)):
             products = cursor.fetchall()
         else:
             # Product search - search directly in product names
-            query = """
+            query = f"""
             SELECT
-                p.id as product_id,
-                p.name AS product_name,
-                p.description AS product_description,
-                p.price,
-                p.stock,
-                p.image_url,
-                sc.id as sub_category_id,
-                sc.name AS sub_category_name,
-                c.id as category_id,
-                c.name AS category_name
+                {columns}
             FROM products p
             INNER JOIN sub_categories sc
                 ON p.sub_category_id = sc.id
@@ -418,56 +866,38 @@ def search_products(keyword: str = Query(..., min_length=1)):
             )
             products = cursor.fetchall()
 
-            # If no exact or close matches, try fuzzy matching
+            # If no exact or close matches, try fuzzy matching on the trigram index
             if len(products) < 5:
-                # Get all products for fuzzy matching
-                cursor.execute(
-                    """
-                    SELECT
-                        p.id as product_id,
-                        p.name AS product_name,
-                        p.description AS product_description,
-                        p.price,
-                        p.stock,
-                        p.image_url,
-                        sc.id as sub_category_id,
-                        sc.name AS sub_category_name,
-                        c.id as category_id,
-                        c.name AS category_name
-                    FROM products p
-                    INNER JOIN sub_categories sc
-                        ON p.sub_category_id = sc.id
-                    INNER JOIN categories c
-                        ON sc.category_id = c.id
-                """
-                )
-                all_products = cursor.fetchall()
-
-                # Create a set of existing product IDs to prevent duplicates
                 existing_product_ids = {product["product_id"] for product in products}
-
-                # Add fuzzy matches
-                fuzzy_matches = []
-                for product in all_products:
-                    similarity = calculate_similarity(keyword, product["product_name"])
-                    if similarity > 0.5:  # Adjust threshold as needed
-                        product["similarity"] = similarity
-                        fuzzy_matches.append(product)
-
-                # Sort by similarity and add to results
-                fuzzy_matches.sort(key=lambda x: x["similarity"], reverse=True)
-                for match in fuzzy_matches:
-                    # Only add if not already in results
-                    if match["product_id"] not in existing_product_ids:
-                        products.append(match)
-                        existing_product_ids.add(
-                            match["product_id"]
-                        )  # Add to set to prevent future duplicates
-                        if len(products) >= 20:  # Limit results
-                            break
-
-        cursor.close()
-        conn.close()
+                matches = [
+                    (product_id, similarity)
+                    for product_id, similarity in (trigram.search(keyword, limit=20) or [])
+                    if product_id not in existing_product_ids
+                ][: 20 - len(products)]
+
+                if matches:
+                    similarities = dict(matches)
+                    placeholders = ", ".join(["%s"] * len(matches))
+                    cursor.execute(
+                        f"""
+                        SELECT
+                            {columns}
+                        FROM products p
+                        INNER JOIN sub_categories sc
+                            ON p.sub_category_id = sc.id
+                        INNER JOIN categories c
+                            ON sc.category_id = c.id
+                        WHERE p.id IN ({placeholders})
+                    """,
+                        tuple(similarities),
+                    )
+                    fuzzy_matches = cursor.fetchall()
+                    for match in fuzzy_matches:
+                        match["similarity"] = similarities[match["product_id"]]
+
+                    # Sort by similarity and add to results
+                    fuzzy_matches.sort(key=lambda x: x["similarity"], reverse=True)
+                    products.extend(fuzzy_matches)
 
         if not products:
             return {
@@ -481,16 +911,24 @@ def search_products(keyword: str = Query(..., min_length=1)):
             "search_type": search_type,
         }
 
-    except Exception as e:
-        return {"error": str(e)}
+    finally:
+        conn.close()
+
+
+# =====================
+# Autocomplete
+# =====================
+@router.get("/suggest")
+def suggest_products(q: str = Query(..., min_length=1), limit: int = Query(8, ge=1, le=suggest.TOP_K)):
+    # Served from the in-memory prefix index, no database round trip
+    return {"suggestions": suggest.suggest(q, limit)}
 
 
 # =====================
 # Trending Products (Homepage)
 # =====================
-@router.get("/trending")
-def get_trending_products(limit: int = 6):
-    conn = get_connection()
+def _fetch_trending(limit):
+    conn = get_read_connection()
     cursor = conn.cursor(dictionary=True)
     try:
         cursor.execute(
@@ -505,74 +943,130 @@ def get_trending_products(limit: int = 6):
             (limit,),
         )
         return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+@warmup.step("trending")
+def _warm_trending():
+    get_trending_products()
+
+
+@router.get("/trending")
+def get_trending_products(limit: int = 6):
+    try:
+        return product_cache.get_catalog(
+            ("trending", limit),
+            lambda: coalesce("trending", {"limit": limit}, lambda: _fetch_trending(limit)),
+            ttl=product_cache.TRENDING_TTL,
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error fetching trending products: {str(e)}"
         )
-    finally:
-        conn.close()
 
 
-@router.get("/getproductbyid/{product_id}")
-def get_product_by_id(product_id: int, limit_related: int = Query(4, description="Number of related products to fetch")):
+def _fetch_product_detail(product_id, limit_related):
+    conn = get_read_connection()
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-
         # Get the main product
-        query = """
-        SELECT 
-            p.id AS product_id,
-            p.name AS product_name,
-            p.description AS product_description,
-            p.price,
-            p.stock,
-            p.image_url,
-            sc.id AS sub_category_id,
-            sc.name AS sub_category_name,
-            c.id AS category_id,
-            c.name AS category_name
-        FROM products p
-        INNER JOIN sub_categories sc ON p.sub_category_id = sc.id
-        INNER JOIN categories c ON sc.category_id = c.id
-        WHERE p.id = %s
-        """
-
-        cursor.execute(query, (product_id,))
-        product = cursor.fetchone()
-
+        product = statements.fetch_one(conn, "product_detail", (product_id,))
         if not product:
-            return {"message": f"No product found with ID {product_id}."}
-            
-        # Get related products from the same sub-category
-        related_query = """
-        SELECT 
-            p.id AS product_id,
-            p.name AS product_name,
-            p.description AS product_description,
-            p.price,
-            p.stock,
-            p.image_url
-        FROM products p
-        WHERE p.sub_category_id = %s AND p.id != %s
-        LIMIT %s
-        """
-        
-        cursor.execute(related_query, (product["sub_category_id"], product_id, limit_related))
-        related_products = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
+            return None
 
+        # Get related products from the same sub-category
+        related_products = statements.fetch_all(
+            conn, "related_products", (product["sub_category_id"], product_id, limit_related)
+        )
         return {
             "product": product,
             "related_products": related_products
         }
+    finally:
+        conn.close()
+
+
+@router.get("/getproductbyid/{product_id}")
+def get_product_by_id(product_id: int, limit_related: int = Query(4, description="Number of related products to fetch")):
+    try:
+        cached = product_cache.get_detail(product_id, limit_related)
+        if cached is not None:
+            return cached
+
+        generation = product_cache.details.generation
+        # Concurrent views of the same (viral) product share one pair of queries
+        detail = coalesce(
+            "product_detail",
+            {"product_id": product_id, "limit_related": limit_related},
+            lambda: _fetch_product_detail(product_id, limit_related),
+        )
+        if detail is None:
+            return {"message": f"No product found with ID {product_id}."}
+        product_cache.put_detail(product_id, limit_related, detail, generation)
+        return detail
 
     except Exception as e:
-        logger.error(f"Error fetching product details: {str(e)}")
+        logger.error("Error fetching product details for %s: %s", product_id, e)
         return {"error": str(e)}
 
+# =====================
+# Batch Lookup (cart / wishlist / recently viewed hydration)
+# =====================
+BATCH_MAX_IDS = 100
+
+
+def _fetch_product_rows(product_ids):
+    conn = get_read_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        cursor.execute(
+            f"""
+            SELECT p.id AS product_id,
+                p.name AS product_name,
+                p.description AS product_description,
+                p.price,
+                p.stock,
+                p.image_url,
+                p.sub_category_id
+            FROM products p
+            WHERE p.id IN ({placeholders})
+            """,
+            tuple(product_ids),
+        )
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+@router.get("/batch")
+def get_products_batch(ids: str = Query(..., description=f"Comma-separated product ids, at most {BATCH_MAX_IDS}")):
+    try:
+        requested = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if not requested:
+        raise HTTPException(status_code=400, detail="No product ids given")
+    if len(requested) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_IDS} ids per request")
+
+    try:
+        found, uncached = product_cache.get_rows(requested)
+        if uncached:
+            generation = product_cache.rows.generation
+            loaded = _fetch_product_rows(uncached)
+            product_cache.put_rows(loaded, generation)
+            found.update((row["product_id"], row) for row in loaded)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching products: {str(e)}")
+
+    # Same order as requested; ids that don't exist are listed instead of failing the batch
+    return {
+        "products": [found[pid] for pid in requested if pid in found],
+        "missing": [pid for pid in requested if pid not in found],
+    }
+
+
     # =====================
 
 
@@ -609,7 +1103,7 @@ async def upload_image(file: UploadFile = File(...), user=Depends(get_current_us
 # fetch product for a specific user
 @router.get("/allproducts/{user_id}")
 def get_products_by_user(user_id: int):
-    conn = get_connection()
+    conn = get_read_connection()
     cursor = conn.cursor(dictionary=True)
     try:
         cursor.execute(
@@ -635,3 +1129,90 @@ def get_products_by_user(user_id: int):
         )
     finally:
         conn.close()
+
+
+# =====================
+# Seller Dashboard
+# =====================
+@jobs.handler("order.created")
+def update_seller_stats(cursor, payload):
+    seller_stats.apply_order(cursor, payload["order_id"])
+
+
+SELLER_STATS_SORTS = {
+    "revenue": "COALESCE(s.revenue, 0)",
+    "units_sold": "COALESCE(s.units_sold, 0)",
+    "stockouts": "COALESCE(s.stockouts, 0)",
+    "stock": "p.stock",
+}
+
+
+@router.get("/seller/stats")
+def get_seller_stats(
+    seller_id: Optional[int] = Query(None, description="Admins only; defaults to the current user"),
+    sort: str = Query("revenue", pattern="^(revenue|units_sold|stockouts|stock)$"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(25, ge=1, le=100),
+    user=Depends(get_current_user),
+):
+    if not user:
+        raise HTTPException(status_code=401, detail="Login required")
+    seller_id = seller_id or user["id"]
+    if seller_id != user["id"] and user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized to view this seller")
+
+    # Sales come from the seller_product_stats read model, never from order_items
+    conn = get_read_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            "SELECT COUNT(*) AS products, COALESCE(SUM(stock <= 0), 0) AS out_of_stock FROM products WHERE user_id = %s",
+            (seller_id,),
+        )
+        summary = cursor.fetchone()
+        cursor.execute(
+            """
+            SELECT COALESCE(SUM(units_sold), 0) AS units_sold,
+                COALESCE(SUM(revenue), 0) AS revenue,
+                COALESCE(SUM(stockouts), 0) AS stockouts
+            FROM seller_product_stats
+            WHERE seller_id = %s
+            """,
+            (seller_id,),
+        )
+        summary.update(cursor.fetchone())
+
+        order_by = SELLER_STATS_SORTS[sort]
+        cursor.execute(
+            f"""
+            SELECT p.id AS product_id,
+                p.name AS product_name,
+                p.price,
+                p.stock,
+                p.image_url,
+                COALESCE(s.units_sold, 0) AS units_sold,
+                COALESCE(s.revenue, 0) AS revenue,
+                COALESCE(s.orders, 0) AS orders,
+                COALESCE(s.stockouts, 0) AS stockouts,
+                s.last_sold_at,
+                s.last_stockout_at
+            FROM products p
+            LEFT JOIN seller_product_stats s ON s.product_id = p.id
+            WHERE p.user_id = %s
+            ORDER BY {order_by} DESC, p.id DESC
+            LIMIT %s OFFSET %s
+            """,
+            (seller_id, page_size, (page - 1) * page_size),
+        )
+        return {
+            "seller_id": seller_id,
+            "summary": summary,
+            "products": cursor.fetchall(),
+            "page": page,
+            "page_size": page_size,
+            "total": summary["products"],
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching seller stats: {str(e)}")
+    finally:
+        conn.close()
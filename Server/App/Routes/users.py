@@ -2,8 +2,10 @@ from fastapi import APIRouter, HTTPException,Depends
 from pydantic import BaseModel, EmailStr, field_validator
 import re
 from App.DB.connection import get_connection
+from App.DB import statements
 from App.Utils import security
 from App.Utils.dependencies import get_current_user
+from App.Utils.rate_limit import enforce, rate_limit
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -62,8 +64,7 @@ def register(user: UserRegister):
         user.email = user.email.lower()
 
         # Check if email already exists
-        cursor.execute("SELECT * FROM users WHERE email = %s", (user.email,))
-        if cursor.fetchone():
+        if statements.fetch_one(conn, "user_by_email", (user.email,)):
             raise HTTPException(status_code=400, detail="Email already registered")
 
         # Hash password
@@ -85,20 +86,19 @@ def register(user: UserRegister):
             conn.close()
 
 
-@router.post("/login")
+@router.post("/login", dependencies=[Depends(rate_limit("login"))])
 def login(user: UserLogin):
-    print(user)
+    # Per-account limit on top of the per-IP one, against distributed guessing
+    enforce("login_account", user.email.lower())
     conn = None
     try:
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
 
         # Normalize email
         useremail = user.email.lower()
 
         # Find user
-        cursor.execute("SELECT * FROM users WHERE email = %s", (useremail,))
-        db_user = cursor.fetchone()
+        db_user = statements.fetch_one(conn, "user_by_email", (useremail,))
 
         if not db_user or not security.verify_password(user.password, db_user["password"]):
             raise HTTPException(status_code=401, detail="Invalid credentials")
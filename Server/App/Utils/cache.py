@@ -0,0 +1,99 @@
+"""
+Bounded in-process cache: LRU eviction plus a per-entry TTL.
+
+Thread-safe (sync routes run in a thread pool). ``generation`` increases on
+every invalidation, so a loader that started before an invalidation can pass
+the generation it saw to ``set`` and its now-stale result is dropped.
+
+With ``max_bytes`` the cache is also bounded by the approximate size of its
+values (their JSON encoding, measured once on ``set``).
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, max_entries, ttl, max_bytes=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.generation = 0
+        self._data = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._sizes = {}  # key -> approximate bytes, only when max_bytes is set
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=MISSING):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._discard(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None, generation=None):
+        size = len(json.dumps(value, default=str)) if self.max_bytes else 0
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            if self.max_bytes and size > self.max_bytes:
+                return False
+            self._discard(key)
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            if self.max_bytes:
+                self._sizes[key] = size
+                self.bytes += size
+            while len(self._data) > self.max_entries or (self.max_bytes and self.bytes > self.max_bytes):
+                self._discard(next(iter(self._data)))
+                self.evictions += 1
+            return True
+
+    def _discard(self, key):
+        if self._data.pop(key, None) is not None:
+            self.bytes -= self._sizes.pop(key, 0)
+
+    def invalidate(self, key):
+        with self._lock:
+            self.generation += 1
+            self._discard(key)
+
+    def invalidate_where(self, predicate):
+        """Drop every entry for which ``predicate(key, value)`` is true."""
+        with self._lock:
+            self.generation += 1
+            for key in [k for k, (_, v) in self._data.items() if predicate(k, v)]:
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+            self._sizes.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "bytes": self.bytes,
+            }
@@ -0,0 +1,521 @@
+"""
+Cart storage behind the /cart routes.
+
+``store()`` returns the backend picked by ``CART_STORE``:
+
+- ``mysql`` (default): cart rows in the ``cart`` table, changed in the same
+  transaction as the stock they reserve
+- ``redis``: each cart is a Redis hash ``cart:<owner column>:<owner>`` of
+  product id -> quantity. A cart write is one conditional stock UPDATE in
+  MySQL plus one pipelined (MULTI/EXEC) round trip to Redis. The ``cart``
+  table becomes a write-behind copy, flushed every ``CART_FLUSH_INTERVAL``
+  seconds, for the queries that read it (frequently bought together,
+  trending)
+- ``memory``: the redis backend over an in-process fake
+  (App/Utils/fake_redis.py); one process only, for tests and local development
+
+Stock always lives in ``products.stock``. An owner is ``(column, value)``
+with column ``user_email`` or ``session_id``. Reservations expire per row in
+MySQL and per cart in Redis (an add or update extends the whole cart).
+Stores raise HTTPException for the same cases the routes always have.
+"""
+import os
+import threading
+import time
+
+from fastapi import HTTPException
+
+from App.DB import seller_stats, statements
+from App.Utils import jobs, kv, product_cache
+from App.Utils.kv import WatchError
+
+CART_STORE = os.getenv("CART_STORE", "mysql")
+FLUSH_INTERVAL = float(os.getenv("CART_FLUSH_INTERVAL", "5"))
+FLUSH_BATCH = int(os.getenv("CART_FLUSH_BATCH", "500"))
+UPDATE_ATTEMPTS = 5  # optimistic (WATCH) retries when a cart changes under an update
+
+OWNER_COLUMNS = ("user_email", "session_id")
+
+_store = None
+_store_lock = threading.Lock()
+
+
+# ------------------ MySQL ------------------
+class MySQLCartStore:
+    def add(self, conn, owner, product_id, quantity, minutes):
+        identifier_col, identifier_value = owner
+        cursor = conn.cursor(dictionary=True)
+
+        # Validate product & stock
+        product = statements.fetch_one(conn, "product_stock", (product_id,))
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        if product["stock"] < quantity:
+            raise HTTPException(status_code=400, detail="Not enough stock available")
+
+        # Update existing or insert new cart item
+        existing_item = statements.fetch_one(
+            conn,
+            statements.cart_statement("cart_item", identifier_col),
+            (identifier_value, product_id),
+        )
+
+        if existing_item:
+            # Lock it by primary key (no gap locks); the sweeper may have released it since
+            cursor.execute("SELECT id FROM cart WHERE id = %s FOR UPDATE", (existing_item["id"],))
+            existing_item = cursor.fetchone()
+
+        # NOW() + INTERVAL NULL MINUTE is NULL: no expiry
+        if existing_item:
+            cursor.execute(
+                "UPDATE cart SET quantity = quantity + %s, expires_at = NOW() + INTERVAL %s MINUTE WHERE id = %s",
+                (quantity, minutes, existing_item["id"]),
+            )
+        else:
+            cursor.execute(
+                f"""
+                INSERT INTO cart ({identifier_col}, product_id, quantity, expires_at)
+                VALUES (%s, %s, %s, NOW() + INTERVAL %s MINUTE)
+                """,
+                (identifier_value, product_id, quantity, minutes),
+            )
+
+        # Deduct stock
+        cursor.execute(
+            "UPDATE products SET stock = stock - %s WHERE id=%s",
+            (quantity, product_id),
+        )
+        seller_stats.record_stockout(cursor, [product_id])
+        conn.commit()
+        product_cache.invalidate_stock(product_id)
+
+    def items(self, conn, owner):
+        identifier_col, identifier_value = owner
+        return statements.fetch_all(
+            conn, statements.cart_statement("cart_items", identifier_col), (identifier_value,)
+        )
+
+    def remove(self, conn, owner, product_id):
+        identifier_col, identifier_value = owner
+        cursor = conn.cursor(dictionary=True)
+
+        # Get item quantity for stock restore (locked, so the sweeper can't release it meanwhile)
+        item = statements.fetch_one(
+            conn,
+            statements.cart_statement("cart_quantity", identifier_col),
+            (identifier_value, product_id),
+        )
+        if not item:
+            conn.rollback()
+            raise HTTPException(status_code=404, detail="Item not found in cart")
+
+        cursor.execute(
+            f"DELETE FROM cart WHERE {identifier_col}=%s AND product_id=%s",
+            (identifier_value, product_id),
+        )
+        cursor.execute(
+            "UPDATE products SET stock = stock + %s WHERE id = %s",
+            (item["quantity"], product_id),
+        )
+        conn.commit()
+        product_cache.invalidate_stock(product_id)
+
+    def update(self, conn, owner, product_id, quantity, minutes):
+        identifier_col, identifier_value = owner
+        cursor = conn.cursor(dictionary=True)
+
+        # Check current quantity (locked until the commit)
+        existing_item = statements.fetch_one(
+            conn,
+            statements.cart_statement("cart_quantity", identifier_col),
+            (identifier_value, product_id),
+        )
+        if not existing_item:
+            conn.rollback()
+            raise HTTPException(status_code=404, detail="Item not found in cart")
+
+        diff = quantity - existing_item["quantity"]
+
+        # Adjust stock based on difference
+        if diff > 0:
+            stock = statements.fetch_one(conn, "product_stock", (product_id,))["stock"]
+            if stock < diff:
+                raise HTTPException(status_code=400, detail="Not enough stock")
+            cursor.execute(
+                "UPDATE products SET stock = stock - %s WHERE id=%s", (diff, product_id)
+            )
+            seller_stats.record_stockout(cursor, [product_id])
+        elif diff < 0:
+            cursor.execute(
+                "UPDATE products SET stock = stock + %s WHERE id=%s",
+                (-diff, product_id),
+            )
+
+        cursor.execute(
+            f"""
+            UPDATE cart SET quantity=%s, expires_at = NOW() + INTERVAL %s MINUTE
+            WHERE {identifier_col}=%s AND product_id=%s
+            """,
+            (quantity, minutes, identifier_value, product_id),
+        )
+        conn.commit()
+        product_cache.invalidate_stock(product_id)
+
+    def clear(self, conn, owner):
+        identifier_col, identifier_value = owner
+        cursor = conn.cursor(dictionary=True)
+
+        # Restore stock for all items in one statement, then drop the rows
+        cursor.execute(
+            f"SELECT product_id FROM cart WHERE {identifier_col}=%s FOR UPDATE",
+            (identifier_value,),
+        )
+        product_ids = {row["product_id"] for row in cursor.fetchall()}
+        cursor.execute(
+            f"""
+            UPDATE products p
+            JOIN (
+                SELECT product_id, SUM(quantity) AS quantity
+                FROM cart WHERE {identifier_col}=%s
+                GROUP BY product_id
+            ) c ON c.product_id = p.id
+            SET p.stock = p.stock + c.quantity
+            """,
+            (identifier_value,),
+        )
+        cursor.execute(
+            f"DELETE FROM cart WHERE {identifier_col}=%s", (identifier_value,)
+        )
+        conn.commit()
+        for product_id in product_ids:
+            product_cache.invalidate_stock(product_id)
+
+    def remove_sold(self, cursor, owner, product_ids):
+        """Drop ordered items without restoring stock, in the order's transaction.
+
+        Returns the work to run after the order commits (none here).
+        """
+        identifier_col, identifier_value = owner
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        cursor.execute(
+            f"DELETE FROM cart WHERE {identifier_col} = %s AND product_id IN ({placeholders})",
+            (identifier_value, *product_ids),
+        )
+        return None
+
+    def release_expired(self, conn, batch):
+        """Return stock held by expired cart rows, ``batch`` rows per transaction.
+
+        SKIP LOCKED lets every app process sweep concurrently, and keeps the
+        sweeper off rows a cart route is currently changing.
+        """
+        cursor = conn.cursor(dictionary=True)
+        released = 0
+        while True:
+            cursor.execute(
+                """
+                SELECT id, product_id FROM cart
+                WHERE expires_at <= NOW()
+                ORDER BY expires_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+                """,
+                (batch,),
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                conn.rollback()
+                break
+
+            ids = tuple(row["id"] for row in rows)
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(
+                f"""
+                UPDATE products p
+                JOIN (
+                    SELECT product_id, SUM(quantity) AS quantity
+                    FROM cart WHERE id IN ({placeholders})
+                    GROUP BY product_id
+                ) c ON c.product_id = p.id
+                SET p.stock = p.stock + c.quantity
+                """,
+                ids,
+            )
+            cursor.execute(f"DELETE FROM cart WHERE id IN ({placeholders})", ids)
+            conn.commit()
+
+            for product_id in {row["product_id"] for row in rows}:
+                product_cache.invalidate_stock(product_id)
+            released += len(rows)
+            if len(rows) < batch:
+                break
+        return released
+
+    def flush(self, conn):
+        return 0  # the table is the store
+
+
+# ------------------ Key-value (Redis) ------------------
+class KeyValueCartStore:
+    EXPIRY_KEY = "cart:expiry"  # sorted set: cart key -> reservation deadline (unix time)
+    DIRTY_KEY = "cart:dirty"  # set: cart keys changed since the last flush to MySQL
+
+    def __init__(self, client):
+        self.kv = client
+
+    @staticmethod
+    def _key(owner):
+        return f"cart:{owner[0]}:{owner[1]}"
+
+    def _touch(self, pipe, key, minutes):
+        if minutes:
+            pipe.zadd(self.EXPIRY_KEY, {key: time.time() + minutes * 60})
+        else:
+            pipe.zrem(self.EXPIRY_KEY, key)
+        pipe.sadd(self.DIRTY_KEY, key)
+
+    def _reserve(self, conn, product_id, quantity, shortage_detail):
+        """Take ``quantity`` from stock in one statement, or raise 404 / 400."""
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            "UPDATE products SET stock = stock - %s WHERE id = %s AND stock >= %s",
+            (quantity, product_id, quantity),
+        )
+        if cursor.rowcount == 0:
+            conn.rollback()
+            if not statements.fetch_one(conn, "product_stock", (product_id,)):
+                raise HTTPException(status_code=404, detail="Product not found")
+            raise HTTPException(status_code=400, detail=shortage_detail)
+        seller_stats.record_stockout(cursor, [product_id])
+        conn.commit()
+        product_cache.invalidate_stock(product_id)
+
+    def _restore(self, conn, quantities):
+        """Give ``{product_id: quantity}`` back to stock (callers handle failures, see ``_give_back``)."""
+        if not quantities:
+            return
+        cursor = conn.cursor()
+        cursor.executemany(
+            "UPDATE products SET stock = stock + %s WHERE id = %s",
+            [(quantity, product_id) for product_id, quantity in quantities.items()],
+        )
+        conn.commit()
+        for product_id in quantities:
+            product_cache.invalidate_stock(product_id)
+
+    def _give_back(self, conn, key, quantities, deadline=None):
+        """Restore stock for items just taken out of the cart at ``key``.
+
+        If MySQL fails, the items go back into the cart (with its old
+        ``deadline``), so the reservation is still held and can be released later.
+        """
+        try:
+            self._restore(conn, quantities)
+        except Exception:
+            conn.rollback()
+            pipe = self.kv.pipeline()
+            for product_id, quantity in quantities.items():
+                pipe.hincrby(key, product_id, quantity)
+            if deadline is not None:
+                pipe.zadd(self.EXPIRY_KEY, {key: deadline})
+            pipe.sadd(self.DIRTY_KEY, key)
+            pipe.execute()
+            raise
+
+    @staticmethod
+    def _quantities(fields):
+        return {int(product_id): int(quantity) for product_id, quantity in fields.items()}
+
+    def add(self, conn, owner, product_id, quantity, minutes):
+        self._reserve(conn, product_id, quantity, "Not enough stock available")
+        key = self._key(owner)
+        try:
+            pipe = self.kv.pipeline()
+            pipe.hincrby(key, product_id, quantity)
+            self._touch(pipe, key, minutes)
+            pipe.execute()
+        except Exception:
+            # The cart never got it: hand the reservation back
+            self._restore(conn, {product_id: quantity})
+            raise
+
+    def items(self, conn, owner):
+        identifier_col, identifier_value = owner
+        quantities = self._quantities(self.kv.hgetall(self._key(owner)))
+        if not quantities:
+            return []
+        placeholders = ", ".join(["%s"] * len(quantities))
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            f"""
+            SELECT id AS product_id, name, price, image_url, stock
+            FROM products WHERE id IN ({placeholders})
+            """,
+            tuple(quantities),
+        )
+        # Same shape as the MySQL store's rows; there is no cart row id
+        return [
+            {
+                "cart_product_id": product["product_id"],
+                "id": None,
+                "user_email": identifier_value if identifier_col == "user_email" else None,
+                "session_id": identifier_value if identifier_col == "session_id" else None,
+                **product,
+                "quantity": quantities[product["product_id"]],
+            }
+            for product in cursor.fetchall()
+        ]
+
+    def remove(self, conn, owner, product_id):
+        key = self._key(owner)
+        pipe = self.kv.pipeline()
+        pipe.hget(key, product_id)
+        pipe.hdel(key, product_id)
+        pipe.sadd(self.DIRTY_KEY, key)
+        quantity, removed, _ = pipe.execute()
+        if not removed:
+            raise HTTPException(status_code=404, detail="Item not found in cart")
+        self._give_back(conn, key, {product_id: int(quantity)})
+
+    def update(self, conn, owner, product_id, quantity, minutes):
+        """Set the quantity; the write only lands if the cart is unchanged since it was read (WATCH)."""
+        key = self._key(owner)
+        for _ in range(UPDATE_ATTEMPTS):
+            pipe = self.kv.pipeline()
+            try:
+                pipe.watch(key)
+                current = pipe.hget(key, product_id)
+                if current is None:
+                    raise HTTPException(status_code=404, detail="Item not found in cart")
+
+                diff = quantity - int(current)
+                if diff > 0:
+                    self._reserve(conn, product_id, diff, "Not enough stock")
+                try:
+                    pipe.multi()
+                    pipe.hset(key, product_id, quantity)
+                    self._touch(pipe, key, minutes)
+                    pipe.execute()
+                except Exception as e:
+                    # Not written (changed concurrently, or Redis failed): hand the reservation back
+                    if diff > 0:
+                        self._restore(conn, {product_id: diff})
+                    if isinstance(e, WatchError):
+                        continue
+                    raise
+            finally:
+                pipe.reset()
+            if diff < 0:
+                self._give_back(conn, key, {product_id: -diff})
+            return
+        raise HTTPException(status_code=409, detail="Cart is being changed concurrently. Please retry.")
+
+    def _queue_take(self, pipe, key):
+        pipe.hgetall(key)
+        pipe.zscore(self.EXPIRY_KEY, key)
+        pipe.delete(key)
+        pipe.zrem(self.EXPIRY_KEY, key)
+        pipe.sadd(self.DIRTY_KEY, key)
+
+    def _take(self, key):
+        """Atomically empty the cart at ``key``; returns what it held and its deadline."""
+        pipe = self.kv.pipeline()
+        self._queue_take(pipe, key)
+        fields, deadline = pipe.execute()[:2]
+        return self._quantities(fields), deadline
+
+    def clear(self, conn, owner):
+        key = self._key(owner)
+        quantities, deadline = self._take(key)
+        self._give_back(conn, key, quantities, deadline)
+
+    def remove_sold(self, cursor, owner, product_ids):
+        """Drop ordered items without restoring stock.
+
+        Redis is not part of the order's transaction, so this only returns the
+        removal, for the caller to run once the order has committed.
+        """
+        key = self._key(owner)
+
+        def remove():
+            pipe = self.kv.pipeline()
+            pipe.hdel(key, *product_ids)
+            pipe.sadd(self.DIRTY_KEY, key)
+            pipe.execute()
+
+        return remove
+
+    def release_expired(self, conn, batch):
+        """Empty up to ``batch`` carts past their deadline and return their stock."""
+        released = 0
+        now = time.time()
+        for key in self.kv.zrangebyscore(self.EXPIRY_KEY, "-inf", now, start=0, num=batch):
+            # Check and take in one transaction: every cart write touches the hash,
+            # so WATCHing it catches a cart extended or cleared in between
+            pipe = self.kv.pipeline()
+            try:
+                pipe.watch(key)
+                score = pipe.zscore(self.EXPIRY_KEY, key)
+                if score is None or score > now:
+                    continue  # extended or cleared since the range read
+                pipe.multi()
+                self._queue_take(pipe, key)
+                fields, deadline = pipe.execute()[:2]
+            except WatchError:
+                continue  # changed meanwhile; the next sweep looks again
+            finally:
+                pipe.reset()
+            quantities = self._quantities(fields)
+            self._give_back(conn, key, quantities, deadline)
+            released += len(quantities)
+        return released
+
+    def flush(self, conn):
+        """Copy changed carts to the ``cart`` table; returns how many were written."""
+        keys = self.kv.spop(self.DIRTY_KEY, FLUSH_BATCH)
+        if not keys:
+            return 0
+        try:
+            cursor = conn.cursor()
+            for key in keys:
+                _, identifier_col, identifier_value = key.split(":", 2)
+                if identifier_col not in OWNER_COLUMNS:
+                    continue
+                quantities = self._quantities(self.kv.hgetall(key))
+                cursor.execute(f"DELETE FROM cart WHERE {identifier_col} = %s", (identifier_value,))
+                if quantities:
+                    # IGNORE: skips products deleted since they were added
+                    cursor.executemany(
+                        f"INSERT IGNORE INTO cart ({identifier_col}, product_id, quantity) VALUES (%s, %s, %s)",
+                        [(identifier_value, product_id, quantity) for product_id, quantity in quantities.items()],
+                    )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            self.kv.sadd(self.DIRTY_KEY, *keys)
+            raise
+        return len(keys)
+
+
+# ------------------ Selection ------------------
+def _create():
+    if CART_STORE == "mysql":
+        return MySQLCartStore()
+    return KeyValueCartStore(kv.client(CART_STORE))
+
+
+def store():
+    """The configured cart store, created on first use (after the worker fork)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _create()
+    return _store
+
+
+@jobs.periodic(FLUSH_INTERVAL)
+def _flush_carts(conn):
+    # Write-behind for the key-value stores; keeps going while a full batch came back
+    while store().flush(conn) >= FLUSH_BATCH:
+        pass
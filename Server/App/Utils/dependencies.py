@@ -4,6 +4,7 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from App.Utils.security import SECRET_KEY, ALGORITHM
 from App.DB.connection import get_connection
+from App.DB import statements
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/login", auto_error=False)
@@ -23,9 +24,7 @@ def get_current_user(token: Optional[str] = Depends(oauth2_scheme)) -> Optional[
 
         # Fetch user from DB
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-        user = cursor.fetchone()
+        user = statements.fetch_one(conn, "user_by_email", (email,))
 
         return user
 
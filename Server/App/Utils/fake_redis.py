@@ -0,0 +1,245 @@
+"""
+In-process stand-in for the handful of Redis commands the key-value stores
+use (App/Utils/cart_store.py, App/Utils/shared_cache.py), for tests and
+local development.
+
+Values come back as strings, like a client created with
+``decode_responses=True``. A pipeline runs its queued commands under one
+lock, so it is atomic like MULTI/EXEC; ``watch`` works like WATCH (the
+transaction raises ``WatchError`` if a watched key changed). Pub/sub delivers
+to this process's subscribers as soon as a message is published. Data lives
+in this process only.
+"""
+import threading
+import time
+
+try:
+    from redis.exceptions import WatchError
+except ImportError:  # only the in-process store is usable without redis
+
+    class WatchError(Exception):
+        pass
+
+
+class FakeRedis:
+    def __init__(self):
+        self._data = {}
+        self._expires = {}  # key -> monotonic deadline, for keys set with px
+        self._subscribers = {}  # channel -> [handler]
+        self._versions = {}  # key -> write count, for WATCH
+        self._lock = threading.RLock()
+
+    def _changed(self, key):
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    # ---------- strings ----------
+    def _expire_if_due(self, key):
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(key, None)
+            del self._expires[key]
+            self._changed(key)
+
+    def get(self, key):
+        with self._lock:
+            self._expire_if_due(key)
+            return self._data.get(key)
+
+    def set(self, key, value, px=None):
+        with self._lock:
+            self._changed(key)
+            self._data[key] = str(value)
+            if px:
+                self._expires[key] = time.monotonic() + px / 1000
+            else:
+                self._expires.pop(key, None)
+            return True
+
+    def pttl(self, key):
+        with self._lock:
+            self._expire_if_due(key)
+            if key not in self._data:
+                return -2
+            deadline = self._expires.get(key)
+            return -1 if deadline is None else int((deadline - time.monotonic()) * 1000)
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            self._expire_if_due(key)
+            value = int(self._data.get(key, 0)) + amount
+            self._data[key] = str(value)
+            self._changed(key)
+            return value
+
+    # ---------- hashes ----------
+    def hincrby(self, key, field, amount=1):
+        with self._lock:
+            fields = self._data.setdefault(key, {})
+            value = int(fields.get(str(field), 0)) + amount
+            fields[str(field)] = str(value)
+            self._changed(key)
+            return value
+
+    def hset(self, key, field, value):
+        with self._lock:
+            fields = self._data.setdefault(key, {})
+            added = str(field) not in fields
+            fields[str(field)] = str(value)
+            self._changed(key)
+            return int(added)
+
+    def hget(self, key, field):
+        with self._lock:
+            return self._data.get(key, {}).get(str(field))
+
+    def hgetall(self, key):
+        with self._lock:
+            return dict(self._data.get(key, {}))
+
+    def hdel(self, key, *fields):
+        with self._lock:
+            values = self._data.get(key, {})
+            removed = sum(values.pop(str(field), None) is not None for field in fields)
+            if key in self._data and not values:
+                del self._data[key]
+            if removed:
+                self._changed(key)
+            return removed
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                self._expire_if_due(key)
+                self._expires.pop(key, None)
+                if self._data.pop(key, None) is not None:
+                    self._changed(key)
+                    removed += 1
+            return removed
+
+    # ---------- sets ----------
+    def sadd(self, key, *members):
+        with self._lock:
+            values = self._data.setdefault(key, set())
+            before = len(values)
+            values.update(str(member) for member in members)
+            self._changed(key)
+            return len(values) - before
+
+    def spop(self, key, count=None):
+        with self._lock:
+            values = self._data.get(key, set())
+            self._changed(key)
+            if count is None:
+                return values.pop() if values else None
+            return [values.pop() for _ in range(min(count, len(values)))]
+
+    # ---------- sorted sets ----------
+    def zadd(self, key, mapping):
+        with self._lock:
+            scores = self._data.setdefault(key, {})
+            added = sum(str(member) not in scores for member in mapping)
+            scores.update({str(member): float(score) for member, score in mapping.items()})
+            self._changed(key)
+            return added
+
+    def zrem(self, key, *members):
+        with self._lock:
+            scores = self._data.get(key, {})
+            removed = sum(scores.pop(str(member), None) is not None for member in members)
+            if removed:
+                self._changed(key)
+            return removed
+
+    def zscore(self, key, member):
+        with self._lock:
+            return self._data.get(key, {}).get(str(member))
+
+    def zrangebyscore(self, key, min, max, start=None, num=None):
+        with self._lock:
+            low, high = float(min), float(max)
+            members = sorted(
+                (score, member) for member, score in self._data.get(key, {}).items() if low <= score <= high
+            )
+        members = [member for _, member in members]
+        if start is not None and num is not None:
+            members = members[start:start + num]
+        return members
+
+    # ---------- pub/sub ----------
+    def publish(self, channel, message):
+        with self._lock:
+            handlers = list(self._subscribers.get(channel, []))
+        for handler in handlers:
+            handler({"type": "message", "channel": channel, "data": str(message)})
+        return len(handlers)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return _PubSub(self)
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+
+class _PubSub:
+    def __init__(self, client):
+        self._client = client
+        self._channels = {}
+
+    def subscribe(self, **handlers):
+        with self._client._lock:
+            for channel, handler in handlers.items():
+                self._client._subscribers.setdefault(channel, []).append(handler)
+                self._channels[channel] = handler
+
+    def get_message(self, timeout=0.0):
+        time.sleep(timeout)  # delivery is synchronous; nothing ever waits here
+        return None
+
+    def close(self):
+        with self._client._lock:
+            for channel, handler in self._channels.items():
+                self._client._subscribers[channel].remove(handler)
+        self._channels = {}
+
+
+class _Pipeline:
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+        self._watched = None  # key -> version seen by watch(); commands run immediately until multi()
+
+    def watch(self, *keys):
+        with self._client._lock:
+            self._watched = {key: self._client._versions.get(key, 0) for key in keys}
+        self._immediate = True
+
+    def multi(self):
+        self._immediate = False
+
+    def reset(self):
+        self._commands = []
+        self._watched = None
+        self._immediate = False
+
+    def __getattr__(self, name):
+        command = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            if getattr(self, "_immediate", False):
+                return command(*args, **kwargs)
+            self._commands.append((command, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self):
+        with self._client._lock:
+            watched = self._watched or {}
+            changed = any(self._client._versions.get(key, 0) != version for key, version in watched.items())
+            if not changed:
+                results = [command(*args, **kwargs) for command, args, kwargs in self._commands]
+        self.reset()
+        if changed:
+            raise WatchError("Watched variable changed.")
+        return results
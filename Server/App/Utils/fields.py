@@ -0,0 +1,38 @@
+"""
+Sparse fieldsets for list endpoints: ``?fields=product_id,product_name,price``.
+
+Each endpoint declares the fields it can return as an ordered mapping of
+output name -> SQL expression. ``parse`` validates a request against it and
+``select_list`` renders only the requested columns, so unrequested columns
+(long descriptions in particular) are neither read from the database nor
+serialized. Without ``fields`` every declared column is returned, as before.
+"""
+from fastapi import HTTPException
+
+
+def parse(fields, available, required=()):
+    """Requested names in declaration order (plus ``required``), or None for all fields."""
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested:
+        # "?fields=" would otherwise render an empty SELECT list
+        raise HTTPException(status_code=400, detail=f"fields must name at least one of: {', '.join(available)}")
+    unknown = requested - available.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field(s): {', '.join(sorted(unknown))}. Available: {', '.join(available)}",
+        )
+    return [name for name in available if name in requested or name in required]
+
+
+def select_list(available, names=None):
+    """The SELECT list for ``names`` (every available field when None)."""
+    names = available if names is None else names
+    return ",\n".join(f"{available[name]} AS {name}" for name in names)
+
+
+def cache_key(names):
+    """A hashable, stable form of ``names`` for cache and coalescing keys."""
+    return None if names is None else ",".join(names)
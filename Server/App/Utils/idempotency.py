@@ -0,0 +1,121 @@
+"""
+Idempotency keys for retried POSTs (the ``Idempotency-Key`` header).
+
+A route claims the key with ``claim(conn, key, fingerprint)`` as the first
+statement of its transaction and stores its response with ``complete(cursor,
+key, response)`` just before committing, so the key row and the work it
+guards commit or roll back together. The key is the primary key of
+``idempotency_keys``, which serializes duplicates:
+
+- a repeat after the original committed hits the duplicate key and gets the
+  stored response back
+- a repeat while the original is still running waits on the key's row lock
+  until the original commits (then replays it) or rolls back (then runs)
+
+Completed responses are also kept in a per-process cache, so most retries
+are answered without a database round trip. Keys are stored as SHA-256 of
+owner + client key, are kept ``IDEMPOTENCY_TTL_HOURS`` and purged after
+that. Reusing a key for a different request is rejected with 422.
+"""
+import hashlib
+import json
+import os
+
+from fastapi import HTTPException
+from mysql.connector import errors
+
+from App.Utils import jobs
+from App.Utils.cache import MISSING, TTLCache
+
+TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+KEY_MAX_LENGTH = 255
+
+responses = TTLCache(int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000")), TTL_HOURS * 3600)
+_stats = {"claimed": 0, "replayed": 0, "cache_hits": 0, "conflicts": 0}
+
+_LOCK_ERRORS = (1205, 1213)  # lock wait timeout, deadlock
+_IN_PROGRESS = "A request with this Idempotency-Key is still in progress. Please retry."
+
+
+def scoped_key(key, owner):
+    """Storage key for a client's ``key``; clients can't collide with each other's keys."""
+    return hashlib.sha256(f"{owner}\0{key}".encode()).digest()
+
+
+def fingerprint(model):
+    """Digest of the request body, to tell a retry from a different request under the same key."""
+    return hashlib.sha256(model.model_dump_json().encode()).digest()
+
+
+def _replay(request_hash, fingerprint_, response):
+    if request_hash != fingerprint_:
+        _stats["conflicts"] += 1
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    _stats["replayed"] += 1
+    return response
+
+
+def cached(key, fingerprint_):
+    """The stored response for ``key`` from this process's cache, or None."""
+    entry = responses.get(key)
+    if entry is MISSING:
+        return None
+    _stats["cache_hits"] += 1
+    return _replay(entry[0], fingerprint_, entry[1])
+
+
+def claim(conn, key, fingerprint_):
+    """Claim ``key`` in the current transaction: None to go ahead, else the original response.
+
+    The caller must roll back when a response (or an HTTPException) comes back.
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            "INSERT INTO idempotency_keys (id, request_hash, expires_at) VALUES (%s, %s, NOW() + INTERVAL %s HOUR)",
+            (key, fingerprint_, TTL_HOURS),
+        )
+        _stats["claimed"] += 1
+        return None
+    except errors.IntegrityError:
+        pass
+    except errors.DatabaseError as e:
+        if e.errno not in _LOCK_ERRORS:
+            raise
+        raise HTTPException(status_code=409, detail=_IN_PROGRESS, headers={"Retry-After": "1"})
+
+    # Locking read: sees the original's commit whatever this transaction's snapshot
+    cursor.execute(
+        "SELECT request_hash, response FROM idempotency_keys WHERE id = %s LOCK IN SHARE MODE",
+        (key,),
+    )
+    row = cursor.fetchone()
+    if row is None or row["response"] is None:
+        raise HTTPException(status_code=409, detail=_IN_PROGRESS, headers={"Retry-After": "1"})
+    request_hash, response = bytes(row["request_hash"]), json.loads(row["response"])
+    responses.set(key, (request_hash, response))
+    return _replay(request_hash, fingerprint_, response)
+
+
+def complete(cursor, key, response):
+    """Store the response for a claimed key; commits with the caller's transaction."""
+    cursor.execute(
+        "UPDATE idempotency_keys SET response = %s WHERE id = %s",
+        (json.dumps(response, default=str), key),
+    )
+
+
+def remember(key, fingerprint_, response):
+    """After the commit: answer later retries from memory."""
+    responses.set(key, (fingerprint_, response))
+
+
+@jobs.periodic(600)
+def _purge_expired(conn):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM idempotency_keys WHERE expires_at < NOW() LIMIT 10000")
+    conn.commit()
+
+
+def stats():
+    return dict(_stats, cached=len(responses))
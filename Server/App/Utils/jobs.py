@@ -0,0 +1,209 @@
+"""
+Durable background jobs backed by the ``job_queue`` table (an outbox).
+
+Routes enqueue follow-up work with ``enqueue(cursor, kind, payload)`` inside
+their own transaction, so a job exists if and only if the change that caused
+it was committed. A small pool of worker threads per process claims due jobs
+with ``SELECT ... FOR UPDATE SKIP LOCKED`` (several gunicorn workers can poll
+the same table safely) and runs the registered handler inside the claiming
+transaction: the handler's writes and the job's "done" mark commit together.
+Failures are retried with exponential backoff up to ``JOB_MAX_ATTEMPTS``.
+
+    @jobs.handler("order.created")
+    def update_popularity(cursor, payload):
+        ...
+
+All handlers of a kind run in one transaction and succeed, fail and retry
+together. Keep external side effects (e-mail) in a kind of their own, so a
+failing one neither rolls back database work nor gets repeated by its retries.
+
+Periodic maintenance (purging finished jobs, releasing expired cart
+reservations) registers with ``@jobs.periodic(seconds)`` and is run by worker 0
+of each process; tasks must be safe to run concurrently from several processes.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from App.DB.connection import get_connection
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))  # seconds between polls when idle
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))  # finished jobs kept this long
+
+_handlers = {}
+_periodic = []  # [fn, interval, last_run]
+_threads = []
+_stop = threading.Event()
+_wakeup = threading.Event()
+_stats_lock = threading.Lock()
+_stats = {"enqueued": 0, "succeeded": 0, "failed": 0, "retried": 0}
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def handler(kind):
+    """Register ``fn(cursor, payload)`` as the handler for jobs of ``kind``."""
+
+    def register(fn):
+        _handlers.setdefault(kind, []).append(fn)
+        return fn
+
+    return register
+
+
+def periodic(interval):
+    """Register ``fn(conn)`` to run every ``interval`` seconds on worker 0."""
+
+    def register(fn):
+        _periodic.append([fn, interval, 0.0])
+        return fn
+
+    return register
+
+
+def enqueue(cursor, kind, payload):
+    """Add a job inside the caller's transaction; it becomes visible when the caller commits."""
+    cursor.execute(
+        "INSERT INTO job_queue (kind, payload) VALUES (%s, %s)",
+        (kind, json.dumps(payload, default=str)),
+    )
+    _count("enqueued")
+
+
+def notify():
+    """Wake an idle worker after committing a transaction that enqueued jobs."""
+    _wakeup.set()
+
+
+# ------------------ Worker ------------------
+def _claim_and_run(conn):
+    """Run one due job. Returns False when there was nothing to do."""
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        """
+        SELECT id, kind, payload, attempts FROM job_queue
+        WHERE status = 'pending' AND run_after <= NOW()
+        ORDER BY run_after, id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+        """
+    )
+    job = cursor.fetchone()
+    if not job:
+        conn.rollback()
+        return False
+
+    payload = job["payload"]
+    if isinstance(payload, (bytes, bytearray, str)):
+        payload = json.loads(payload)
+
+    # Handlers run after a savepoint: a failure undoes their writes but keeps the
+    # job row locked until the retry is recorded, so no other worker can claim it
+    cursor.execute("SAVEPOINT job")
+    try:
+        for fn in _handlers.get(job["kind"], []):
+            fn(cursor, payload)
+        cursor.execute(
+            "UPDATE job_queue SET status = 'done', attempts = attempts + 1, finished_at = NOW() WHERE id = %s",
+            (job["id"],),
+        )
+        conn.commit()
+        _count("succeeded")
+    except Exception as e:
+        try:
+            cursor.execute("ROLLBACK TO SAVEPOINT job")
+        except Exception:
+            # A deadlock already rolled back the whole transaction (and the lock): the
+            # guard below only records the retry if no other worker has run it since
+            conn.rollback()
+        attempts = job["attempts"] + 1
+        give_up = attempts >= MAX_ATTEMPTS
+        logger.warning("Job %s (%s) attempt %s failed: %s", job["id"], job["kind"], attempts, e)
+        cursor.execute(
+            """
+            UPDATE job_queue
+            SET attempts = %s, last_error = %s, status = %s,
+                run_after = NOW() + INTERVAL %s SECOND
+            WHERE id = %s AND status = 'pending' AND attempts = %s
+            """,
+            (attempts, str(e)[:2000], "failed" if give_up else "pending", 2 ** attempts, job["id"], job["attempts"]),
+        )
+        conn.commit()
+        _count("failed" if give_up else "retried")
+    return True
+
+
+@periodic(3600)
+def _purge(conn):
+    cursor = conn.cursor()
+    cursor.execute(
+        "DELETE FROM job_queue WHERE status = 'done' AND finished_at < NOW() - INTERVAL %s DAY LIMIT 10000",
+        (RETENTION_DAYS,),
+    )
+    conn.commit()
+
+
+def _run_periodic(conn):
+    for task in _periodic:
+        fn, interval, last_run = task
+        if time.monotonic() - last_run < interval:
+            continue
+        task[2] = time.monotonic()
+        try:
+            fn(conn)
+        except Exception as e:
+            conn.rollback()
+            logger.warning("Periodic task %s failed: %s", fn.__name__, e)
+
+
+def _worker_loop(index):
+    while not _stop.is_set():
+        conn = get_connection()
+        if conn is None:
+            _stop.wait(POLL_INTERVAL)
+            continue
+        try:
+            # Drain due jobs, then sleep until notified or the next poll
+            while not _stop.is_set() and _claim_and_run(conn):
+                pass
+            if index == 0:
+                _run_periodic(conn)
+        except Exception as e:
+            logger.warning("Job worker %s error: %s", index, e)
+        finally:
+            conn.close()
+        _wakeup.wait(POLL_INTERVAL)
+        _wakeup.clear()
+
+
+def start(workers=WORKERS):
+    """Start the worker threads for this process (idempotent)."""
+    if _threads or workers <= 0:
+        return
+    _stop.clear()
+    for index in range(workers):
+        thread = threading.Thread(target=_worker_loop, args=(index,), name=f"job-worker-{index}", daemon=True)
+        thread.start()
+        _threads.append(thread)
+
+
+def stop(timeout=5):
+    _stop.set()
+    _wakeup.set()
+    for thread in _threads:
+        thread.join(timeout)
+    _threads.clear()
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats, workers=len(_threads))
@@ -0,0 +1,34 @@
+"""
+Clients for the shared key-value stores (App/Utils/cart_store.py,
+App/Utils/shared_cache.py).
+
+``client(backend)`` returns a Redis client for ``redis`` or this process's
+in-memory stand-in for ``memory`` (App/Utils/fake_redis.py); both decode
+replies to strings. The ``redis`` package is only imported when used.
+"""
+import os
+import threading
+
+from App.Utils.fake_redis import WatchError  # redis.WatchError when redis is installed
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def client(backend):
+    """Shared client for ``backend`` ("redis" or "memory"), created on first use."""
+    with _lock:
+        if backend not in _clients:
+            if backend == "redis":
+                import redis
+
+                _clients[backend] = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+            elif backend == "memory":
+                from App.Utils.fake_redis import FakeRedis
+
+                _clients[backend] = FakeRedis()
+            else:
+                raise ValueError(f"Unknown key-value backend: {backend}")
+        return _clients[backend]
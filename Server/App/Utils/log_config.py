@@ -0,0 +1,170 @@
+"""
+Process-wide logging: JSON lines written off the request path.
+
+``configure()`` (called once from App/main.py) routes every logger through a
+``QueueHandler``: a log call only builds the record and appends it to a
+bounded in-memory queue. A listener thread formats records as JSON and writes
+them to stdout. Messages use ``%s`` arguments, which are only formatted by the
+listener; when the queue is full, records are dropped and counted rather than
+blocking the request.
+
+``RequestContextMiddleware`` gives every request an id (the incoming
+``X-Request-ID`` if well-formed, else a new one), which is attached to each
+record logged while handling it and echoed in the response. It also writes a
+sampled access log: errors and slow requests are always logged, other
+requests at ``LOG_ACCESS_SAMPLE`` (per-route overrides in
+``LOG_ACCESS_SAMPLE_ROUTES``).
+"""
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+ACCESS_SAMPLE = float(os.getenv("LOG_ACCESS_SAMPLE", "1.0"))
+# "route=rate,route=rate" using route templates; probes and type-ahead are the bulk of traffic
+DEFAULT_SAMPLE_ROUTES = "/healthz=0,/readyz=0,/metrics=0,/products/suggest=0.05,/products/search=0.25"
+ACCESS_SAMPLE_ROUTES = {
+    route.strip(): float(rate)
+    for route, _, rate in (
+        item.rpartition("=") for item in os.getenv("LOG_ACCESS_SAMPLE_ROUTES", DEFAULT_SAMPLE_ROUTES).split(",") if "=" in item
+    )
+}
+SLOW_REQUEST_MS = float(os.getenv("LOG_SLOW_REQUEST_MS", "1000"))
+
+request_id = contextvars.ContextVar("request_id", default=None)
+access_logger = logging.getLogger("access")
+
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+# Attributes every LogRecord has; anything else came in through ``extra=``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "request_id"}
+
+_stats = {"dropped": 0}
+_handler = None
+_listener = None
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Tag with the caller's request; leave formatting to the listener thread
+        record.request_id = request_id.get()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _stats["dropped"] += 1
+
+
+def _start_listener():
+    global _listener
+    _handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JSONFormatter())
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def configure():
+    """Install the queue handler on the root logger (idempotent)."""
+    global _handler
+    if _handler is not None:
+        return
+    _handler = _NonBlockingQueueHandler(None)
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL)
+    _start_listener()
+    # gunicorn --preload forks after import: the listener thread stays behind in
+    # the master, so each worker starts its own (with a fresh queue and lock)
+    os.register_at_fork(after_in_child=_start_listener)
+
+
+def shutdown():
+    """Flush queued records (on worker exit)."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def _sampled(route):
+    rate = ACCESS_SAMPLE_ROUTES.get(route, ACCESS_SAMPLE)
+    return rate >= 1 or random.random() < rate
+
+
+class RequestContextMiddleware:
+    """ASGI middleware: request ids plus the sampled access log."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        rid = incoming if _REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+        token = request_id.set(rid)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", rid.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            # The route template keeps sampling and log volume per endpoint, not per URL
+            route = getattr(scope.get("route"), "path", scope["path"])
+            if status >= 500 or elapsed_ms >= SLOW_REQUEST_MS or _sampled(route):
+                access_logger.info(
+                    "%s %s %s %.1fms",
+                    scope["method"],
+                    route,
+                    status,
+                    elapsed_ms,
+                    extra={"status": status, "duration_ms": round(elapsed_ms, 1), "route": route},
+                )
+            request_id.reset(token)
+
+
+def stats():
+    return {
+        "queued": _handler.queue.qsize() if _handler is not None else 0,
+        "dropped": _stats["dropped"],
+    }
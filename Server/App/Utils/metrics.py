@@ -0,0 +1,23 @@
+"""
+Process-local counters exposed on ``GET /metrics``.
+
+Modules register a zero-argument callable returning a JSON-serializable dict;
+the endpoint calls each one and reports the results under its name.
+"""
+import os
+
+_providers = {}
+
+
+def register(name, provider):
+    _providers[name] = provider
+
+
+def snapshot():
+    data = {"pid": os.getpid()}
+    for name, provider in _providers.items():
+        try:
+            data[name] = provider()
+        except Exception as e:
+            data[name] = {"error": str(e)}
+    return data
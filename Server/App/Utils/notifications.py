@@ -0,0 +1,34 @@
+"""
+Outgoing e-mail. Sends over SMTP when ``SMTP_HOST`` is configured, otherwise
+just logs the message (local development).
+"""
+import logging
+import os
+import smtplib
+from email.message import EmailMessage
+
+logger = logging.getLogger(__name__)
+
+SMTP_HOST = os.getenv("SMTP_HOST")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+MAIL_FROM = os.getenv("MAIL_FROM", "no-reply@shopease.local")
+
+
+def send_email(to, subject, body):
+    if not SMTP_HOST:
+        logger.info("E-mail to %s (SMTP not configured): %s", to, subject)
+        return
+
+    message = EmailMessage()
+    message["From"] = MAIL_FROM
+    message["To"] = to
+    message["Subject"] = subject
+    message.set_content(body)
+
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=10) as smtp:
+        smtp.starttls()
+        if SMTP_USER:
+            smtp.login(SMTP_USER, SMTP_PASSWORD)
+        smtp.send_message(message)
@@ -0,0 +1,220 @@
+"""
+Product detail cache for ``/products/getproductbyid``.
+
+The product + related products payload is cached (LRU, TTL) and explicitly
+invalidated by the product write routes. Stock is kept out of that payload's
+lifetime: it lives in a separate short-TTL cache, refreshed with one
+``WHERE id IN (...)`` query and dropped whenever a cart route moves stock, so
+descriptions and prices stay cached while availability stays accurate.
+
+Listing facet counts (``/products/listing``) are cached per filter set for
+``PRODUCT_FACET_TTL`` seconds; they are approximate by design and only expire.
+
+``/products/search`` results are cached per normalized keyword and sparse
+fieldset; the product and category write routes clear them through
+``bump_catalog_version``. Stock is overlaid from the stock cache on every hit
+that includes it.
+
+Rarely changing catalog responses (the category tree, trending products) are
+kept in ``catalog``, cleared by ``bump_catalog_version`` and otherwise
+expiring after ``CATALOG_CACHE_TTL`` / ``TRENDING_CACHE_TTL`` seconds. Workers
+fill it during warm-up (App/Utils/warmup.py).
+
+Every cache but ``stock`` is two-tier (App/Utils/shared_cache.py): with a
+shared ``CACHE_BACKEND`` a worker's miss can be filled by another worker's
+load, and invalidations reach the other workers as ``product.changed`` /
+``catalog.changed`` events instead of waiting for their TTLs.
+"""
+import os
+
+from App.DB.connection import get_read_connection
+from App.Utils import shared_cache
+from App.Utils.cache import MISSING, TTLCache
+from App.Utils.shared_cache import TwoTierCache
+
+DETAIL_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", "10000"))
+DETAIL_TTL = float(os.getenv("PRODUCT_CACHE_TTL", "300"))
+STOCK_TTL = float(os.getenv("PRODUCT_STOCK_TTL", "5"))  # 0 = always read stock fresh
+FACET_TTL = float(os.getenv("PRODUCT_FACET_TTL", "60"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "2000"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "60"))
+SEARCH_CACHE_MB = float(os.getenv("SEARCH_CACHE_MB", "32"))
+CATALOG_TTL = float(os.getenv("CATALOG_CACHE_TTL", "300"))
+TRENDING_TTL = float(os.getenv("TRENDING_CACHE_TTL", "60"))
+
+details = TwoTierCache("details", TTLCache(DETAIL_CACHE_SIZE, DETAIL_TTL))
+stock = TTLCache(DETAIL_CACHE_SIZE * 4, STOCK_TTL)  # local only: cheap to reload, changes constantly
+facets = TwoTierCache("facets", TTLCache(1000, FACET_TTL))
+# product id -> row, for /products/batch
+rows = TwoTierCache("rows", TTLCache(DETAIL_CACHE_SIZE * 4, DETAIL_TTL))
+search = TwoTierCache(
+    "search", TTLCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, max_bytes=int(SEARCH_CACHE_MB * 1024 * 1024))
+)
+catalog = TwoTierCache("catalog", TTLCache(256, CATALOG_TTL))
+catalog_version = 0  # bumped on every catalog write seen by this process
+
+
+def _product_ids(detail):
+    return [detail["product"]["product_id"]] + [p["product_id"] for p in detail["related_products"]]
+
+
+def _remember_stock(detail):
+    if STOCK_TTL > 0:
+        stock.set(detail["product"]["product_id"], detail["product"]["stock"])
+        for related in detail["related_products"]:
+            stock.set(related["product_id"], related["stock"])
+
+
+def _current_stock(product_ids):
+    levels = {}
+    missing = []
+    for product_id in product_ids:
+        level = stock.get(product_id) if STOCK_TTL > 0 else MISSING
+        if level is MISSING:
+            missing.append(product_id)
+        else:
+            levels[product_id] = level
+
+    if missing:
+        conn = get_read_connection()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            placeholders = ", ".join(["%s"] * len(missing))
+            cursor.execute(f"SELECT id, stock FROM products WHERE id IN ({placeholders})", tuple(missing))
+            for row in cursor.fetchall():
+                levels[row["id"]] = row["stock"]
+                if STOCK_TTL > 0:
+                    stock.set(row["id"], row["stock"])
+        finally:
+            conn.close()
+    return levels
+
+
+def get_detail(product_id, limit_related):
+    """Cached detail with current stock overlaid, or None on a miss."""
+    detail = details.get((product_id, limit_related), None)
+    if detail is None:
+        return None
+
+    levels = _current_stock(_product_ids(detail))
+    # Copies: the cached payload is shared between requests
+    return {
+        "product": dict(detail["product"], stock=levels.get(product_id, detail["product"]["stock"])),
+        "related_products": [
+            dict(p, stock=levels.get(p["product_id"], p["stock"])) for p in detail["related_products"]
+        ],
+    }
+
+
+def put_detail(product_id, limit_related, detail, generation):
+    """Cache a freshly loaded detail unless a product write happened while it was loading."""
+    details.set((product_id, limit_related), detail, generation=generation)
+    _remember_stock(detail)
+
+
+def get_rows(product_ids):
+    """Cached product rows with current stock overlaid: ({id: row}, ids not cached)."""
+    found = {}
+    missing = []
+    for product_id in product_ids:
+        row = rows.get(product_id, None)
+        if row is None:
+            missing.append(product_id)
+        else:
+            found[product_id] = row
+    if found:
+        levels = _current_stock(list(found))
+        found = {pid: dict(row, stock=levels.get(pid, row["stock"])) for pid, row in found.items()}
+    return found, missing
+
+
+def put_rows(loaded, generation):
+    """Cache freshly loaded product rows unless a product write happened meanwhile."""
+    for row in loaded:
+        rows.set(row["product_id"], row, generation=generation)
+        if STOCK_TTL > 0:
+            stock.set(row["product_id"], row["stock"])
+
+
+def invalidate_product(product_id):
+    """After a product update / delete: drop it and every cached page listing it as related."""
+    details.invalidate_where(lambda key, detail: product_id in _product_ids(detail))
+    rows.invalidate(product_id)
+    stock.invalidate(product_id)
+    shared_cache.publish("product.changed", product_id=product_id)
+
+
+@shared_cache.subscribe("product.changed")
+def _on_product_changed(product_id):
+    # The publisher already dropped the shared entries
+    details.local.invalidate_where(lambda key, detail: product_id in _product_ids(detail))
+    rows.local.invalidate(product_id)
+    stock.invalidate(product_id)
+
+
+def bump_catalog_version():
+    """After any product or category write: cached search results are stale."""
+    global catalog_version
+    catalog_version += 1
+    search.clear()
+    catalog.clear()
+    shared_cache.publish("catalog.changed")
+
+
+@shared_cache.subscribe("catalog.changed")
+def _on_catalog_changed():
+    global catalog_version
+    catalog_version += 1
+    search.local.clear()
+    catalog.local.clear()
+
+
+def get_catalog(key, load, ttl=None):
+    """Catalog response for ``key``, calling ``load()`` and caching its result on a miss."""
+    generation = catalog.generation
+    value = catalog.get(key)
+    if value is MISSING:
+        value = load()
+        # Dropped if a catalog write happened while loading
+        catalog.set(key, value, ttl=ttl, generation=generation)
+    return value
+
+
+def normalize_keyword(keyword):
+    return " ".join(keyword.casefold().split())
+
+
+def get_search(keyword, fields=None):
+    """Cached search response for a normalized keyword and fieldset with current stock, or None."""
+    response = search.get((keyword, fields), None)
+    if response is None or "products" not in response or not response["products"]:
+        return response
+    if "stock" not in response["products"][0]:
+        return response
+    levels = _current_stock([p["product_id"] for p in response["products"]])
+    return dict(
+        response,
+        products=[dict(p, stock=levels.get(p["product_id"], p["stock"])) for p in response["products"]],
+    )
+
+
+def put_search(keyword, version, response, fields=None):
+    """Cache a search response unless the catalog changed while it was computed."""
+    if version == catalog_version:
+        search.set((keyword, fields), response)
+
+
+def invalidate_stock(product_id):
+    """After a cart operation moved stock for ``product_id``."""
+    stock.invalidate(product_id)
+
+
+def stats():
+    return {
+        "details": details.stats(),
+        "rows": rows.stats(),
+        "stock": stock.stats(),
+        "facets": facets.stats(),
+        "search": dict(search.stats(), catalog_version=catalog_version),
+        "catalog": catalog.stats(),
+    }
@@ -0,0 +1,124 @@
+"""
+In-memory token-bucket rate limiting, per worker process.
+
+Each key (client IP, account, ...) holds one bucket of two numbers, so memory
+is O(1) per key. Buckets that have been idle long enough to refill completely
+are indistinguishable from new ones and are evicted, oldest first.
+
+Limits are configured per route name with environment variables of the form
+``RATE_LIMIT_<NAME>="<requests>/<seconds>"``, e.g. ``RATE_LIMIT_LOGIN=10/60``.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request
+
+# route name -> default "<requests>/<seconds>"
+DEFAULT_LIMITS = {
+    "login": "10/60",
+    "login_account": "5/60",
+    "search": "30/10",
+}
+
+# Behind Railway / Heroku the client address is the proxy's; use the hop it appended.
+# Off by default: without a proxy, clients could pick their own key per request.
+# The Procfile turns it on for those platforms.
+TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() in ("1", "true", "yes")
+
+
+class TokenBucketLimiter:
+    def __init__(self, capacity, period, max_keys=100_000):
+        self.capacity = float(capacity)
+        self.rate = capacity / period  # tokens per second
+        self.max_keys = max_keys
+        self._refill_time = period  # an idle bucket is full again after this long
+        self._buckets = OrderedDict()  # key -> [tokens, last_seen], oldest first
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """Take one token for ``key``. Returns 0 if allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(key, None)
+            if bucket is None:
+                tokens = self.capacity
+            else:
+                tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+
+            self._buckets[key] = [tokens, now]
+            self._evict(now)
+            return wait
+
+    def _evict(self, now):
+        buckets = self._buckets
+        while buckets:
+            key, (_, last_seen) = next(iter(buckets.items()))
+            if now - last_seen < self._refill_time and len(buckets) <= self.max_keys:
+                break
+            del buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# ------------------ Per-route Limiters ------------------
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _parse_limit(value):
+    requests, _, seconds = value.partition("/")
+    return int(requests), float(seconds or 1)
+
+
+def get_limiter(name):
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                spec = os.getenv(f"RATE_LIMIT_{name.upper()}", DEFAULT_LIMITS.get(name, "60/60"))
+                limiter = TokenBucketLimiter(*_parse_limit(spec))
+                _limiters[name] = limiter
+    return limiter
+
+
+def client_ip(request: Request):
+    if TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def enforce(name, key):
+    """Raise 429 with Retry-After if ``key`` is over the ``name`` limit."""
+    wait = get_limiter(name).acquire(key)
+    if wait > 0:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests. Please try again later.",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+
+def rate_limit(name):
+    """Route dependency limiting each client IP: ``dependencies=[Depends(rate_limit("search"))]``."""
+
+    def dependency(request: Request):
+        enforce(name, client_ip(request))
+
+    return dependency
+
+
+def stats():
+    return {name: {"keys": len(limiter)} for name, limiter in _limiters.items()}
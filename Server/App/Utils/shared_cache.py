@@ -0,0 +1,294 @@
+"""
+Two-tier caches shared by every app process, and the invalidation channel.
+
+``TwoTierCache`` puts the usual in-process ``TTLCache`` in front of a shared
+key-value store picked by ``CACHE_BACKEND``:
+
+- ``local`` (default): no shared tier, each process caches on its own
+- ``redis``: entries are also written to Redis (``REDIS_URL``) with the same
+  TTL, so a miss in one process is often a hit loaded by another
+- ``memory``: the in-process Redis stand-in, for tests and local development
+
+A lookup checks the local tier, then the shared one (filling the local tier
+on a hit). Shared keys carry a per-cache version: ``clear`` and
+``invalidate_where`` bump it instead of scanning Redis.
+
+Writes are broadcast on a pub/sub channel. ``publish(event, **data)`` sends
+an event to every other process, where the handlers registered with
+``@subscribe(event)`` update that process's local state (App/Utils/
+product_cache.py drops its local entries this way). A supervised listener
+thread reconnects after errors; messages sent while it was away are lost,
+so it then clears the local tiers and runs the ``RESYNC`` handlers.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+
+from App.Utils import kv
+from App.Utils.cache import MISSING
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local")
+CHANNEL = "cache:invalidate"
+RESYNC = "resync"  # local event: the listener reconnected and may have missed messages
+RECONNECT_DELAY = 1.0  # seconds, doubled per failed attempt up to 30
+
+_caches = {}  # name -> TwoTierCache
+_handlers = {}  # event -> [fn(**data)]
+_stats = {"published": 0, "received": 0, "errors": 0, "reconnects": 0}
+_listener = None
+_listening = False
+_stop = threading.Event()
+
+
+def _client():
+    return None if CACHE_BACKEND == "local" else kv.client(CACHE_BACKEND)
+
+
+def _origin():
+    # Read at publish time: with --preload, workers share the master's import
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ------------------ Values ------------------
+def _tag(value):
+    # Keep the types the routes return, so shared hits serialize like fresh loads
+    if isinstance(value, Decimal):
+        return {"$decimal": str(value)}
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Cannot cache {type(value).__name__}")
+
+
+def _untag(obj):
+    if len(obj) == 1:
+        if "$decimal" in obj:
+            return Decimal(obj["$decimal"])
+        if "$datetime" in obj:
+            return datetime.fromisoformat(obj["$datetime"])
+        if "$date" in obj:
+            return date.fromisoformat(obj["$date"])
+    return obj
+
+
+def dumps(value):
+    return json.dumps(value, default=_tag, separators=(",", ":"))
+
+
+def loads(text):
+    return json.loads(text, object_hook=_untag)
+
+
+# ------------------ Caches ------------------
+class TwoTierCache:
+    """``TTLCache`` interface over a local ``TTLCache`` plus the shared store."""
+
+    def __init__(self, name, local):
+        self.name = name
+        self.local = local
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self._version = None
+        _caches[name] = self
+
+    @property
+    def generation(self):
+        return self.local.generation
+
+    def _version_key(self):
+        return f"cache:{self.name}:version"
+
+    def _shared_key(self, kv_client, key):
+        if self._version is None:
+            self._version = int(kv_client.get(self._version_key()) or 0)
+        return f"cache:{self.name}:{self._version}:{json.dumps(key, default=str)}"
+
+    def get(self, key, default=MISSING):
+        value = self.local.get(key)
+        if value is not MISSING:
+            return value
+        kv_client = _client()
+        if kv_client is None:
+            return default
+        generation = self.local.generation
+        try:
+            shared_key = self._shared_key(kv_client, key)
+            pipe = kv_client.pipeline(transaction=False)
+            pipe.get(shared_key)
+            pipe.pttl(shared_key)
+            text, remaining_ms = pipe.execute()
+        except Exception as e:
+            logger.warning("Shared cache %s read failed: %s", self.name, e)
+            return default
+        if text is None:
+            self.shared_misses += 1
+            return default
+        self.shared_hits += 1
+        value = loads(text)
+        # Only for what is left of the shared entry's TTL, so the tiers' ages don't add up
+        ttl = self.local.ttl if remaining_ms < 0 else min(remaining_ms / 1000, self.local.ttl)
+        self.local.set(key, value, ttl=ttl, generation=generation)
+        return value
+
+    def set(self, key, value, ttl=None, generation=None):
+        if not self.local.set(key, value, ttl=ttl, generation=generation):
+            return False  # stale or too large: keep it out of the shared tier too
+        kv_client = _client()
+        ttl = self.local.ttl if ttl is None else ttl
+        if kv_client is not None and ttl > 0:
+            try:
+                kv_client.set(self._shared_key(kv_client, key), dumps(value), px=int(ttl * 1000))
+            except Exception as e:
+                logger.warning("Shared cache %s write failed: %s", self.name, e)
+        return True
+
+    def invalidate(self, key):
+        self.local.invalidate(key)
+        kv_client = _client()
+        if kv_client is not None:
+            try:
+                kv_client.delete(self._shared_key(kv_client, key))
+            except Exception as e:
+                # Runs after the caller committed: log, the entry expires with its TTL
+                logger.warning("Shared cache %s invalidation failed: %s", self.name, e)
+
+    def _bump_version(self):
+        kv_client = _client()
+        if kv_client is None:
+            return
+        try:
+            self._version = kv_client.incr(self._version_key())
+        except Exception as e:
+            logger.warning("Shared cache %s invalidation failed: %s", self.name, e)
+            return
+        publish("cache.version", cache=self.name, version=self._version)
+
+    def invalidate_where(self, predicate):
+        """Local entries matching ``predicate``; the whole shared tier (it can't be scanned)."""
+        self.local.invalidate_where(predicate)
+        self._bump_version()
+
+    def clear(self):
+        self.local.clear()
+        self._bump_version()
+
+    def __len__(self):
+        return len(self.local)
+
+    def stats(self):
+        stats = self.local.stats()
+        if CACHE_BACKEND != "local":
+            stats.update(shared_hits=self.shared_hits, shared_misses=self.shared_misses, version=self._version)
+        return stats
+
+
+# ------------------ Invalidation Channel ------------------
+def subscribe(event):
+    """Register ``fn(**data)`` to run in this process when another process publishes ``event``."""
+
+    def register(fn):
+        _handlers.setdefault(event, []).append(fn)
+        return fn
+
+    return register
+
+
+def publish(event, **data):
+    """Tell every other process about ``event`` (no-op without a shared backend)."""
+    kv_client = _client()
+    if kv_client is None:
+        return
+    try:
+        kv_client.publish(CHANNEL, json.dumps({"origin": _origin(), "event": event, "data": data}, default=str))
+        _stats["published"] += 1
+    except Exception as e:
+        _stats["errors"] += 1
+        logger.warning("Publishing %s failed: %s", event, e)
+
+
+@subscribe("cache.version")
+def _on_version(cache, version):
+    target = _caches.get(cache)
+    if target is not None and (target._version is None or version > target._version):
+        target._version = version
+
+
+def _on_message(message):
+    try:
+        payload = json.loads(message["data"])
+        if payload["origin"] == _origin():
+            return  # already applied where it was published
+        _stats["received"] += 1
+        for fn in _handlers.get(payload["event"], []):
+            fn(**payload["data"])
+    except Exception as e:
+        _stats["errors"] += 1
+        logger.warning("Invalidation message failed: %s", e)
+
+
+def _resync():
+    """After a gap in the subscription: drop what other processes may have invalidated."""
+    for cache in _caches.values():
+        cache.local.clear()
+        cache._version = None  # re-read: version bumps may have been missed too
+    for fn in _handlers.get(RESYNC, []):
+        fn()
+
+
+def _listen(kv_client):
+    global _listening
+    delay = RECONNECT_DELAY
+    connected_before = False
+    while not _stop.is_set():
+        pubsub = kv_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(**{CHANNEL: _on_message})
+            _listening = True
+            if connected_before:
+                _stats["reconnects"] += 1
+                _resync()
+            connected_before = True
+            delay = RECONNECT_DELAY
+            while not _stop.is_set():
+                pubsub.get_message(timeout=1.0)  # runs _on_message for what arrives
+        except Exception as e:
+            _stats["errors"] += 1
+            logger.warning("Invalidation listener lost its connection (retrying in %ss): %s", delay, e)
+        finally:
+            _listening = False
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+        _stop.wait(delay)
+        delay = min(delay * 2, 30)
+
+
+def start():
+    """Listen for other processes' invalidations (idempotent; call after the fork)."""
+    global _listener
+    kv_client = _client()
+    if kv_client is None or _listener is not None:
+        return
+    _stop.clear()
+    _listener = threading.Thread(target=_listen, args=(kv_client,), name="cache-invalidation", daemon=True)
+    _listener.start()
+
+
+def stop(timeout=5):
+    global _listener
+    if _listener is not None:
+        _stop.set()
+        _listener.join(timeout)
+        _listener = None
+
+
+def stats():
+    return dict(_stats, backend=CACHE_BACKEND, listening=_listening)
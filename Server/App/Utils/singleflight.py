@@ -0,0 +1,81 @@
+"""
+Single-flight request coalescing, per worker process.
+
+Concurrent callers asking for the same key while a load is already running
+wait for that load and share its result (or its exception) instead of running
+the same queries again. Nothing is cached: once the leader finishes, the next
+caller starts a fresh load.
+"""
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.collapsed = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            total = self.executions + self.collapsed
+            return {
+                "executions": self.executions,
+                "collapsed": self.collapsed,
+                "in_flight": len(self._calls),
+                "collapsed_ratio": round(self.collapsed / total, 4) if total else 0.0,
+            }
+
+
+_group = SingleFlight()
+
+
+def make_key(route, params):
+    """Route plus its parameters in a stable order."""
+    return route + "?" + "&".join(f"{name}={params[name]}" for name in sorted(params))
+
+
+def coalesce(route, params, fn):
+    """Run ``fn()`` once for all identical concurrent ``route`` + ``params`` requests."""
+    return _group.do(make_key(route, params), fn)
+
+
+def stats():
+    return _group.stats()
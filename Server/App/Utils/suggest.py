@@ -0,0 +1,207 @@
+"""
+In-memory prefix index for ``/products/suggest`` (type-ahead).
+
+A trie flattened into a dict: every prefix shorter than ``MAX_PREFIX``
+characters of every indexed term maps straight to its best ``TOP_K`` entries,
+so a lookup is one dict access and never touches MySQL. Terms are product,
+subcategory and category names, each indexed from every word start so "pho"
+finds "Smart Phone". Entries are inserted best-first (by popularity), which
+makes each node's top-k list simply its first ``TOP_K`` arrivals.
+
+Prefixes of exactly ``MAX_PREFIX`` characters keep every matching entry
+instead (with its term and word start); longer queries scan that list, which
+is short by then. Capping the prefix length keeps the index to tens of MB for
+the default 50k products; indexing every prefix up to 20 characters took
+over 300 MB per process.
+
+Only the ``SUGGEST_MAX_PRODUCTS`` most popular products are indexed. The
+index is rebuilt in a background thread and swapped in atomically: on first
+use, and after catalog writes mark it dirty (checked by a periodic job).
+Deleted products are filtered out immediately, before the rebuild. Writes
+made through other processes arrive as ``catalog.changed`` /
+``product.deleted`` events (App/Utils/shared_cache.py).
+"""
+import logging
+import os
+import re
+import threading
+import time
+
+from App.DB.connection import get_read_connection
+from App.Utils import jobs, shared_cache
+
+logger = logging.getLogger(__name__)
+
+MAX_PRODUCTS = int(os.getenv("SUGGEST_MAX_PRODUCTS", "50000"))
+REFRESH_INTERVAL = float(os.getenv("SUGGEST_REFRESH_INTERVAL", "60"))
+MAX_PREFIX = int(os.getenv("SUGGEST_MAX_PREFIX", "8"))
+TOP_K = 10
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text):
+    return " ".join(_WORD.findall(text.lower()))
+
+
+class PrefixIndex:
+    def __init__(self, entries):
+        """``entries``: (score, entry dict) pairs; an entry has ``type``, ``id`` and ``name``."""
+        self.prefixes = {}
+        self.entries = 0
+        for _, entry in sorted(entries, key=lambda e: e[0], reverse=True):
+            self._add(entry)
+            self.entries += 1
+
+    def _add(self, entry):
+        term = normalize(entry["name"])
+        seen = set()
+        # Every word start: "smart phone" is reachable from "sma" and from "pho"
+        for match in _WORD.finditer(term):
+            suffix = term[match.start():]
+            for length in range(1, min(len(suffix), MAX_PREFIX - 1) + 1):
+                prefix = suffix[:length]
+                if prefix in seen:
+                    continue
+                seen.add(prefix)
+                bucket = self.prefixes.setdefault(prefix, [])
+                if len(bucket) < TOP_K:
+                    bucket.append(entry)
+            if len(suffix) >= MAX_PREFIX:
+                # Uncapped: longer queries are filtered against the term from this word start
+                self.prefixes.setdefault(suffix[:MAX_PREFIX], []).append((term, match.start(), entry))
+
+    def lookup(self, query, limit, exclude=()):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        if len(prefix) < MAX_PREFIX:
+            candidates = self.prefixes.get(prefix, ())
+        else:
+            candidates = (
+                entry
+                for term, start, entry in self.prefixes.get(prefix[:MAX_PREFIX], ())
+                if term.startswith(prefix, start)
+            )
+        results = []
+        for entry in candidates:
+            if entry["type"] == "product" and entry["id"] in exclude:
+                continue
+            if any(entry is seen for seen in results):
+                continue  # one term can match from two word starts
+            results.append(entry)
+            if len(results) >= limit:
+                break
+        return results
+
+
+# ------------------ Building ------------------
+_index = None
+_removed = set()  # products deleted since the last build
+_dirty = False
+_building = threading.Lock()
+_stats = {"builds": 0, "last_build_seconds": 0.0, "built_at": None}
+
+
+def _load_entries():
+    conn = get_read_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            "SELECT id, name, popularity FROM products ORDER BY popularity DESC, id DESC LIMIT %s",
+            (MAX_PRODUCTS,),
+        )
+        entries = [
+            (row["popularity"], {"type": "product", "id": row["id"], "name": row["name"]})
+            for row in cursor.fetchall()
+            if row["name"]
+        ]
+        # Categories rank by the sales of everything under them, so they surface first
+        cursor.execute(
+            """
+            SELECT sc.id, sc.category_id, sc.name, COALESCE(SUM(p.popularity), 0) AS popularity
+            FROM sub_categories sc
+            LEFT JOIN products p ON p.sub_category_id = sc.id
+            GROUP BY sc.id, sc.category_id, sc.name
+            """
+        )
+        category_popularity = {}
+        for row in cursor.fetchall():
+            popularity = int(row["popularity"])
+            entries.append((popularity, {"type": "sub_category", "id": row["id"], "name": row["name"]}))
+            category_popularity[row["category_id"]] = category_popularity.get(row["category_id"], 0) + popularity
+        cursor.execute("SELECT id, name FROM categories")
+        entries += [
+            (category_popularity.get(row["id"], 0), {"type": "category", "id": row["id"], "name": row["name"]})
+            for row in cursor.fetchall()
+        ]
+        return entries
+    finally:
+        conn.close()
+
+
+def rebuild():
+    """Load the catalog and swap in a fresh index. Concurrent calls build once."""
+    global _index, _dirty
+    if not _building.acquire(blocking=False):
+        return
+    try:
+        started = time.perf_counter()
+        _dirty = False
+        removed = set(_removed)
+        index = PrefixIndex(_load_entries())
+        _index = index
+        _removed.difference_update(removed)
+        _stats["builds"] += 1
+        _stats["last_build_seconds"] = round(time.perf_counter() - started, 3)
+        _stats["built_at"] = time.time()
+        logger.info("Suggest index built: %s entries in %.2fs", index.entries, _stats["last_build_seconds"])
+    except Exception as e:
+        _dirty = True
+        logger.warning("Suggest index build failed: %s", e)
+    finally:
+        _building.release()
+
+
+def rebuild_in_background():
+    threading.Thread(target=rebuild, name="suggest-rebuild", daemon=True).start()
+
+
+@shared_cache.subscribe("catalog.changed")
+@shared_cache.subscribe(shared_cache.RESYNC)
+def mark_dirty():
+    """After a catalog write; the periodic refresh rebuilds the index."""
+    global _dirty
+    _dirty = True
+
+
+@shared_cache.subscribe("product.deleted")
+def remove_product(product_id):
+    """Hide a deleted product right away, then rebuild later."""
+    _removed.add(product_id)
+    mark_dirty()
+
+
+@jobs.periodic(REFRESH_INTERVAL)
+def _refresh(conn):
+    if _dirty:
+        rebuild()
+
+
+def suggest(query, limit=TOP_K):
+    """Best matches for the prefix ``query``; empty until the first build finishes."""
+    if _index is None:
+        if not _building.locked():
+            rebuild_in_background()
+        return []
+    return _index.lookup(query, min(limit, TOP_K), _removed)
+
+
+def stats():
+    index = _index
+    return dict(
+        _stats,
+        entries=index.entries if index else 0,
+        prefixes=len(index.prefixes) if index else 0,
+        dirty=_dirty,
+    )
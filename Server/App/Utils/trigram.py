@@ -0,0 +1,190 @@
+"""
+Character-trigram index over product names, for typo-tolerant search.
+
+Each word is padded ("  word ") and cut into trigrams; every trigram keeps a
+posting list of product ids (a sorted ``array``, ids are indexed in ascending
+order). A query matches a product when they share at least
+``SEARCH_FUZZY_THRESHOLD`` of the query's trigrams. Candidates only come from
+the rarest posting lists (any product sharing enough trigrams must appear in
+one of them), the remaining lists are probed with a binary search, so the work
+grows with the number of candidates rather than with the catalog.
+
+The index lives in each process: built in the background at startup, extended
+with new products by ``add_product`` and by a periodic catch-up for products
+created through other processes. Deleted ids are only filtered out (other
+processes' deletions arrive as ``product.deleted`` events); callers re-read
+the matched rows from MySQL anyway.
+"""
+import logging
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from App.DB.connection import get_read_connection
+from App.Utils import jobs, shared_cache
+
+logger = logging.getLogger(__name__)
+
+THRESHOLD = float(os.getenv("SEARCH_FUZZY_THRESHOLD", "0.4"))  # share of query trigrams that must match
+CATCH_UP_INTERVAL = float(os.getenv("SEARCH_INDEX_CATCH_UP_INTERVAL", "60"))
+
+_WORD = re.compile(r"\w+")
+
+
+def trigrams(text):
+    grams = set()
+    for word in _WORD.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    def __init__(self):
+        self.postings = {}  # trigram -> array of product ids, ascending
+        self.gram_counts = {}  # product id -> number of distinct trigrams in its name
+        self.loaded_id = 0  # every product up to this id has been read from the database
+        self._lock = threading.Lock()
+
+    def add(self, product_id, name):
+        grams = trigrams(name or "")
+        with self._lock:
+            if product_id in self.gram_counts:
+                return
+            for gram in grams:
+                postings = self.postings.get(gram)
+                if postings is None:
+                    postings = self.postings[gram] = array("l")
+                if postings and postings[-1] > product_id:
+                    postings.insert(bisect_left(postings, product_id), product_id)
+                else:
+                    postings.append(product_id)
+            self.gram_counts[product_id] = len(grams)
+
+    def search(self, query, limit=20, threshold=THRESHOLD, exclude=()):
+        """Best (product id, similarity) pairs, most similar first."""
+        grams = trigrams(query)
+        if not grams:
+            return []
+        needed = max(1, math.ceil(threshold * len(grams)))
+        lists = sorted((self.postings.get(g, ()) for g in grams), key=len)
+
+        # A product in none of the rarest len - needed + 1 lists can't reach `needed`
+        candidate_lists = len(lists) - needed + 1
+        counts = Counter()
+        for postings in lists[:candidate_lists]:
+            counts.update(postings)
+
+        rest = lists[candidate_lists:]
+        results = []
+        for product_id, shared in counts.items():
+            if product_id in exclude:
+                continue
+            for j, postings in enumerate(rest):
+                if shared + len(rest) - j < needed:
+                    break
+                i = bisect_left(postings, product_id)
+                if i < len(postings) and postings[i] == product_id:
+                    shared += 1
+            if shared < needed:
+                continue
+            # Coverage of the query first, then Jaccard so shorter, closer names win
+            coverage = shared / len(grams)
+            jaccard = shared / (len(grams) + self.gram_counts.get(product_id, 0) - shared)
+            results.append((coverage, jaccard, product_id))
+
+        results.sort(reverse=True)
+        return [(product_id, round(coverage, 3)) for coverage, _, product_id in results[:limit]]
+
+    def __len__(self):
+        return len(self.gram_counts)
+
+
+# ------------------ Building ------------------
+_index = None
+_removed = set()
+_building = threading.Lock()
+_stats = {"builds": 0, "last_build_seconds": 0.0, "searches": 0, "matches": 0}
+
+
+def _load_into(index, after_id=0):
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id, name FROM products WHERE id > %s ORDER BY id", (after_id,))
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            for product_id, name in rows:
+                index.add(product_id, name)
+            index.loaded_id = rows[-1][0]
+    finally:
+        conn.close()
+
+
+def rebuild():
+    global _index
+    if not _building.acquire(blocking=False):
+        return
+    try:
+        started = time.perf_counter()
+        index = TrigramIndex()
+        _load_into(index)
+        _index = index
+        _stats["builds"] += 1
+        _stats["last_build_seconds"] = round(time.perf_counter() - started, 3)
+        logger.info("Trigram index built: %s products in %.2fs", len(index), _stats["last_build_seconds"])
+    except Exception as e:
+        logger.warning("Trigram index build failed: %s", e)
+    finally:
+        _building.release()
+
+
+def rebuild_in_background():
+    threading.Thread(target=rebuild, name="trigram-rebuild", daemon=True).start()
+
+
+@jobs.periodic(CATCH_UP_INTERVAL)
+def _catch_up(conn):
+    # Products created through other processes (add_product only sees this one's)
+    index = _index
+    if index is not None:
+        _load_into(index, after_id=index.loaded_id)
+
+
+def add_product(product_id, name):
+    if _index is not None:
+        _index.add(product_id, name)
+
+
+@shared_cache.subscribe("product.deleted")
+def remove_product(product_id):
+    _removed.add(product_id)
+
+
+def search(query, limit=20):
+    """Fuzzy matches as (product id, similarity), or None while the index is still building."""
+    index = _index
+    if index is None:
+        if not _building.locked():
+            rebuild_in_background()
+        return None
+    matches = index.search(query, limit, exclude=_removed)
+    _stats["searches"] += 1
+    _stats["matches"] += len(matches)
+    return matches
+
+
+def stats():
+    index = _index
+    return dict(
+        _stats,
+        products=len(index) if index else 0,
+        trigrams=len(index.postings) if index else 0,
+    )
@@ -0,0 +1,128 @@
+"""
+Worker warm-up and readiness.
+
+``start()`` is called from the app lifespan, i.e. in each worker after the
+gunicorn fork, and warms the worker in a background thread:
+
+1. opens the primary and replica connection pools and prepares the hottest
+   statements on every pooled primary connection
+2. loads the category tree and trending products into the catalog cache
+
+``GET /healthz`` answers as soon as the process serves requests; ``GET
+/readyz`` returns 503 until warm-up has finished, so a load balancer only
+sends traffic to warmed workers. A failed cache step is logged and reported
+but does not hold readiness back: the caches it would have filled load
+lazily. A step registered with ``required=True`` (the pools: without them the
+worker can't serve anything) is retried until it succeeds, and the worker
+stays not ready meanwhile.
+How long the worker took to become ready is logged and reported on
+``/metrics``.
+"""
+import logging
+import os
+import threading
+import time
+
+from App.DB import connection, statements
+
+logger = logging.getLogger(__name__)
+
+# Statements prepared on every pooled connection up front (lookups of id 0 match nothing)
+WARM_STATEMENTS = [
+    ("product_detail", (0,)),
+    ("related_products", (0, 0, 1)),
+    ("products_by_subcategory", (0,)),
+    ("product_stock", (0,)),
+]
+
+RETRY_DELAY = 1.0  # seconds before retrying a required step, doubled per failure up to 30
+
+_steps = []  # (name, fn, required) in run order
+_state = {"ready": False, "started_at": None, "ready_after": None, "steps": {}, "errors": {}}
+_thread = None
+
+
+def step(name, required=False):
+    """Register ``fn()`` as a warm-up step (decorator); steps run in registration order.
+
+    A ``required`` step is retried until it succeeds before the worker becomes ready.
+    """
+    def decorator(fn):
+        _steps.append((name, fn, required))
+        return fn
+    return decorator
+
+
+@step("pools", required=True)
+def _warm_pools():
+    # Holding POOL_SIZE connections at once visits every pooled connection
+    held = []
+    try:
+        for _ in range(max(connection.POOL_SIZE, 1)):
+            conn = connection.get_connection()
+            if conn is None:
+                raise RuntimeError("primary database unreachable")
+            held.append(conn)
+            for name, params in WARM_STATEMENTS:
+                statements.fetch_all(conn, name, params)
+    finally:
+        for conn in held:
+            conn.close()
+
+    for replica in connection.replicas():
+        # Refreshes its health and lag; a healthy replica's pool is opened here too
+        replica.check()
+        if replica.usable():
+            try:
+                replica.connect().close()
+            except Exception:
+                pass  # marked down: reads go to the primary until its next check
+
+
+def _run():
+    started = time.monotonic()
+    for name, fn, required in _steps:
+        step_started = time.monotonic()
+        delay = RETRY_DELAY
+        while True:
+            try:
+                fn()
+                _state["errors"].pop(name, None)
+                break
+            except Exception as e:
+                _state["errors"][name] = str(e)
+                if not required:
+                    logger.warning("Warm-up step %s failed: %s", name, e)
+                    break
+                logger.warning("Warm-up step %s failed (retrying in %ss): %s", name, delay, e)
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+        _state["steps"][name] = round(time.monotonic() - step_started, 3)
+
+    _state["ready_after"] = round(time.monotonic() - started, 3)
+    _state["ready"] = True
+    logger.info("Worker %s ready in %ss (%s)", os.getpid(), _state["ready_after"], _state["steps"])
+
+
+def start():
+    """Warm this worker in the background (idempotent)."""
+    global _thread
+    if _thread is not None:
+        return
+    _state["started_at"] = time.time()
+    _thread = threading.Thread(target=_run, name="warm-up", daemon=True)
+    _thread.start()
+
+
+def is_ready():
+    return _state["ready"]
+
+
+def stats():
+    return {
+        "ready": _state["ready"],
+        "started_at": _state["started_at"],
+        "ready_after": _state["ready_after"],
+        "steps": dict(_state["steps"]),
+        "errors": dict(_state["errors"]),
+    }
@@ -3,13 +3,45 @@ import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 import logging
 
 # Routers
-from App.Routes import users, products, cart, checkout, categories
+from App.Routes import users, products, cart, checkout, categories, analytics
+from App.DB import migrations, statements
+from App.Utils import (
+    idempotency, jobs, log_config, metrics, product_cache, rate_limit, shared_cache, singleflight, suggest, trigram, warmup,
+)
+
+# Before anything logs: JSON lines through a background queue
+log_config.configure()
+logger = logging.getLogger(__name__)
+
+
+# ------------------ Lifespan ------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warn early if the indexes the hot queries rely on are missing
+    await run_in_threadpool(migrations.verify_schema)
+    jobs.start()
+    # Other workers' cache invalidations
+    shared_cache.start()
+    suggest.rebuild_in_background()
+    trigram.rebuild_in_background()
+    # Connections and catalog caches; /readyz turns ready when done
+    warmup.start()
+    yield
+    jobs.stop()
+    shared_cache.stop()
+    log_config.shutdown()
+
 
 # ------------------ App Setup ------------------
-app = FastAPI(title="E-commerce API", version="1.0.0")
+app = FastAPI(title="E-commerce API", version="1.0.0", lifespan=lifespan)
+
+# Request ids and the sampled access log
+app.add_middleware(log_config.RequestContextMiddleware)
 
 # CORS middleware
 origins = [
@@ -33,7 +65,7 @@ app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 # ------------------ Global Exception Handler ------------------
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    logging.error(f"Unexpected error: {exc}")
+    logger.error("Unexpected error on %s %s: %s", request.method, request.url.path, exc, exc_info=exc)
     return JSONResponse(
         status_code=500,
         content={"detail": "Internal Server Error. Please try again later."}
@@ -45,6 +77,39 @@ app.include_router(products.router)
 app.include_router(cart.router)
 app.include_router(categories.router)
 app.include_router(checkout.router)
+app.include_router(analytics.router)
+
+# ------------------ Metrics ------------------
+metrics.register("statements", statements.stats)
+metrics.register("coalescing", singleflight.stats)
+metrics.register("rate_limits", rate_limit.stats)
+metrics.register("product_cache", product_cache.stats)
+metrics.register("shared_cache", shared_cache.stats)
+metrics.register("jobs", jobs.stats)
+metrics.register("idempotency", idempotency.stats)
+metrics.register("suggest", suggest.stats)
+metrics.register("search_index", trigram.stats)
+metrics.register("startup", warmup.stats)
+metrics.register("logging", log_config.stats)
+
+
+@app.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
+
+
+# ------------------ Health Probes ------------------
+@app.get("/healthz")
+async def healthz():
+    # Liveness: the process is up and serving; no dependencies checked
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    if not warmup.is_ready():
+        return JSONResponse(status_code=503, content={"status": "warming up", **warmup.stats()})
+    return {"status": "ready", **warmup.stats()}
 
 # ------------------ Root Endpoint ------------------
 @app.get("/")
@@ -0,0 +1,324 @@
+"""
+Endpoint benchmark for the FastAPI app.
+
+Runs the real app in-process (uvicorn on a background thread) against a
+locally seeded MySQL database and records throughput and p50/p95/p99 latency
+for each endpoint, at one or more catalog sizes, in a JSON report.
+
+Usage (from the Server directory, pointed at a throwaway database):
+
+    BENCH_DB_NAME=shopease_bench python -m benchmarks.bench_endpoints \
+        --sizes 1000,10000 --requests 200 --concurrency 8 --output bench_results.json
+
+Diff two reports with ``python -m benchmarks.bench_endpoints --compare old.json new.json``.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CARD_FIELDS = "product_id,product_name,price,image_url"  # what a product card renders
+
+
+# ------------------ Environment ------------------
+def configure_environment():
+    """Point the app's DB settings at the benchmark database before it is imported."""
+    for key in ("DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME", "DB_PORT"):
+        bench_value = os.getenv(f"BENCH_{key}")
+        if bench_value is not None:
+            os.environ[key] = bench_value
+    os.environ.setdefault("DB_HOST", "127.0.0.1")
+    os.environ.setdefault("DB_PORT", "3306")
+    os.environ.setdefault("DB_USER", "root")
+    os.environ.setdefault("DB_NAME", "shopease_bench")
+    os.environ.setdefault("sec_key", "benchmark-secret")
+    # One client sends every request: measure the routes, not the 429s
+    for name in ("LOGIN", "LOGIN_ACCOUNT", "SEARCH"):
+        os.environ.setdefault(f"RATE_LIMIT_{name}", "1000000/1")
+
+    # The app mounts ./uploads relative to the working directory
+    os.chdir(SERVER_DIR)
+    if SERVER_DIR not in sys.path:
+        sys.path.insert(0, SERVER_DIR)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app):
+    import uvicorn
+
+    port = _free_port()
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def reset_app_state(timeout=600):
+    """After a reseed: rebuild the in-process search indexes and drop every cached product response."""
+    from App.Utils import product_cache, suggest, trigram
+
+    for index in (suggest, trigram):
+        builds = index.stats()["builds"]
+        deadline = time.monotonic() + timeout
+        # rebuild() returns at once while another build (the startup one) is running
+        while index.stats()["builds"] == builds:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{index.__name__} index was not rebuilt within {timeout}s")
+            index.rebuild()
+            time.sleep(0.05)
+
+    for cache in (product_cache.details, product_cache.rows, product_cache.facets, product_cache.search,
+                  product_cache.catalog, product_cache.stock):
+        cache.clear()
+
+
+# ------------------ Endpoints ------------------
+def build_endpoints(ctx):
+    """Each endpoint maps a request index to (method, path, kwargs)."""
+    rng = random.Random(7)
+
+    def product_id(_):
+        return rng.randint(1, ctx["products"])
+
+    def session(i):
+        return f"bench-run-{ctx['run']}-{i}"
+
+    auth = {"Authorization": f"Bearer {ctx['token']}"}
+    keywords = ["phone", "headphones", "shoes", "watch", "Category 3", "wirelss"] + ctx["product_names"][:5]
+
+    return [
+        # Users
+        ("POST /users/login", lambda i: ("POST", "/users/login", {
+            "json": {"email": f"bench{i % ctx['users'] + 1}@example.com", "password": ctx["password"]}})),
+        # Categories
+        ("GET /categories/all", lambda i: ("GET", "/categories/all", {})),
+        ("GET /categories/carousel", lambda i: ("GET", "/categories/carousel", {})),
+        ("GET /categories/home-sections", lambda i: ("GET", "/categories/home-sections", {})),
+        ("GET /categories/subcategories/{id}", lambda i: (
+            "GET", f"/categories/subcategories/{i % ctx['categories'] + 1}", {})),
+        # Products
+        ("GET /products/allproducts", lambda i: ("GET", "/products/allproducts", {})),
+        ("GET /products/allproducts?fields", lambda i: ("GET", "/products/allproducts", {
+            "params": {"fields": CARD_FIELDS}})),
+        ("GET /products/getproductsbyid/{sub}", lambda i: (
+            "GET", f"/products/getproductsbyid/{i % ctx['sub_categories'] + 1}", {})),
+        ("GET /products/listing", lambda i: ("GET", "/products/listing", {"params": {
+            "sub_category_id": i % ctx["sub_categories"] + 1, "sort": ["newest", "price_asc", "popularity"][i % 3],
+            "in_stock": "true"}})),
+        ("GET /products/batch", lambda i: ("GET", "/products/batch", {
+            "params": {"ids": ",".join(str(product_id(i)) for _ in range(12))}})),
+        ("GET /products/getproductbyid/{id}", lambda i: ("GET", f"/products/getproductbyid/{product_id(i)}", {})),
+        ("GET /products/search", lambda i: (
+            "GET", "/products/search", {"params": {"keyword": keywords[i % len(keywords)]}})),
+        ("GET /products/search?fields", lambda i: ("GET", "/products/search", {
+            "params": {"keyword": keywords[i % len(keywords)], "fields": CARD_FIELDS}})),
+        ("GET /products/suggest", lambda i: (
+            "GET", "/products/suggest", {"params": {"q": keywords[i % len(keywords)][:1 + i % 5]}})),
+        ("GET /products/trending", lambda i: ("GET", "/products/trending", {})),
+        ("GET /products/allproducts/{user}", lambda i: (
+            "GET", f"/products/allproducts/{i % ctx['users'] + 1}", {})),
+        # Cart (guest sessions, so the cycle below is self-contained)
+        ("POST /cart/addcart", lambda i: ("POST", "/cart/addcart", {
+            "params": {"session_id": session(i)}, "json": {"product_id": (i % ctx["products"]) + 1, "quantity": 1}})),
+        ("GET /cart/getcart", lambda i: ("GET", "/cart/getcart", {"params": {"session_id": session(i)}})),
+        ("PUT /cart/updatecart/{id}", lambda i: ("PUT", f"/cart/updatecart/{(i % ctx['products']) + 1}", {
+            "params": {"session_id": session(i), "quantity": 2}})),
+        ("DELETE /cart/removecart/{id}", lambda i: ("DELETE", f"/cart/removecart/{(i % ctx['products']) + 1}", {
+            "params": {"session_id": session(i)}})),
+        # Orders
+        ("POST /order/create", lambda i: ("POST", "/order/create", {"json": {
+            "user_email": f"bench{i % ctx['users'] + 1}@example.com",
+            "state": "Punjab",
+            "city": "Lahore",
+            "address": "1 Bench Street",
+            "phone_number": "03001234567",
+            "payment_method": "card",
+            "card_last4": "4242",
+            "items": [{"product_id": (i % ctx["products"]) + 1, "product_name": "Bench item",
+                       "quantity": 1, "price": 100.0}],
+        }})),
+        ("GET /order/orders/{email}", lambda i: (
+            "GET", f"/order/orders/bench{i % ctx['users'] + 1}@example.com", {})),
+        ("GET /order/all", lambda i: ("GET", "/order/all", {"headers": auth})),
+    ]
+
+
+# ------------------ Measurement ------------------
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_endpoint(client, build, n_requests, concurrency, offset=0):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        method, path, kwargs = build(i)
+        started = time.perf_counter()
+        try:
+            response = client.request(method, path, **kwargs)
+            ok = response.status_code < 400 and not (
+                isinstance(response.json(), dict) and "error" in response.json()
+            )
+        except Exception:
+            ok = False
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(offset, offset + n_requests)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return {
+        "requests": n_requests,
+        "errors": errors,
+        "throughput_rps": round(n_requests / wall, 2) if wall else None,
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+# ------------------ Compare ------------------
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)["results"]
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+
+    print(f"{'size':>8}  {'endpoint':<40} {'p50 old':>9} {'p50 new':>9} {'p99 old':>9} {'p99 new':>9} {'rps Δ%':>8}")
+    for size, endpoints in new.items():
+        for name, stats in endpoints.items():
+            before = old.get(size, {}).get(name)
+            if not before:
+                continue
+            delta = (stats["throughput_rps"] - before["throughput_rps"]) / before["throughput_rps"] * 100
+            print(f"{size:>8}  {name:<40} {before['p50_ms']:>9} {stats['p50_ms']:>9} "
+                  f"{before['p99_ms']:>9} {stats['p99_ms']:>9} {delta:>+8.1f}")
+
+
+# ------------------ Entry Point ------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every router against a seeded local database.")
+    parser.add_argument("--sizes", default="1000,10000", help="comma separated catalog sizes (products)")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per endpoint")
+    parser.add_argument("--only", default="", help="substring filter on endpoint names")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--no-seed", action="store_true", help="reuse the data already in the database")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two reports and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    configure_environment()
+
+    import httpx
+    from App.Utils import security
+    from App.main import app
+    from benchmarks import datagen
+
+    server = thread = None  # started once the first dataset is in place
+    report = {
+        "meta": {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "database": f"{os.environ['DB_HOST']}:{os.environ['DB_PORT']}/{os.environ['DB_NAME']}",
+            "requests_per_endpoint": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": {},
+    }
+
+    try:
+        for size in [int(s) for s in args.sizes.split(",") if s]:
+            conn = datagen.connect()
+            if args.no_seed:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute("SELECT COUNT(*) AS n FROM products")
+                summary = {"products": cursor.fetchone()["n"], "users": args.users, "categories": 10,
+                           "sub_categories": 60, "product_names": []}
+            else:
+                print(f"Seeding {size} products ...", flush=True)
+                summary = datagen.generate(conn, products=size, users=args.users,
+                                           orders=max(1000, size // 2), carts=max(500, size // 10),
+                                           verbose=False)
+            conn.close()
+
+            if server is None:
+                # Only now: startup builds the search indexes from whatever is in the database
+                server, thread, base_url = start_server(app)
+            reset_app_state()
+
+            ctx = dict(summary)
+            ctx["run"] = f"{size}-{int(time.time())}"
+            ctx["password"] = datagen.BENCH_PASSWORD
+            ctx["token"] = security.create_access_token({"email": "bench1@example.com", "role": "admin"})
+
+            results = {}
+            with httpx.Client(base_url=base_url, timeout=60) as client:
+                for name, build in build_endpoints(ctx):
+                    if args.only and args.only not in name:
+                        continue
+                    if args.warmup:
+                        # Offset so warm-up sessions don't collide with measured cart cycles
+                        run_endpoint(client, build, args.warmup, 1, offset=args.requests)
+                    results[name] = run_endpoint(client, build, args.requests, args.concurrency)
+                    stats = results[name]
+                    print(f"[{size:>8}] {name:<40} {stats['throughput_rps']:>9} rps  "
+                          f"p50 {stats['p50_ms']:>8} ms  p95 {stats['p95_ms']:>8} ms  "
+                          f"p99 {stats['p99_ms']:>8} ms  errors {stats['errors']}", flush=True)
+            report["results"][str(size)] = results
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join(timeout=10)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
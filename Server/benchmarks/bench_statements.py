@@ -0,0 +1,118 @@
+"""
+Text protocol vs prepared statements for the top hot queries.
+
+Runs each registered statement N times with plain ``cursor.execute`` (SQL sent
+and parsed on every call) and through App.DB.statements (prepared once, then
+only the statement id + binary parameters are sent), and reports the per-call
+cost of both plus the server-side parse counters.
+
+    python -m benchmarks.bench_statements --iterations 2000 --output statements_results.json
+
+Needs a seeded database (see benchmarks/datagen.py); uses the same BENCH_DB_*
+overrides as the endpoint benchmark.
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.bench_endpoints import configure_environment, percentile
+
+
+def _parameters(cursor, rng):
+    """Per-statement parameter factories built from real ids in the database."""
+    cursor.execute("SELECT id, sub_category_id FROM products ORDER BY RAND() LIMIT 200")
+    products = cursor.fetchall()
+    cursor.execute("SELECT email FROM users LIMIT 200")
+    emails = [row["email"] for row in cursor.fetchall()]
+    cursor.execute("SELECT session_id, product_id FROM cart WHERE session_id IS NOT NULL LIMIT 200")
+    sessions = cursor.fetchall() or [{"session_id": "missing", "product_id": 1}]
+
+    def product():
+        return rng.choice(products)
+
+    return {
+        "product_detail": lambda: (product()["id"],),
+        "related_products": lambda: (product()["sub_category_id"], product()["id"], 4),
+        "products_by_subcategory": lambda: (product()["sub_category_id"],),
+        "product_row": lambda: (product()["id"],),
+        "product_stock": lambda: (product()["id"],),
+        "user_by_email": lambda: (rng.choice(emails),),
+        "frequently_bought_with": lambda: (product()["id"],) * 4,
+        "cart_item:session_id": lambda: tuple(rng.choice(sessions).values()),
+        "cart_quantity:session_id": lambda: tuple(rng.choice(sessions).values()),
+        "cart_items:session_id": lambda: (rng.choice(sessions)["session_id"],),
+    }
+
+
+def _server_counter(cursor, name):
+    cursor.execute("SHOW SESSION STATUS LIKE %s", (name,))
+    row = cursor.fetchone()
+    return int(row["Value"]) if row else 0
+
+
+def _summary(latencies):
+    latencies.sort()
+    return {
+        "mean_us": round(sum(latencies) / len(latencies), 2),
+        "p50_us": round(percentile(latencies, 50), 2),
+        "p99_us": round(percentile(latencies, 99), 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare text protocol and prepared hot statements.")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--output", default="statements_results.json")
+    args = parser.parse_args(argv)
+
+    configure_environment()
+    from App.DB import statements
+    from App.DB.connection import get_connection
+
+    conn = get_connection()
+    if conn is None:
+        raise SystemExit("Could not connect to the benchmark database")
+    cursor = conn.cursor(dictionary=True)
+    rng = random.Random(11)
+    factories = _parameters(cursor, rng)
+
+    results = {}
+    for name, make_params in factories.items():
+        sql = statements.STATEMENTS[name]
+        params = [make_params() for _ in range(args.iterations)]
+
+        text_latencies = []
+        parses_before = _server_counter(cursor, "Com_select")
+        for p in params:
+            started = time.perf_counter()
+            cursor.execute(sql, p)
+            cursor.fetchall()
+            text_latencies.append((time.perf_counter() - started) * 1e6)
+        text_parses = _server_counter(cursor, "Com_select") - parses_before
+
+        prepared_latencies = []
+        prepares_before = _server_counter(cursor, "Com_stmt_prepare")
+        for p in params:
+            started = time.perf_counter()
+            statements.fetch_all(conn, name, p)
+            prepared_latencies.append((time.perf_counter() - started) * 1e6)
+        prepares = _server_counter(cursor, "Com_stmt_prepare") - prepares_before
+
+        text, prepared = _summary(text_latencies), _summary(prepared_latencies)
+        results[name] = {
+            "text": dict(text, statements_parsed=text_parses),
+            "prepared": dict(prepared, statements_parsed=prepares),
+            "mean_saving_pct": round((text["mean_us"] - prepared["mean_us"]) / text["mean_us"] * 100, 1),
+        }
+        print(f"{name:<28} text {text['mean_us']:>9} us  prepared {prepared['mean_us']:>9} us  "
+              f"saving {results[name]['mean_saving_pct']:>6}%  parses {text_parses} -> {prepares}")
+
+    conn.close()
+    with open(args.output, "w") as f:
+        json.dump({"iterations": args.iterations, "results": results}, f, indent=2)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+Synthetic catalog and traffic generator for scale testing.
+
+Creates the schema from App/DB/schema.sql and fills users, categories,
+sub_categories, products, cart, orders and order_items with configurable
+volumes. Product popularity follows a Zipf distribution, so a few products
+dominate carts and orders while most sit in the long tail, and cart / order
+sizes are long-tailed too.
+
+Rows are streamed to CSV files and bulk loaded with LOAD DATA LOCAL INFILE
+(falls back to batched multi-row INSERTs when the server disallows it), so a
+1M-product / 1M-order dataset builds in minutes.
+
+Only point this at a throwaway database: the tables are truncated first.
+
+    python -m benchmarks.datagen --products 1000000 --orders 1000000 --users 100000
+"""
+import argparse
+import bisect
+import csv
+import itertools
+import os
+import random
+import tempfile
+import time
+from array import array
+from datetime import datetime, timedelta
+
+import mysql.connector
+from dotenv import load_dotenv
+
+from App.DB import migrations, rollups, seller_stats
+from App.Utils import security
+
+load_dotenv()
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "App", "DB", "schema.sql")
+
+BENCH_PASSWORD = "BENCHmark!!pw"
+
+TABLES = ["order_items", "orders", "cart", "products", "sub_categories", "categories", "users"]
+
+NULL = r"\N"
+
+ADJECTIVES = [
+    "Wireless", "Smart", "Leather", "Classic", "Pro", "Ultra", "Mini", "Sports", "Organic", "Premium",
+    "Portable", "Vintage", "Cotton", "Steel", "Digital", "Kids", "Compact", "Deluxe", "Eco", "Slim",
+]
+NOUNS = [
+    "Headphones", "Phone", "Watch", "Shoes", "Jacket", "Lamp", "Table", "Bottle", "Backpack", "Camera",
+    "Keyboard", "Novel", "Blender", "Helmet", "Shirt", "Speaker", "Sofa", "Charger", "Sneakers", "Mug",
+]
+BRANDS = ["Nova", "Apex", "Zenith", "Orion", "Vertex", "Lumen", "Atlas", "Pulse", "Echo", "Nimbus"]
+CITIES = [("Punjab", "Lahore"), ("Sindh", "Karachi"), ("Punjab", "Rawalpindi"), ("KPK", "Peshawar"),
+          ("Islamabad", "Islamabad"), ("Punjab", "Faisalabad")]
+
+
+# ------------------ Connection ------------------
+def connect():
+    """Own connection with LOCAL INFILE enabled; the app's get_connection doesn't allow it."""
+    return mysql.connector.connect(
+        host=os.getenv("DB_HOST"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_NAME"),
+        port=os.getenv("DB_PORT"),
+        allow_local_infile=True,
+    )
+
+
+def load_schema(conn):
+    with open(SCHEMA_PATH) as f:
+        script = f.read()
+    cursor = conn.cursor()
+    for statement in script.split(";"):
+        lines = [line for line in statement.splitlines() if not line.strip().startswith("--")]
+        if "".join(lines).strip():
+            cursor.execute("\n".join(lines))
+    conn.commit()
+    cursor.close()
+
+
+# ------------------ Deterministic Attributes ------------------
+def product_name(product_id):
+    return (f"{BRANDS[product_id % len(BRANDS)]} {ADJECTIVES[(product_id // 7) % len(ADJECTIVES)]} "
+            f"{NOUNS[(product_id // 3) % len(NOUNS)]} {product_id}")
+
+
+def product_price(product_id):
+    # Log-uniform between 99 and ~99k, stable per id
+    return round(99 * 1000 ** ((product_id * 2654435761 % 10007) / 10007), 2)
+
+
+# ------------------ Skew ------------------
+class Zipf:
+    """Sample product ids with Zipfian popularity over a shuffled rank order."""
+
+    def __init__(self, n, s, rng):
+        self.rng = rng
+        weights = (1.0 / (rank ** s) for rank in range(1, n + 1))
+        self.cumulative = list(itertools.accumulate(weights))
+        self.total = self.cumulative[-1]
+        ids = array("i", range(1, n + 1))
+        rng.shuffle(ids)
+        self.ids = ids
+
+    def sample(self):
+        rank = bisect.bisect_left(self.cumulative, self.rng.random() * self.total)
+        return self.ids[min(rank, len(self.ids) - 1)]
+
+    def sample_distinct(self, k):
+        picked = set()
+        # Bounded retries: tiny catalogs can't always supply k distinct ids
+        for _ in range(k * 4):
+            picked.add(self.sample())
+            if len(picked) == k:
+                break
+        return picked
+
+
+def long_tail_size(rng, cap, alpha=1.6):
+    """1 most of the time, occasionally much larger."""
+    return min(cap, int(rng.paretovariate(alpha)))
+
+
+# ------------------ Bulk Loading ------------------
+def bulk_load(conn, table, columns, rows, use_infile=True, batch_size=5000):
+    """Stream rows into ``table``; returns the number loaded."""
+    cursor = conn.cursor()
+    count = 0
+    if use_infile:
+        with tempfile.NamedTemporaryFile("w", suffix=f"_{table}.csv", newline="", delete=False) as f:
+            path = f.name
+            writer = csv.writer(f, lineterminator="\n")
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        try:
+            cursor.execute(
+                f"""
+                LOAD DATA LOCAL INFILE %s INTO TABLE {table}
+                FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+                LINES TERMINATED BY '\\n'
+                ({", ".join(columns)})
+                """,
+                (path,),
+            )
+            conn.commit()
+            return count
+        except mysql.connector.Error as err:
+            print(f"  LOAD DATA unavailable for {table} ({err}), falling back to batched INSERTs")
+            conn.rollback()
+            with open(path, newline="") as f:
+                rows = list(csv.reader(f))
+        finally:
+            os.unlink(path)
+
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append([None if value == NULL else value for value in row])
+        if len(batch) >= batch_size:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            count += len(batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+        conn.commit()
+        count += len(batch)
+    cursor.close()
+    return count
+
+
+# ------------------ Generator ------------------
+def generate(conn, products=10000, users=1000, categories=10, subcats_per_category=6, orders=10000,
+             carts=2000, days=365, zipf_s=1.1, seed=42, use_infile=True, verbose=True):
+    """Reset the tables and load a synthetic dataset. Returns a summary dict."""
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    def log(message):
+        if verbose:
+            print(f"[{time.perf_counter() - started:7.1f}s] {message}", flush=True)
+
+    load_schema(conn)
+    cursor = conn.cursor()
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    cursor.execute("SET UNIQUE_CHECKS = 0")
+    for table in TABLES:
+        cursor.execute(f"TRUNCATE TABLE {table}")
+    conn.commit()
+
+    # bcrypt is slow on purpose, hash once and share it
+    hashed = security.hash_password(BENCH_PASSWORD)
+    bulk_load(conn, "users", ["name", "email", "password", "role"], (
+        (f"Bench User {i}", f"bench{i}@example.com", hashed, "admin" if i == 1 else "user")
+        for i in range(1, users + 1)
+    ), use_infile)
+    log(f"users: {users}")
+
+    bulk_load(conn, "categories", ["name", "description", "banner_url"], (
+        (f"Category {i}", f"Everything about category {i}", f"https://example.com/banner/{i}.jpg")
+        for i in range(1, categories + 1)
+    ), use_infile)
+    n_subcategories = categories * subcats_per_category
+    bulk_load(conn, "sub_categories", ["category_id", "name", "description", "image_url"], (
+        (
+            (i - 1) // subcats_per_category + 1,
+            f"{NOUNS[i % len(NOUNS)]} {i}",
+            f"All kinds of {NOUNS[i % len(NOUNS)].lower()}",
+            f"https://example.com/sub/{i}.jpg",
+        )
+        for i in range(1, n_subcategories + 1)
+    ), use_infile)
+    log(f"categories: {categories}, sub_categories: {n_subcategories}")
+
+    # Sellers are skewed too: a handful of big sellers own most of the catalog
+    seller_zipf = Zipf(users, 1.0, rng)
+    bulk_load(conn, "products", ["name", "description", "price", "stock", "image_url", "user_id", "sub_category_id"], (
+        (
+            product_name(i),
+            f"{product_name(i)} - synthetic product used for scale testing.",
+            product_price(i),
+            rng.randint(50, 1000),
+            f"https://example.com/p/{i}.jpg",
+            seller_zipf.sample(),
+            rng.randint(1, n_subcategories),
+        )
+        for i in range(1, products + 1)
+    ), use_infile)
+    log(f"products: {products}")
+
+    popularity = Zipf(products, zipf_s, rng)
+
+    def cart_rows():
+        for i in range(carts):
+            owner = rng.randint(1, users)
+            email, session = (f"bench{owner}@example.com", NULL) if i % 3 == 0 else (NULL, f"bench-session-{i}")
+            for product_id in popularity.sample_distinct(long_tail_size(rng, 40)):
+                yield (email, session, product_id, rng.randint(1, 3))
+
+    cart_count = bulk_load(conn, "cart", ["user_email", "session_id", "product_id", "quantity"], cart_rows(), use_infile)
+    log(f"carts: {carts} ({cart_count} rows)")
+
+    now = datetime.now()
+    order_sizes = []
+
+    def order_rows():
+        for _ in range(orders):
+            # Repeat customers: order history is Zipf-skewed across users too
+            email = f"bench{seller_zipf.sample()}@example.com"
+            state, city = rng.choice(CITIES)
+            order_date = now - timedelta(days=days * rng.random() ** 2, seconds=rng.randint(0, 86400))
+            method = "card" if rng.random() < 0.8 else "paypal"
+            order_sizes.append(long_tail_size(rng, 20))
+            yield (email, state, city, "1 Synthetic Street", "03001234567",
+                   order_date.strftime("%Y-%m-%d %H:%M:%S"), rng.choice(["Pending", "Processing", "Shipped", "Delivered"]),
+                   method, "Paid", f"txn_{rng.getrandbits(48):x}", "4242" if method == "card" else NULL)
+
+    bulk_load(conn, "orders", ["user_email", "state", "city", "address", "phone_number", "order_date", "status",
+                               "payment_method", "payment_status", "transaction_id", "card_last4"], order_rows(), use_infile)
+    log(f"orders: {orders}")
+
+    def item_rows():
+        for order_id, size in enumerate(order_sizes, start=1):
+            for product_id in popularity.sample_distinct(size):
+                yield (order_id, product_id, product_name(product_id)[:255], rng.randint(1, 3), product_price(product_id))
+
+    item_count = bulk_load(conn, "order_items", ["order_id", "product_id", "product_name", "quantity", "price"],
+                           item_rows(), use_infile)
+    log(f"order_items: {item_count}")
+
+    cursor.execute("SET UNIQUE_CHECKS = 1")
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    conn.commit()
+    cursor.close()
+
+    # Building indexes once after the load is much cheaper than maintaining them row by row
+    migrations.upgrade(conn)
+    # Tables are truncated, not dropped, so an already-applied migration won't backfill again
+    cursor = conn.cursor()
+    cursor.execute(migrations.POPULARITY_BACKFILL)
+    rollups.rebuild(cursor)
+    cursor.execute("DELETE FROM seller_product_stats")
+    seller_stats.rebuild(cursor)
+    # Created by the migrations, so only truncatable now: drop the previous run's jobs and replies
+    cursor.execute("TRUNCATE TABLE job_queue")
+    cursor.execute("TRUNCATE TABLE idempotency_keys")
+    conn.commit()
+    cursor.close()
+    log("indexes built, done")
+
+    return {
+        "users": users,
+        "categories": categories,
+        "sub_categories": n_subcategories,
+        "products": products,
+        "orders": orders,
+        "order_items": item_count,
+        "cart_rows": cart_count,
+        "product_names": [product_name(popularity.ids[i]) for i in range(min(100, products))],
+    }
+
+
+# ------------------ Entry Point ------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset for scale testing.")
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--categories", type=int, default=10)
+    parser.add_argument("--subcats-per-category", type=int, default=6)
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--carts", type=int, default=2000, help="number of distinct carts (long-tail sizes)")
+    parser.add_argument("--days", type=int, default=365, help="spread order dates over this many days")
+    parser.add_argument("--zipf", type=float, default=1.1, help="product popularity skew exponent")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-infile", action="store_true", help="use batched INSERTs instead of LOAD DATA")
+    args = parser.parse_args(argv)
+
+    conn = connect()
+    try:
+        generate(
+            conn,
+            products=args.products,
+            users=args.users,
+            categories=args.categories,
+            subcats_per_category=args.subcats_per_category,
+            orders=args.orders,
+            carts=args.carts,
+            days=args.days,
+            zipf_s=args.zipf,
+            seed=args.seed,
+            use_infile=not args.no_infile,
+        )
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
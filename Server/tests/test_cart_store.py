@@ -0,0 +1,263 @@
+"""
+KeyValueCartStore over the in-process FakeRedis.
+
+MySQL is replaced by ``FakeConnection``, which understands only the stock and
+write-behind statements the key-value store sends, over a dict of stock levels.
+"""
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("mysql.connector")
+
+from fastapi import HTTPException  # noqa: E402
+
+from App.DB import seller_stats, statements  # noqa: E402
+from App.Utils import cart_store  # noqa: E402
+from App.Utils.fake_redis import FakeRedis  # noqa: E402
+
+OWNER = ("session_id", "s1")
+KEY = "cart:session_id:s1"
+
+
+class FakeConnection:
+    def __init__(self, stock):
+        self.stock = dict(stock)  # product id -> units in stock
+        self.cart = {}  # (owner column, owner) -> {product id: quantity}, the write-behind copy
+        self.lock = threading.Lock()
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        with self.conn.lock:
+            if sql == "UPDATE products SET stock = stock - %s WHERE id = %s AND stock >= %s":
+                quantity, product_id, _ = params
+                self.rowcount = int(self.conn.stock.get(product_id, -1) >= quantity)
+                if self.rowcount:
+                    self.conn.stock[product_id] -= quantity
+            elif sql == "UPDATE products SET stock = stock + %s WHERE id = %s":
+                quantity, product_id = params
+                self.conn.stock[product_id] += quantity
+            elif sql.startswith("DELETE FROM cart WHERE "):
+                column = sql.split()[4]
+                self.conn.cart.pop((column, params[0]), None)
+            elif sql.startswith("INSERT IGNORE INTO cart ("):
+                column = sql.split("(")[1].split(",")[0]
+                owner, product_id, quantity = params
+                self.conn.cart.setdefault((column, owner), {})[product_id] = quantity
+            else:
+                raise AssertionError(f"Unexpected statement: {sql}")
+
+    def executemany(self, sql, rows):
+        for params in rows:
+            self.execute(sql, params)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def no_mysql_helpers(monkeypatch):
+    monkeypatch.setattr(seller_stats, "record_stockout", lambda cursor, product_ids: None)
+    monkeypatch.setattr(
+        statements,
+        "fetch_one",
+        lambda conn, name, params: {"stock": conn.stock[params[0]]} if params[0] in conn.stock else None,
+    )
+
+
+@pytest.fixture
+def store():
+    return cart_store.KeyValueCartStore(FakeRedis())
+
+
+@pytest.fixture
+def conn():
+    return FakeConnection({1: 10, 2: 10})
+
+
+def cart(store):
+    return {int(product_id): int(quantity) for product_id, quantity in store.kv.hgetall(KEY).items()}
+
+
+def expire(store):
+    store.kv.zadd(store.EXPIRY_KEY, {KEY: time.time() - 1})
+
+
+# ------------------ Add / remove ------------------
+def test_add_reserves_stock(store, conn):
+    store.add(conn, OWNER, 1, 2, 30)
+    store.add(conn, OWNER, 1, 3, 30)
+    assert cart(store) == {1: 5}
+    assert conn.stock[1] == 5
+    assert store.kv.zscore(store.EXPIRY_KEY, KEY) > time.time()
+
+
+def test_add_without_expiry(store, conn):
+    store.add(conn, OWNER, 1, 1, None)
+    assert store.kv.zscore(store.EXPIRY_KEY, KEY) is None
+
+
+@pytest.mark.parametrize("product_id, quantity, status", [(1, 11, 400), (99, 1, 404)])
+def test_add_rejected(store, conn, product_id, quantity, status):
+    with pytest.raises(HTTPException) as error:
+        store.add(conn, OWNER, product_id, quantity, 30)
+    assert error.value.status_code == status
+    assert cart(store) == {}
+    assert conn.stock == {1: 10, 2: 10}
+
+
+def test_remove_restores_stock(store, conn):
+    store.add(conn, OWNER, 1, 4, 30)
+    store.remove(conn, OWNER, 1)
+    assert cart(store) == {}
+    assert conn.stock[1] == 10
+
+
+def test_remove_missing_item(store, conn):
+    with pytest.raises(HTTPException) as error:
+        store.remove(conn, OWNER, 1)
+    assert error.value.status_code == 404
+
+
+def test_clear_restores_everything(store, conn):
+    store.add(conn, OWNER, 1, 4, 30)
+    store.add(conn, OWNER, 2, 1, 30)
+    store.clear(conn, OWNER)
+    assert cart(store) == {}
+    assert conn.stock == {1: 10, 2: 10}
+    assert store.kv.zscore(store.EXPIRY_KEY, KEY) is None
+
+
+# ------------------ Update ------------------
+def test_update_moves_stock_both_ways(store, conn):
+    store.add(conn, OWNER, 1, 2, 30)
+    store.update(conn, OWNER, 1, 6, 30)
+    assert (cart(store), conn.stock[1]) == ({1: 6}, 4)
+    store.update(conn, OWNER, 1, 1, 30)
+    assert (cart(store), conn.stock[1]) == ({1: 1}, 9)
+
+
+def test_update_missing_item(store, conn):
+    with pytest.raises(HTTPException) as error:
+        store.update(conn, OWNER, 1, 3, 30)
+    assert error.value.status_code == 404
+
+
+def test_update_beyond_stock(store, conn):
+    store.add(conn, OWNER, 1, 2, 30)
+    with pytest.raises(HTTPException) as error:
+        store.update(conn, OWNER, 1, 20, 30)
+    assert error.value.status_code == 400
+    assert (cart(store), conn.stock[1]) == ({1: 2}, 8)
+
+
+def test_update_retries_after_concurrent_change(store, conn, monkeypatch):
+    store.add(conn, OWNER, 1, 2, 30)
+    reserve = store._reserve
+    calls = []
+
+    def reserve_racing_another_add(*args):
+        reserve(*args)
+        calls.append(args)
+        if len(calls) == 1:
+            # Another request changes the cart between the read and the write
+            store.add(conn, OWNER, 2, 1, 30)
+
+    monkeypatch.setattr(store, "_reserve", reserve_racing_another_add)
+    store.update(conn, OWNER, 1, 5, 30)
+    assert len(calls) == 3  # update, the racing add, the update's retry
+    assert cart(store) == {1: 5, 2: 1}
+    # The first attempt's reservation went back; only the landed one is held
+    assert conn.stock == {1: 5, 2: 9}
+
+
+def test_update_gives_up_when_the_cart_keeps_changing(store, conn, monkeypatch):
+    store.add(conn, OWNER, 1, 2, 30)
+    reserve = store._reserve
+
+    def reserve_and_touch(*args):
+        reserve(*args)
+        store.kv.hset(KEY, 1, 2)  # rewritten by another request every time
+
+    monkeypatch.setattr(store, "_reserve", reserve_and_touch)
+    with pytest.raises(HTTPException) as error:
+        store.update(conn, OWNER, 1, 5, 30)
+    assert error.value.status_code == 409
+    assert conn.stock[1] == 8
+    assert cart(store)[1] == 2
+
+
+def test_concurrent_updates_keep_stock_consistent(store):
+    conn = FakeConnection({1: 100})
+    store.add(conn, OWNER, 1, 1, 30)
+    errors = []
+
+    def update(quantity):
+        try:
+            store.update(conn, OWNER, 1, quantity, 30)
+        except HTTPException as e:
+            errors.append(e.status_code)
+
+    threads = [threading.Thread(target=update, args=(q,)) for q in range(1, 9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert set(errors) <= {409}
+    # Whichever update landed last, the stock taken matches what the cart holds
+    assert conn.stock[1] == 100 - cart(store)[1]
+
+
+# ------------------ Expiry / write-behind ------------------
+def test_release_expired_returns_stock(store, conn):
+    store.add(conn, OWNER, 1, 3, 30)
+    store.add(conn, ("session_id", "s2"), 2, 2, 30)
+    expire(store)
+    assert store.release_expired(conn, batch=10) == 1
+    assert cart(store) == {}
+    assert conn.stock == {1: 10, 2: 8}
+
+
+def test_release_expired_skips_a_cart_extended_meanwhile(store, conn, monkeypatch):
+    store.add(conn, OWNER, 1, 3, 30)
+    expire(store)
+    zrangebyscore = store.kv.zrangebyscore
+
+    def range_then_extend(*args, **kwargs):
+        keys = zrangebyscore(*args, **kwargs)
+        store.add(conn, OWNER, 1, 1, 30)  # the owner comes back before the sweep takes the cart
+        return keys
+
+    monkeypatch.setattr(store.kv, "zrangebyscore", range_then_extend)
+    assert store.release_expired(conn, batch=10) == 0
+    assert cart(store) == {1: 4}
+    assert conn.stock[1] == 6
+
+
+def test_flush_copies_changed_carts(store, conn):
+    store.add(conn, OWNER, 1, 3, 30)
+    store.add(conn, ("user_email", "a@example.com"), 2, 1, None)
+    assert store.flush(conn) == 2
+    assert conn.cart == {("session_id", "s1"): {1: 3}, ("user_email", "a@example.com"): {2: 1}}
+    assert store.flush(conn) == 0
+
+    store.remove(conn, OWNER, 1)
+    assert store.flush(conn) == 1
+    assert ("session_id", "s1") not in conn.cart
@@ -0,0 +1,37 @@
+"""
+EXPLAIN every hot query against a real database and fail on full table scans.
+
+Needs a migrated database reachable through the usual DB_* settings (e.g. the
+one benchmarks/datagen.py seeds); skipped when there is none.
+"""
+import pytest
+
+pytest.importorskip("mysql.connector")
+
+from App.DB import migrations, statements  # noqa: E402
+from App.DB.connection import get_connection  # noqa: E402
+
+
+def test_every_statement_has_explain_params():
+    assert set(migrations.STATEMENT_PARAMS) == set(statements.STATEMENTS)
+
+
+@pytest.fixture(scope="module")
+def conn():
+    conn = get_connection()
+    if conn is None:
+        pytest.skip("database unavailable")
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize(
+    "name, sql, params",
+    [pytest.param(name, sql, params, id=name) for name, sql, params in migrations.hot_queries()],
+)
+def test_hot_query_uses_indexes(conn, name, sql, params):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("EXPLAIN " + sql, params)
+    rows = cursor.fetchall()
+    cursor.close()
+    assert migrations.full_scans(rows) == [], f"{name} reads whole tables: {rows}"